@@ -0,0 +1,410 @@
+"""
+HTTP clients for the LLM providers used by the AI agent. Each provider keeps a
+pooled requests session, enforces a per-call deadline and sits behind its own
+circuit breaker; ProviderRouter fails over to the secondary provider and can
+hedge to it when the primary is slow. Base URLs are configurable so the
+clients can be pointed at a local stub server.
+"""
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+from metrics import REGISTRY, SLOW_BUCKETS
+
+LLM_CALL_SECONDS = REGISTRY.histogram('ludo_llm_call_duration_seconds', 'Duration of LLM completion calls',
+                                      ('provider',), SLOW_BUCKETS)
+LLM_CALLS = REGISTRY.counter('ludo_llm_calls', 'LLM completion calls by outcome (success or failure)',
+                             ('provider', 'outcome'))
+
+
+class ProviderError(Exception):
+    """Raised when a provider call fails or no provider is available"""
+
+
+class CircuitOpenError(ProviderError):
+    """Raised when a provider's circuit breaker is rejecting calls"""
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_timeout seconds; then a single trial call (half-open) decides whether
+    it closes again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0
+        self.trial_in_flight = False
+        self.times_opened = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def available(self):
+        """Whether a call would currently be allowed, without claiming the trial"""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return not self.trial_in_flight
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'times_opened': self.times_opened
+            }
+
+
+class LLMProvider(ABC):
+    """Base class: pooled session, deadline and circuit breaker around _request"""
+
+    name = None
+
+    def __init__(self, api_key, base_url, model, timeout=30, pool_size=10,
+                 failure_threshold=5, reset_timeout=30):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.total_latency = 0.0
+
+    def complete(self, prompt, max_tokens=1000, image_url=None, timeout=None, on_chunk=None):
+        """
+        Text completion of prompt; raises ProviderError (CircuitOpenError when
+        open). With on_chunk, the completion is streamed and on_chunk(text) is
+        called for every piece as it arrives.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        # The caller's remaining deadline can only shorten the provider timeout
+        timeout = min(timeout, self.timeout) if timeout else self.timeout
+        started = time.perf_counter()
+        try:
+            if on_chunk:
+                text = self._stream_request(prompt, max_tokens, image_url, timeout, on_chunk)
+            else:
+                text = self._request(prompt, max_tokens, image_url, timeout)
+        except Exception as e:
+            self.breaker.record_failure()
+            self._record(started, failed=True)
+            if isinstance(e, ProviderError):
+                raise
+            raise ProviderError(f"{self.name} request failed: {e}") from e
+
+        self.breaker.record_success()
+        self._record(started)
+        return text
+
+    def _post(self, url, body, timeout, headers=None, params=None):
+        response = self.session.post(url, json=body, headers=headers, params=params, timeout=timeout)
+        if response.status_code != 200:
+            raise ProviderError(f"{self.name} returned HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    def _stream_sse(self, url, body, timeout, on_chunk, extract, headers=None, params=None):
+        """
+        POST and read a server-sent events reply, passing the text extract()
+        finds in each event to on_chunk. timeout bounds the whole stream.
+        """
+        deadline = time.monotonic() + timeout
+        parts = []
+        with self.session.post(url, json=body, headers=headers, params=params,
+                               timeout=timeout, stream=True) as response:
+            if response.status_code != 200:
+                raise ProviderError(f"{self.name} returned HTTP {response.status_code}: {response.text[:200]}")
+
+            for line in response.iter_lines(decode_unicode=True):
+                if time.monotonic() > deadline:
+                    raise ProviderError(f"{self.name} stream exceeded {timeout}s")
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    text = extract(json.loads(data))
+                except (ValueError, KeyError, IndexError, TypeError):
+                    continue  # Keep-alive comments and events without text
+                if text:
+                    parts.append(text)
+                    on_chunk(text)
+        return ''.join(parts)
+
+    def probe(self, timeout=5):
+        """
+        Health probe: a request that costs no tokens and is kept out of the
+        call stats and the circuit breaker. Returns its latency in seconds or
+        raises ProviderError.
+        """
+        started = time.perf_counter()
+        url, headers, params = self._probe_request()
+        try:
+            response = self.session.get(url, headers=headers, params=params, timeout=timeout)
+        except requests.RequestException as e:
+            raise ProviderError(f"{self.name} probe failed: {e}") from e
+        if response.status_code != 200:
+            raise ProviderError(f"{self.name} probe returned HTTP {response.status_code}")
+        return time.perf_counter() - started
+
+    @abstractmethod
+    def _probe_request(self):
+        """(url, headers, params) of the probe's GET request"""
+
+    @abstractmethod
+    def _request(self, prompt, max_tokens, image_url, timeout):
+        """The completion text of one non-streamed call"""
+
+    def _stream_request(self, prompt, max_tokens, image_url, timeout, on_chunk):
+        """Providers without streaming deliver the whole completion as one chunk"""
+        text = self._request(prompt, max_tokens, image_url, timeout)
+        on_chunk(text)
+        return text
+
+    def _record(self, started, failed=False):
+        latency = time.perf_counter() - started
+        LLM_CALL_SECONDS.observe(latency, (self.name,))
+        LLM_CALLS.inc(1, (self.name, 'failure' if failed else 'success'))
+        with self.lock:
+            self.calls += 1
+            self.failures += failed
+            self.total_latency += latency
+
+    def stats(self):
+        with self.lock:
+            stats = {
+                'model': self.model,
+                'calls': self.calls,
+                'failures': self.failures,
+                'avg_latency_seconds': self.total_latency / self.calls if self.calls else 0
+            }
+        stats['circuit'] = self.breaker.stats()
+        return stats
+
+
+class OpenRouterProvider(LLMProvider):
+    """OpenAI-compatible chat completions API (OpenRouter)"""
+
+    name = 'openrouter'
+
+    def __init__(self, api_key, base_url, model, site_url=None, site_name=None, **kwargs):
+        super().__init__(api_key, base_url, model, **kwargs)
+        self.headers = {'Authorization': f'Bearer {api_key}'}
+        if site_url:
+            self.headers['HTTP-Referer'] = site_url
+        if site_name:
+            self.headers['X-Title'] = site_name
+
+    def _body(self, prompt, max_tokens, image_url):
+        if image_url:
+            content = [
+                {'type': 'text', 'text': prompt},
+                {'type': 'image_url', 'image_url': {'url': image_url}}
+            ]
+        else:
+            content = prompt
+
+        return {
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': content}],
+            'max_tokens': max_tokens,
+            'temperature': 0.3
+        }
+
+    def _probe_request(self):
+        # Details of the API key: checks the key without a completion
+        return f'{self.base_url}/key', self.headers, None
+
+    def _request(self, prompt, max_tokens, image_url, timeout):
+        data = self._post(f'{self.base_url}/chat/completions', self._body(prompt, max_tokens, image_url),
+                          timeout, headers=self.headers)
+        try:
+            return data['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise ProviderError(f"Unexpected {self.name} response: {str(data)[:200]}")
+
+    def _stream_request(self, prompt, max_tokens, image_url, timeout, on_chunk):
+        body = dict(self._body(prompt, max_tokens, image_url), stream=True)
+        return self._stream_sse(f'{self.base_url}/chat/completions', body, timeout, on_chunk,
+                                lambda event: event['choices'][0]['delta'].get('content'),
+                                headers=self.headers)
+
+
+class GeminiProvider(LLMProvider):
+    """Google Generative Language REST API (generateContent)"""
+
+    name = 'gemini'
+
+    def __init__(self, api_key, base_url, model, **kwargs):
+        super().__init__(api_key, base_url, model, **kwargs)
+        # A header rather than ?key=: request URLs end up in exception messages, which reach API responses
+        self.headers = {'x-goog-api-key': api_key}
+
+    def _body(self, prompt, max_tokens):
+        # Images are passed by URL, which generateContent does not fetch; text only
+        return {
+            'contents': [{'parts': [{'text': prompt}]}],
+            'generationConfig': {'maxOutputTokens': max_tokens, 'temperature': 0.3}
+        }
+
+    def _probe_request(self):
+        # Metadata of the configured model: checks the key and the model name
+        return f'{self.base_url}/models/{self.model}', self.headers, None
+
+    def _request(self, prompt, max_tokens, image_url, timeout):
+        data = self._post(f'{self.base_url}/models/{self.model}:generateContent',
+                          self._body(prompt, max_tokens), timeout, headers=self.headers)
+        try:
+            return data['candidates'][0]['content']['parts'][0]['text']
+        except (KeyError, IndexError, TypeError):
+            raise ProviderError(f"Unexpected {self.name} response: {str(data)[:200]}")
+
+    def _stream_request(self, prompt, max_tokens, image_url, timeout, on_chunk):
+        return self._stream_sse(f'{self.base_url}/models/{self.model}:streamGenerateContent',
+                                self._body(prompt, max_tokens), timeout, on_chunk,
+                                lambda event: event['candidates'][0]['content']['parts'][0]['text'],
+                                headers=self.headers, params={'alt': 'sse'})
+
+
+class ProviderRouter:
+    """
+    Routes completions to the primary provider, failing over to the secondary.
+    With hedge_after set, the secondary is also called once the primary has
+    taken that many seconds, and whichever answers first wins. The whole call
+    is bounded by deadline seconds. Streamed completions are never hedged, so
+    chunks from two providers cannot interleave.
+    """
+
+    def __init__(self, primary, secondary=None, hedge_after=None, deadline=60):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_after = hedge_after
+        self.deadline = deadline
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm')
+        self.lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def providers(self):
+        return [p for p in (self.primary, self.secondary) if p]
+
+    def complete(self, prompt, max_tokens=1000, image_url=None, on_chunk=None):
+        """
+        Returns (text, provider) or raises ProviderError when every provider
+        failed. With on_chunk, the completion is streamed and
+        on_chunk(text, provider) is called per piece; chunks from a new provider
+        after a failover replace whatever the failed one had sent.
+        """
+        providers = [p for p in self.providers() if p.breaker.available()]
+        if not providers:
+            raise CircuitOpenError("All AI provider circuits are open")
+
+        deadline = time.monotonic() + self.deadline
+        if self.hedge_after is not None and len(providers) > 1 and not on_chunk:
+            return self._hedged(providers, prompt, max_tokens, image_url, deadline)
+
+        errors = []
+        for i, provider in enumerate(providers):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if i:
+                with self.lock:
+                    self.failovers += 1
+            chunk_callback = (lambda text, provider=provider: on_chunk(text, provider)) if on_chunk else None
+            try:
+                return provider.complete(prompt, max_tokens, image_url, remaining, chunk_callback), provider
+            except ProviderError as e:
+                print(f"AI provider {provider.name} failed: {e}")
+                errors.append(str(e))
+        raise ProviderError('; '.join(errors) or "AI provider deadline exceeded")
+
+    def _hedged(self, providers, prompt, max_tokens, image_url, deadline):
+        primary, secondary = providers[0], providers[1]
+        futures = {
+            self.executor.submit(primary.complete, prompt, max_tokens, image_url, deadline - time.monotonic()): primary
+        }
+        done, _ = wait(futures, timeout=self.hedge_after)
+        primary_slow = not done
+        if not done or next(iter(done)).exception():
+            with self.lock:
+                if done:
+                    self.failovers += 1
+                else:
+                    self.hedges += 1
+            futures[self.executor.submit(
+                secondary.complete, prompt, max_tokens, image_url, max(deadline - time.monotonic(), 0.1)
+            )] = secondary
+
+        errors = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if futures[future] is secondary and primary_slow:
+                        with self.lock:
+                            self.hedge_wins += 1
+                    return future.result(), futures[future]
+                errors.append(str(future.exception()))
+        raise ProviderError('; '.join(errors) or "AI provider deadline exceeded")
+
+    def stats(self):
+        with self.lock:
+            stats = {
+                'hedge_after_seconds': self.hedge_after,
+                'deadline_seconds': self.deadline,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'failovers': self.failovers
+            }
+        stats['providers'] = {p.name: p.stats() for p in self.providers()}
+        return stats
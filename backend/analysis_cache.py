@@ -0,0 +1,151 @@
+"""
+Content-addressed cache for AI analyses. Entries are keyed by a hash of the
+normalized test results plus provider, model and prompt version, evicted
+least-recently-used beyond a size bound and after a TTL, and optionally
+persisted so they survive restarts: each put appends one line to a JSON-lines
+journal, which is rewritten compactly once it holds twice max_entries lines.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Fields that differ between otherwise identical payloads
+VOLATILE_KEYS = {'timestamp', 'testId', 'test_id'}
+
+
+def normalize_results(value):
+    """Drop volatile fields at any depth so identical results hash identically"""
+    if isinstance(value, dict):
+        return {k: normalize_results(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [normalize_results(v) for v in value]
+    return value
+
+
+def analysis_key(test_results, provider, model, prompt_version, image_url=None):
+    """Canonical SHA-256 key for one analysis request"""
+    canonical = json.dumps({
+        'results': normalize_results(test_results),
+        'provider': provider,
+        'model': model,
+        'prompt_version': prompt_version,
+        'image_url': image_url
+    }, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """Thread-safe LRU + TTL cache of analysis results"""
+
+    def __init__(self, max_entries=256, ttl=3600, persist_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.journal_lines = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if persist_path:
+            self._load()
+
+    def get(self, key, count=True):
+        """Return the cached value, or None on a miss or expired entry; count=False leaves the hit rate alone"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += count
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                self.misses += count
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += count
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            expires_at = time.time() + self.ttl
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            if self.persist_path:
+                if self.journal_lines >= 2 * self.max_entries:
+                    self._save()
+                else:
+                    self._append(key, expires_at, value)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'persistent': bool(self.persist_path)
+            }
+
+    def _load(self):
+        """Replay the journal, oldest first to keep LRU order, then compact it"""
+        try:
+            with open(self.persist_path, 'r') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(f"Ignoring unreadable analysis cache {self.persist_path}: {e}")
+            return
+
+        now = time.time()
+        for line in lines:
+            try:
+                stored = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash mid-append
+                continue
+            # A journal line is one [key, expires_at, value]; older files hold a list of them
+            for key, expires_at, value in ([stored] if stored and isinstance(stored[0], str) else stored):
+                self.entries.pop(key, None)
+                if expires_at > now:
+                    self.entries[key] = (expires_at, value)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._save()
+
+    def _append(self, key, expires_at, value):
+        """Add one entry to the journal; called with the lock held"""
+        try:
+            line = json.dumps([key, expires_at, value], separators=(',', ':'))
+            with open(self.persist_path, 'a') as f:
+                f.write(line + '\n')
+            self.journal_lines += 1
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Failed to persist analysis cache entry: {e}")
+
+    def _save(self):
+        """Rewrite the journal atomically with one line per live entry; called with the lock held"""
+        tmp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                for key, (expires_at, value) in self.entries.items():
+                    f.write(json.dumps([key, expires_at, value], separators=(',', ':')) + '\n')
+            os.replace(tmp_path, self.persist_path)
+            self.journal_lines = len(self.entries)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Failed to persist analysis cache: {e}")
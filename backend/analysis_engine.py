@@ -0,0 +1,409 @@
+"""
+Deterministic statistical analysis of test results, run locally with no
+network calls: changepoints in the latency series, error bursts, throughput
+plateaus (saturation) and tail-latency spread, computed with numpy from the
+parsed results and their per-second timeSeries, plus the anomaly windows the
+live detectors flagged while the test ran. Findings are turned into the same
+verdict format the AI agent returns.
+"""
+
+from startup import lazy_import
+
+np = lazy_import('numpy')
+
+ENGINE_VERSION = 2
+
+SEVERITY_RANK = {'low': 0, 'medium': 1, 'high': 2}
+
+# Changepoint detection: shortest segment, most changepoints reported, and the
+# smallest relative shift in mean latency worth reporting
+MIN_SEGMENT_SECONDS = 5
+MAX_CHANGEPOINTS = 5
+MIN_RELATIVE_SHIFT = 0.25
+
+# Error bursts: seconds whose error rate exceeds the baseline by this many
+# standard deviations (and BURST_MIN_ERRORS errors)
+BURST_SIGMA = 3.0
+BURST_MIN_ERRORS = 3
+
+# Throughput plateau: smoothing window and how close to the peak counts as flat
+PLATEAU_WINDOW = 5
+PLATEAU_LEVEL = 0.95
+
+# Tail spread: p99/p50 ratios that count as medium / high, ignored when the
+# tail is less than TAIL_MIN_GAP_MS slower than the median
+TAIL_RATIO_MEDIUM = 3.0
+TAIL_RATIO_HIGH = 5.0
+TAIL_MIN_GAP_MS = 50
+
+# Live anomalies: relative latency increase that makes a window high severity,
+# and how many windows are described in the finding
+LIVE_HIGH_MAGNITUDE = 1.0
+LIVE_MAX_DESCRIBED = 3
+
+LIVE_METRIC_NAMES = {'p50': 'median latency', 'p95': 'p95 latency', 'errorRate': 'error rate', 'throughput': 'throughput'}
+LIVE_DETECTOR_NAMES = {'ewma': 'spike', 'cusum': 'sustained shift', 'drop': 'drop'}
+
+
+def _series(results, field):
+    series = results.get('timeSeries') or []
+    return np.array([entry.get(field) or 0 for entry in series], dtype=float)
+
+
+def detect_changepoints(values, min_segment=MIN_SEGMENT_SECONDS, max_changepoints=MAX_CHANGEPOINTS):
+    """
+    Mean-shift changepoints by binary segmentation. Every candidate split of a
+    segment is scored at once from cumulative sums. A split is kept when it
+    lowers the squared error by more than a BIC-style penalty, using a noise
+    estimate from the median absolute first difference.
+    Returns sorted split indices.
+    """
+    n = len(values)
+    if n < 2 * min_segment:
+        return []
+
+    sigma = np.median(np.abs(np.diff(values))) / (0.6745 * np.sqrt(2))
+    if sigma <= 0:
+        sigma = np.std(values) or 1.0
+    penalty = 2 * sigma * sigma * np.log(n)
+
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    cumsum_sq = np.concatenate(([0.0], np.cumsum(values * values)))
+
+    changepoints = []
+    segments = [(0, n)]
+    while segments and len(changepoints) < max_changepoints:
+        best = None
+        for start, end in segments:
+            if end - start < 2 * min_segment:
+                continue
+            splits = np.arange(start + min_segment, end - min_segment + 1)
+            left_n = splits - start
+            right_n = end - splits
+            left_sum = cumsum[splits] - cumsum[start]
+            right_sum = cumsum[end] - cumsum[splits]
+            # Reduction in squared error from fitting two means instead of one
+            gains = (left_sum ** 2 / left_n + right_sum ** 2 / right_n
+                     - (left_sum + right_sum) ** 2 / (end - start))
+            i = int(np.argmax(gains))
+            if best is None or gains[i] > best[0]:
+                best = (gains[i], int(splits[i]), start, end)
+
+        if best is None or best[0] <= penalty:
+            break
+        _, split, start, end = best
+        changepoints.append(split)
+        segments.remove((start, end))
+        segments.extend([(start, split), (split, end)])
+
+    return sorted(changepoints)
+
+
+def latency_changepoints(results):
+    """Significant shifts in per-second mean latency"""
+    latency = _series(results, 'avgResponseTime')
+    changepoints = []
+    bounds = [0] + detect_changepoints(latency) + [len(latency)]
+    for i in range(1, len(bounds) - 1):
+        before = float(latency[bounds[i - 1]:bounds[i]].mean())
+        after = float(latency[bounds[i]:bounds[i + 1]].mean())
+        shift = (after - before) / before if before else None
+        if shift is None or abs(shift) >= MIN_RELATIVE_SHIFT:
+            changepoints.append({
+                'second': int(results['timeSeries'][bounds[i]]['t']),
+                'meanBefore': round(before, 2),
+                'meanAfter': round(after, 2),
+                'changePct': round(shift * 100, 1) if shift is not None else None
+            })
+    return changepoints
+
+
+def error_bursts(results):
+    """Runs of consecutive seconds with an error rate far above the test's baseline"""
+    requests = _series(results, 'requests')
+    errors = _series(results, 'errors')
+    if not len(requests) or not errors.sum():
+        return []
+
+    rate = np.divide(errors, requests, out=np.zeros_like(errors), where=requests > 0)
+    baseline = float(np.median(rate))
+    spread = float(np.std(rate))
+    hot = (rate > baseline + BURST_SIGMA * spread) & (errors >= 1)
+
+    # Start/end indices of each run of hot seconds
+    edges = np.diff(np.concatenate(([0], hot.astype(int), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    bursts = []
+    for start, end in zip(starts, ends):
+        burst_errors = int(errors[start:end].sum())
+        if burst_errors < BURST_MIN_ERRORS:
+            continue
+        bursts.append({
+            'startSecond': int(results['timeSeries'][start]['t']),
+            'endSecond': int(results['timeSeries'][end - 1]['t']),
+            'errors': burst_errors,
+            'peakErrorRate': round(float(rate[start:end].max()) * 100, 1),
+            'baselineErrorRate': round(baseline * 100, 1),
+            'shareOfErrors': round(burst_errors / float(errors.sum()) * 100, 1)
+        })
+    return bursts
+
+
+def throughput_plateau(results):
+    """
+    Saturation: throughput stops rising while load keeps rising. Uses active
+    threads when the series records them, otherwise latency growth after the
+    plateau (the same throughput at rising latency).
+    """
+    requests = _series(results, 'requests')
+    if len(requests) < 2 * PLATEAU_WINDOW:
+        return None
+
+    kernel = np.ones(PLATEAU_WINDOW) / PLATEAU_WINDOW
+    smoothed = np.convolve(requests, kernel, mode='valid')
+    peak = float(smoothed.max())
+    if peak <= 0:
+        return None
+    plateau_index = int(np.argmax(smoothed >= PLATEAU_LEVEL * peak))
+    # Offset of the smoothing window, so indices refer to the original series
+    plateau_second = plateau_index + PLATEAU_WINDOW - 1
+
+    threads = _series(results, 'threads')
+    latency = _series(results, 'avgResponseTime')
+    plateau = {
+        'second': int(results['timeSeries'][plateau_second]['t']),
+        'plateauRPS': round(peak, 2),
+        'saturated': False
+    }
+
+    if threads.any():
+        threads_at_plateau = float(threads[plateau_second])
+        max_threads = float(threads.max())
+        plateau['threadsAtPlateau'] = int(threads_at_plateau)
+        plateau['maxThreads'] = int(max_threads)
+        plateau['saturated'] = bool(max_threads >= threads_at_plateau * 1.2)
+    elif plateau_second < len(latency) - PLATEAU_WINDOW:
+        before = float(latency[:plateau_second + 1].mean())
+        after = float(latency[plateau_second + 1:].mean())
+        plateau['saturated'] = bool(before and after >= before * 1.5)
+
+    if plateau['saturated']:
+        before = float(latency[:plateau_second + 1].mean())
+        after = float(latency[plateau_second + 1:].mean()) if plateau_second + 1 < len(latency) else before
+        plateau['latencyBefore'] = round(before, 2)
+        plateau['latencyAfter'] = round(after, 2)
+    return plateau
+
+
+def tail_spread(results):
+    """How far the tail sits from the median, overall and for the worst label"""
+    percentiles = results.get('responseTimePercentiles') or {}
+    p50, p90, p99 = percentiles.get('p50'), percentiles.get('p90'), percentiles.get('p99')
+    if not p50 or not p99:
+        return None
+
+    spread = {
+        'p99OverP50': round(p99 / p50, 2),
+        'p99OverP90': round(p99 / p90, 2) if p90 else None,
+        'p99MinusP50': round(p99 - p50, 2)
+    }
+
+    labels = results.get('labelBreakdown') or {}
+    label_p95 = {
+        label: stats.get('responseTimePercentiles', {}).get('p95')
+        for label, stats in labels.items()
+    }
+    label_p95 = {label: p95 for label, p95 in label_p95.items() if p95}
+    if len(label_p95) > 1:
+        values = np.array(list(label_p95.values()), dtype=float)
+        worst = max(label_p95, key=label_p95.get)
+        spread['worstLabel'] = worst
+        spread['worstLabelP95'] = label_p95[worst]
+        spread['labelP95Spread'] = round(float(values.max() / values.min()), 2)
+    return spread
+
+
+def live_anomalies(results):
+    """Anomaly windows recorded by the live detectors (see live_metrics), in time order"""
+    anomalies = [a for a in results.get('liveAnomalies') or [] if isinstance(a, dict) and a.get('metric')]
+    return sorted(anomalies, key=lambda a: a.get('windowStart') or 0)
+
+
+def _describe_anomaly(anomaly):
+    # Error-rate magnitudes are absolute changes, the others relative to the baseline
+    magnitude = anomaly.get('magnitude')
+    change = ''
+    if magnitude is not None and anomaly['metric'] == 'errorRate':
+        change = f" ({magnitude * 100:+.1f} points vs baseline)"
+    elif magnitude is not None and anomaly.get('baseline'):
+        change = f" ({magnitude:+.0%} vs baseline)"
+    return (f"{LIVE_METRIC_NAMES.get(anomaly['metric'], anomaly['metric'])} "
+            f"{LIVE_DETECTOR_NAMES.get(anomaly.get('detector'), 'anomaly')} from second "
+            f"{anomaly.get('windowStart')} to {anomaly.get('windowEnd')}{change}")
+
+
+def _finding(kind, severity, message, root_cause, recommendations):
+    return {
+        'type': kind,
+        'severity': severity,
+        'message': message,
+        'root_cause': root_cause,
+        'recommendations': recommendations
+    }
+
+
+def analyze_results(results):
+    """
+    Run every detector over a results payload. Returns the detector outputs,
+    a list of findings ordered by severity, and a verdict in the AI agent's format.
+    """
+    total = results.get('totalRequests', 0) or 0
+    success_rate = results.get('successRate')
+    if success_rate is None:
+        success_rate = (results.get('successfulRequests', 0) / total * 100) if total else 0
+    avg_response_time = results.get('avgResponseTime', 0) or 0
+
+    changepoints = latency_changepoints(results)
+    bursts = error_bursts(results)
+    plateau = throughput_plateau(results)
+    spread = tail_spread(results)
+    anomalies = live_anomalies(results)
+
+    findings = []
+    if total and success_rate < 80:
+        findings.append(_finding(
+            'error_rate', 'high', f"Success rate is {success_rate:.1f}%",
+            "The application is failing a large share of requests under this load",
+            ["Investigate the dominant error codes in errorBreakdown", "Check server logs and resource limits"]
+        ))
+    elif total and success_rate < 95:
+        findings.append(_finding(
+            'error_rate', 'medium', f"Success rate is {success_rate:.1f}%",
+            "Some requests fail under this load",
+            ["Investigate the dominant error codes in errorBreakdown", "Monitor resource usage"]
+        ))
+
+    if bursts:
+        worst = max(bursts, key=lambda b: b['errors'])
+        findings.append(_finding(
+            'error_burst', 'high' if worst['peakErrorRate'] >= 50 else 'medium',
+            f"{len(bursts)} error burst(s); the largest ({worst['errors']} errors, peak "
+            f"{worst['peakErrorRate']}%) ran from second {worst['startSecond']} to {worst['endSecond']}",
+            "Errors are concentrated in time rather than spread evenly, pointing at a transient "
+            "event (dependency outage, GC pause, pool exhaustion or deployment)",
+            ["Correlate the burst window with server, database and dependency logs",
+             "Check connection and thread pool limits"]
+        ))
+
+    if plateau and plateau['saturated']:
+        message = f"Throughput plateaued at {plateau['plateauRPS']} req/s from second {plateau['second']}"
+        if 'maxThreads' in plateau:
+            message += f" while threads grew from {plateau['threadsAtPlateau']} to {plateau['maxThreads']}"
+        findings.append(_finding(
+            'saturation', 'high', message,
+            "The system reached its capacity: extra load only adds queueing delay",
+            ["Profile the bottleneck resource (CPU, DB connections, thread pools)",
+             "Scale horizontally or raise the saturated pool limits",
+             "Use the plateau throughput as the current capacity baseline"]
+        ))
+
+    upward = [c for c in changepoints if c['changePct'] is None or c['changePct'] > 0]
+    if upward:
+        worst = max(upward, key=lambda c: c['changePct'] or 0)
+        findings.append(_finding(
+            'latency_shift', 'high' if (worst['changePct'] or 0) >= 100 else 'medium',
+            f"Mean latency shifted from {worst['meanBefore']} ms to {worst['meanAfter']} ms "
+            f"at second {worst['second']}",
+            "Latency stepped up during the run rather than drifting, which suggests a "
+            "resource limit, cache eviction or background job kicking in",
+            ["Inspect what changed on the server at that point in the run",
+             "Compare resource metrics before and after the shift"]
+        ))
+
+    if spread:
+        ratio = spread['p99OverP50']
+        if ratio >= TAIL_RATIO_MEDIUM and spread['p99MinusP50'] >= TAIL_MIN_GAP_MS:
+            message = f"p99 latency is {ratio}x the median"
+            if spread.get('worstLabel'):
+                message += f"; slowest endpoint {spread['worstLabel']} has p95 {spread['worstLabelP95']} ms"
+            findings.append(_finding(
+                'tail_latency', 'high' if ratio >= TAIL_RATIO_HIGH else 'medium', message,
+                "A minority of requests is much slower than typical (queueing, lock contention, "
+                "GC pauses or a slow dependency on some paths)",
+                ["Trace the slowest requests end to end", "Look for contention on shared resources"]
+            ))
+
+    if anomalies:
+        severe = any(
+            a['metric'] in ('errorRate', 'throughput') or (a.get('magnitude') or 0) >= LIVE_HIGH_MAGNITUDE
+            for a in anomalies
+        )
+        findings.append(_finding(
+            'live_anomaly', 'high' if severe else 'medium',
+            f"{len(anomalies)} anomaly window(s) flagged while the test ran: "
+            + '; '.join(_describe_anomaly(a) for a in anomalies[:LIVE_MAX_DESCRIBED]),
+            "Metrics departed from their own recent baseline during the run, pointing at an event "
+            "in that window rather than a steady-state limit",
+            ["Correlate the anomaly windows with server, database and dependency logs",
+             "Check for deployments, autoscaling or background jobs during those windows"]
+        ))
+
+    if avg_response_time > 1000:
+        findings.append(_finding(
+            'slow_responses', 'high', f"Mean response time is {avg_response_time:.0f} ms",
+            "Requests are slow on average, not just in the tail",
+            ["Optimize database queries", "Consider caching", "Review application code"]
+        ))
+    elif avg_response_time > 500:
+        findings.append(_finding(
+            'slow_responses', 'medium', f"Mean response time is {avg_response_time:.0f} ms",
+            "Requests are moderately slow on average",
+            ["Optimize database queries", "Consider caching"]
+        ))
+
+    findings.sort(key=lambda f: SEVERITY_RANK[f['severity']], reverse=True)
+
+    return {
+        'engine': 'statistical',
+        'version': ENGINE_VERSION,
+        'changepoints': changepoints,
+        'errorBursts': bursts,
+        'throughputPlateau': plateau,
+        'tailSpread': spread,
+        'liveAnomalies': anomalies,
+        'findings': findings,
+        'verdict': _verdict(findings, total, bursts, bool(results.get('timeSeries')))
+    }
+
+
+def _verdict(findings, total, bursts, has_series):
+    if findings:
+        top = findings[0]
+        severity = top['severity']
+        problem = '; '.join(f['message'] for f in findings[:3])
+        root_cause = top['root_cause']
+        recommendations = []
+        for finding in findings:
+            for recommendation in finding['recommendations']:
+                if recommendation not in recommendations:
+                    recommendations.append(recommendation)
+    else:
+        severity = 'low'
+        problem = "No significant problems detected"
+        root_cause = "All detectors are within normal ranges"
+        recommendations = ["Continue monitoring", "Consider load testing at higher scale"]
+
+    # More samples and a time series make the statistics more trustworthy
+    confidence = 0.5 + 0.3 * min(1.0, total / 1000.0) + (0.1 if has_series else 0)
+
+    return {
+        'problem': problem,
+        'root_cause': root_cause,
+        'recommendations': recommendations[:5],
+        # Transient bursts and severe problems are worth a confirming rerun
+        'retry_test': bool(bursts) or severity == 'high',
+        'confidence': round(confidence, 2),
+        'severity': severity
+    }
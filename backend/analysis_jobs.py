@@ -0,0 +1,137 @@
+"""
+Bounded background job queue for AI analyses, so a slow provider round trip
+never holds a request thread. Jobs get ids that can be polled, and the queue
+keeps depth and latency metrics.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds max_pending jobs"""
+
+
+class AnalysisJobQueue:
+    """Thread pool with a pending-job bound, job records and latency metrics"""
+
+    def __init__(self, workers=4, max_pending=100, retained_jobs=500):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retained_jobs = retained_jobs
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'total_run_seconds': 0.0,
+            'max_run_seconds': 0.0
+        }
+
+    def submit(self, fn, *args, on_complete=None, test_id=None):
+        """
+        Queue fn(*args). on_complete(job) runs on the worker thread once the job
+        has finished. Raises QueueFullError when the queue is at capacity.
+        """
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.metrics['rejected'] += 1
+                raise QueueFullError(f"Analysis queue is full ({self.max_pending} pending jobs)")
+
+            job = {
+                'job_id': uuid.uuid4().hex,
+                'test_id': test_id,
+                'status': 'queued',
+                'submitted_at': datetime.now().isoformat(),
+                '_submitted': time.perf_counter()
+            }
+            self.jobs[job['job_id']] = job
+            self.pending += 1
+            self.metrics['submitted'] += 1
+            self._trim()
+
+        self.executor.submit(self._run, job, fn, args, on_complete)
+        return self._public(job)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def stats(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+            started = metrics['completed'] + metrics['failed'] + self.running
+            finished = metrics['completed'] + metrics['failed']
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'queue_depth': self.pending - self.running,
+                'running': self.running,
+                'submitted': metrics['submitted'],
+                'completed': metrics['completed'],
+                'failed': metrics['failed'],
+                'rejected': metrics['rejected'],
+                'avg_wait_seconds': metrics['total_wait_seconds'] / started if started else 0,
+                'max_wait_seconds': metrics['max_wait_seconds'],
+                'avg_run_seconds': metrics['total_run_seconds'] / finished if finished else 0,
+                'max_run_seconds': metrics['max_run_seconds']
+            }
+
+    def _run(self, job, fn, args, on_complete):
+        started = time.perf_counter()
+        wait = started - job['_submitted']
+        with self.lock:
+            self.running += 1
+            job['status'] = 'running'
+            job['started_at'] = datetime.now().isoformat()
+            self.metrics['total_wait_seconds'] += wait
+            self.metrics['max_wait_seconds'] = max(self.metrics['max_wait_seconds'], wait)
+
+        try:
+            result = fn(*args)
+            status, error = 'completed', None
+        except Exception as e:
+            result, status, error = None, 'failed', str(e)
+
+        run = time.perf_counter() - started
+        with self.lock:
+            self.running -= 1
+            self.pending -= 1
+            job['status'] = status
+            job['result'] = result
+            if error:
+                job['error'] = error
+            job['finished_at'] = datetime.now().isoformat()
+            job['duration_seconds'] = run
+            self.metrics[status] += 1
+            self.metrics['total_run_seconds'] += run
+            self.metrics['max_run_seconds'] = max(self.metrics['max_run_seconds'], run)
+
+        if on_complete:
+            try:
+                on_complete(self._public(job))
+            except Exception as e:
+                print(f"Analysis job {job['job_id']} completion callback failed: {e}")
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond retained_jobs; called with the lock held"""
+        excess = len(self.jobs) - self.retained_jobs
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self.jobs.items() if job['status'] in ('completed', 'failed')][:excess]:
+            del self.jobs[job_id]
+
+    def _public(self, job):
+        return {k: v for k, v in job.items() if not k.startswith('_')}
@@ -1,29 +1,59 @@
-from flask import Flask, request, jsonify
+from startup import StartupTimer
+
+# Boot phases are timed from here; see /health/startup
+startup = StartupTimer()
+
+from dotenv import load_dotenv
+from serving import server_mode, patch, run_blocking, run_gevent_server
+
+# Load environment variables from .env file; SERVER_MODE=gevent has to patch
+# the standard library before the imports below
+load_dotenv()
+SERVER_MODE = server_mode()
+patch(SERVER_MODE)
+startup.mark('environment')
+
+from flask import Flask, request, jsonify, g, send_from_directory
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
-import google.generativeai as genai
-import openai
+from flask_socketio import SocketIO, emit, join_room
+startup.mark('import flask and socketio')
 import os
+import hmac
+import ipaddress
 import json
-import subprocess
 from datetime import datetime
-import requests
-from dotenv import load_dotenv
-from jmeter_runner import JMeterRunner
+from jmeter_runner import JMeterRunner, TEST_ID_PATTERN
+from native_engine import load_profile
+from log_replay import resolve_log_file, normalize_methods
+from scenarios import normalize_scenario
+from analysis_cache import AnalysisCache, analysis_key
+from analysis_jobs import AnalysisJobQueue, QueueFullError
+from single_flight import SingleFlight
+from ai_providers import OpenRouterProvider, GeminiProvider, ProviderRouter
+from analysis_engine import analyze_results
+from run_memory import RunMemory
+from history_index import HistoryIndex, normalize_slo
+from json_responses import json_provider, ResponseCompressor, BodyCache
+from run_comparison import compare_runs
+from retry_scheduler import RetryScheduler
+from live_metrics import LiveAnomalyMonitor
+from health import HealthMonitor, jmeter_probe, disk_probe, provider_probe
+from metrics import REGISTRY, CONTENT_TYPE, OPENMETRICS_CONTENT_TYPE, wants_openmetrics
+from profiling import STAGES, SamplingProfiler
+from prompt_builder import build_analysis_prompt, build_batch_prompt, parse_batch_response, parse_verdict, DEFAULT_TOKEN_BUDGET, PROMPT_VERSION
 import threading
 import time
-
-# Load environment variables from .env file
-load_dotenv()
+startup.mark('import backend modules')
 
 app = Flask(__name__)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) lets several server processes share Socket.IO clients
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=SERVER_MODE,
+                    message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE'))
 
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', 'your-gemini-api-key-here')
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-pro')
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta')
 
 # Configure OpenRouter API
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY', 'your-openrouter-api-key-here')
@@ -31,228 +61,364 @@ OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/ap
 OPENROUTER_SITE_URL = os.getenv('OPENROUTER_SITE_URL', 'https://your-site-url.com')
 OPENROUTER_SITE_NAME = os.getenv('OPENROUTER_SITE_NAME', 'Ludo Performance Suite')
 
-# Initialize OpenRouter client
-openai.api_key = OPENROUTER_API_KEY
-openai.api_base = OPENROUTER_BASE_URL
+# Models used per provider
+OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'google/gemini-2.0-flash-exp')
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-pro')
+
+# Provider calls: per-call timeout, overall deadline, circuit breaker and hedging
+# (AI_HEDGE_AFTER unset disables hedged calls to the secondary provider)
+AI_PROVIDER_TIMEOUT = float(os.getenv('AI_PROVIDER_TIMEOUT', '30'))
+AI_PROVIDER_DEADLINE = float(os.getenv('AI_PROVIDER_DEADLINE', '60'))
+AI_CIRCUIT_FAILURES = int(os.getenv('AI_CIRCUIT_FAILURES', '5'))
+AI_CIRCUIT_RESET = float(os.getenv('AI_CIRCUIT_RESET', '30'))
+AI_HEDGE_AFTER = float(os.getenv('AI_HEDGE_AFTER')) if os.getenv('AI_HEDGE_AFTER') else None
+
+# Stream analyses of a test's results to its Socket.IO room as they are generated
+AI_STREAM_ANALYSIS = os.getenv('AI_STREAM_ANALYSIS', 'true').lower() == 'true'
+
+# Token budget for the compact results summary sent to the model
+AI_PROMPT_TOKEN_BUDGET = int(os.getenv('AI_PROMPT_TOKEN_BUDGET', str(DEFAULT_TOKEN_BUDGET)))
+
+# Batch analysis: token budget per batch prompt, most runs per provider call and
+# reply tokens allowed per run
+AI_BATCH_TOKEN_BUDGET = int(os.getenv('AI_BATCH_TOKEN_BUDGET', '4000'))
+AI_BATCH_MAX_RUNS = int(os.getenv('AI_BATCH_MAX_RUNS', '10'))
+AI_BATCH_TOKENS_PER_RUN = 300
+
+# AI analysis cache (AI_CACHE_PATH enables on-disk persistence)
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '256'))
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', '3600'))
+AI_CACHE_PATH = os.getenv('AI_CACHE_PATH')
+
+# Longest a duplicate analysis waits for the identical in-flight one (seconds)
+AI_SINGLE_FLIGHT_TIMEOUT = float(os.getenv('AI_SINGLE_FLIGHT_TIMEOUT', '120'))
+
+# Agent memory of analyzed runs (SQLite) and how many similar past runs each analysis sees
+AGENT_MEMORY_PATH = os.getenv('AGENT_MEMORY_PATH', 'jmeter_results/agent_memory.db')
+AGENT_MEMORY_MAX_ENTRIES = int(os.getenv('AGENT_MEMORY_MAX_ENTRIES', '10000'))
+AGENT_MEMORY_NEIGHBOURS = int(os.getenv('AGENT_MEMORY_NEIGHBOURS', '3'))
+
+# Index of finished tests behind /tests/history (SQLite; ':memory:' keeps it per process)
+TEST_HISTORY_PATH = os.getenv('TEST_HISTORY_PATH', 'jmeter_results/test_history.db')
+
+# Default SLO checked for every test unless its config sets its own thresholds
+DEFAULT_SLO = {
+    'p95_ms': float(os.getenv('SLO_P95_MS')) if os.getenv('SLO_P95_MS') else None,
+    'error_rate': float(os.getenv('SLO_ERROR_RATE')) if os.getenv('SLO_ERROR_RATE') else None
+}
+
+# JSON encoder ('auto' uses orjson when installed), smallest response body that
+# is compressed (brotli or gzip, per Accept-Encoding) and the memory for cached
+# bodies of finished runs
+JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto')
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+RESPONSE_CACHE_MAX_MB = int(os.getenv('RESPONSE_CACHE_MAX_MB', '64'))
+
+# Background analysis workers and the most jobs allowed to wait or run at once
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '4'))
+ANALYSIS_QUEUE_SIZE = int(os.getenv('ANALYSIS_QUEUE_SIZE', '100'))
+
+# Streaming anomaly detection (EWMA/CUSUM, throughput drops) on running tests
+LIVE_ANOMALY_DETECTION = os.getenv('LIVE_ANOMALY_DETECTION', 'true').lower() == 'true'
+
+# Seconds the real-time monitor keeps waiting for a test to finish after its ramp-up and duration
+MONITOR_GRACE_SECONDS = 60
+
+# Prometheus metrics at /metrics; a finished test's series are kept this many
+# seconds so the last scrapes still see its final values
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_TEST_RETENTION = float(os.getenv('METRICS_TEST_RETENTION', '120'))
+
+# Agent-recommended retries: most retries per original test, and the delay
+# before the first one (multiplied by the factor for each further retry)
+AUTO_RETRY_MAX = int(os.getenv('AUTO_RETRY_MAX', '2'))
+AUTO_RETRY_BACKOFF = float(os.getenv('AUTO_RETRY_BACKOFF', '30'))
+AUTO_RETRY_BACKOFF_FACTOR = float(os.getenv('AUTO_RETRY_BACKOFF_FACTOR', '2'))
+
+# Background health probes (seconds between runs): disk space, AI providers and
+# JMeter, whose probe starts a JVM. /health serves the cached results;
+# /health/deep re-runs a probe at most once per HEALTH_DEEP_MIN_INTERVAL
+HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', '30'))
+HEALTH_PROVIDER_PROBE_INTERVAL = float(os.getenv('HEALTH_PROVIDER_PROBE_INTERVAL', '300'))
+HEALTH_JMETER_PROBE_INTERVAL = float(os.getenv('HEALTH_JMETER_PROBE_INTERVAL', '600'))
+HEALTH_DEEP_MIN_INTERVAL = float(os.getenv('HEALTH_DEEP_MIN_INTERVAL', '10'))
+HEALTH_MIN_FREE_DISK_MB = int(os.getenv('HEALTH_MIN_FREE_DISK_MB', '500'))
+HEALTH_JMETER_PROBE_DELAY = 15
+
+# Modules imported on first use; /health/startup shows whether they have been
+LAZY_MODULES = ('numpy',)
 
 # Environment configuration
 IS_PRODUCTION = os.getenv('FLASK_ENV') == 'production'
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', '5000'))
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:5000')
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 
+# Per-stage timings in each test's status (on by default outside production),
+# and the admin endpoints, which write on-demand sampling profiles to
+# PROFILE_DIR. With ADMIN_TOKEN set they need it in an X-Admin-Token header;
+# without it they are only served to loopback clients outside production
+DEBUG_TIMINGS = os.getenv('DEBUG_TIMINGS', 'false' if IS_PRODUCTION else 'true').lower() == 'true'
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'jmeter_results/profiles')
+PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', '300'))
+
+# Load engine used when a test config does not pick one ('jmeter' or 'native')
+LOAD_ENGINES = ('jmeter', 'native')
+DEFAULT_LOAD_ENGINE = os.getenv('LOAD_ENGINE', 'jmeter')
+
+# Results recording mode: 'full' keeps every JTL column and JMeter's listeners and
+# HTML report, 'lean' writes only what the parser needs
+RECORDING_MODES = ('full', 'lean')
+DEFAULT_RECORDING_MODE = os.getenv('RESULTS_RECORDING', 'full')
+
+# Directory that access logs for replay tests must live in
+REPLAY_LOG_DIR = os.getenv('REPLAY_LOG_DIR', 'access_logs')
+
 # Initialize JMeter Runner
 jmeter_runner = JMeterRunner()
+test_history = HistoryIndex(TEST_HISTORY_PATH)
+
+# Fast JSON encoding, compression of large bodies and cached bodies of finished runs
+app.json = json_provider(app, JSON_ENCODER)
+compressor = ResponseCompressor(RESPONSE_COMPRESSION_MIN_BYTES)
+app.after_request(compressor)
+body_cache = BodyCache(compressor, RESPONSE_CACHE_MAX_MB * 1024 * 1024)
+profiler = SamplingProfiler(PROFILE_DIR, PROFILE_MAX_SECONDS)
+
+# Request latency per route, for /metrics
+HTTP_REQUEST_SECONDS = REGISTRY.histogram('ludo_http_request_duration_seconds', 'HTTP request latency',
+                                          ('method', 'route'))
+HTTP_REQUESTS = REGISTRY.counter('ludo_http_requests', 'HTTP requests by response status',
+                                 ('method', 'route', 'status'))
+
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+def _observe_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        # The rule (/test/<test_id>/status), not the path, keeps the label set small
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, (request.method, route))
+        HTTP_REQUESTS.inc(1, (request.method, route, str(response.status_code)))
+    return response
+
+if METRICS_ENABLED:
+    app.before_request(_start_request_timer)
+    app.after_request(_observe_request)
+
+startup.mark('app, config and JMeter runner')
 
 # Global variables for real-time monitoring
 active_tests = {}
 test_monitors = {}
+# Tests with a running monitor_test_real_time thread
+monitored_tests = set()
+# Tests whose final status (with its live anomalies) is recorded; their status no longer changes
+finalized_tests = set()
 
 class PerformanceAnalyzer:
     def __init__(self):
         self.test_history = []
-        self.agent_memory = []
+        self.run_memory = RunMemory(AGENT_MEMORY_PATH, AGENT_MEMORY_MAX_ENTRIES)
+        self.providers = self._create_providers()
         self.ai_provider = self._determine_ai_provider()
+        self.provider_router = self._create_router()
+        self.analysis_cache = AnalysisCache(AI_CACHE_MAX_ENTRIES, AI_CACHE_TTL, AI_CACHE_PATH)
+        self.single_flight = SingleFlight(AI_SINGLE_FLIGHT_TIMEOUT)
+
+    def _create_providers(self):
+        """HTTP clients for every provider with an API key, in preference order"""
+        options = {
+            'timeout': AI_PROVIDER_TIMEOUT,
+            'failure_threshold': AI_CIRCUIT_FAILURES,
+            'reset_timeout': AI_CIRCUIT_RESET
+        }
+        providers = {}
+        if OPENROUTER_API_KEY != 'your-openrouter-api-key-here':
+            providers['openrouter'] = OpenRouterProvider(
+                OPENROUTER_API_KEY, OPENROUTER_BASE_URL, OPENROUTER_MODEL,
+                site_url=OPENROUTER_SITE_URL, site_name=OPENROUTER_SITE_NAME, **options
+            )
+        if GEMINI_API_KEY != 'your-gemini-api-key-here':
+            providers['gemini'] = GeminiProvider(GEMINI_API_KEY, GEMINI_BASE_URL, GEMINI_MODEL, **options)
+        return providers
 
     def _determine_ai_provider(self):
         """Determine which AI provider to use based on available API keys"""
-        if OPENROUTER_API_KEY != 'your-openrouter-api-key-here':
+        if 'openrouter' in self.providers:
             return 'openrouter'
-        elif GEMINI_API_KEY != 'your-gemini-api-key-here':
+        elif 'gemini' in self.providers:
             return 'gemini'
         else:
             return 'fallback'
 
+    def _create_router(self):
+        """Primary provider with the other configured one as failover/hedge target"""
+        if self.ai_provider == 'fallback':
+            return None
+        primary = self.providers[self.ai_provider]
+        secondary = next((p for name, p in self.providers.items() if name != self.ai_provider), None)
+        return ProviderRouter(primary, secondary, AI_HEDGE_AFTER, AI_PROVIDER_DEADLINE)
+
+    def _model_name(self):
+        """Model used by the current provider"""
+        if self.ai_provider == 'fallback':
+            return None
+        return self.providers[self.ai_provider].model
+
     def agent_brain(self, jmeter_output, image_url=None):
         """
         AI Agent Brain - Analyzes JMeter output and makes intelligent decisions
         Supports both text and image analysis
         """
+        statistical = None
+        similar_runs = []
         try:
-            if self.ai_provider == 'openrouter':
-                return self._openrouter_analysis(jmeter_output, image_url)
-            elif self.ai_provider == 'gemini':
-                return self._gemini_analysis(jmeter_output, image_url)
-            else:
-                return self._generate_fallback_analysis(jmeter_output)
+            # Local statistical first pass and the most similar remembered runs:
+            # the analysis without a provider, and structured evidence for the LLM otherwise
+            statistical = self._statistical_analysis(jmeter_output)
+            similar_runs = self._similar_runs(jmeter_output)
+            if self.ai_provider == 'fallback':
+                return dict(self._generate_fallback_analysis(jmeter_output, statistical), similar_runs=similar_runs)
+            
+            # Identical results were analyzed recently: reuse that analysis
+            cache_key = analysis_key(jmeter_output, self.ai_provider, self._model_name(), PROMPT_VERSION, image_url)
+            cached = self.analysis_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached, cached=True, statistical_analysis=statistical, similar_runs=similar_runs)
+            
+            # The same results are already being analyzed: wait for that call instead
+            llm_input = self._llm_evidence(jmeter_output, statistical, similar_runs)
+            result, shared = self.single_flight.do(
+                cache_key, lambda: self._provider_analysis(cache_key, llm_input, image_url)
+            )
+            result = dict(result, statistical_analysis=statistical, similar_runs=similar_runs)
+            return dict(result, coalesced=True) if shared else result
 
         except Exception as e:
+            # Every provider failed, timed out or is circuit-open: rule-based analysis
             print(f"AI analysis failed: {e}")
-            return self._generate_fallback_analysis(jmeter_output)
+            return dict(self._generate_fallback_analysis(jmeter_output, statistical),
+                        provider_error=str(e), similar_runs=similar_runs)
 
-    def _openrouter_analysis(self, jmeter_output, image_url=None):
-        """Use OpenRouter API with Gemini 2.0 Flash for analysis"""
+    def _statistical_analysis(self, test_results):
+        """Statistical engine output, or None when the results cannot be analyzed"""
+        if not isinstance(test_results, dict):
+            return None
         try:
-            # Enhanced prompt for AI agent behavior
-            prompt = f"""
-            You are an intelligent Performance Testing AI Agent. Analyze the following JMeter test results and act as a performance engineer would.
-            
-            JMETER TEST RESULTS:
-            {json.dumps(jmeter_output, indent=2)}
-            
-            As an AI Agent, you need to:
-            1. Identify the MAIN PROBLEM (if any)
-            2. Determine the ROOT CAUSE
-            3. Provide SPECIFIC RECOMMENDATIONS
-            4. Decide if a RETRY TEST is needed
-            
-            Consider these factors:
-            - Response times and their distribution
-            - Success/failure rates
-            - Throughput and RPS patterns
-            - Error patterns and types
-            - Resource utilization indicators
-            - Performance degradation patterns
-            
-            Respond ONLY with valid JSON in this exact format:
-            {{
-                "problem": "Clear description of the main issue or 'No significant problems detected'",
-                "root_cause": "Technical root cause analysis",
-                "recommendations": ["Specific recommendation 1", "Specific recommendation 2"],
-                "retry_test": true/false,
-                "confidence": 0.85,
-                "severity": "high/medium/low"
-            }}
-            """
-            
-            # Add image analysis if provided
-            if image_url:
-                # Multi-modal analysis with image
-                messages = [
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": image_url}}
-                        ]
-                    }
-                ]
-            else:
-                # Text-only analysis
-                messages = [
-                    {"role": "user", "content": prompt}
-                ]
-            
-            completion = openai.ChatCompletion.create(
-                model="google/gemini-2.0-flash-exp",
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.3
-            )
-            
-            response_text = completion.choices[0].message.content
-            
-            # Parse JSON response
-            try:
-                agent_result = json.loads(response_text)
-                return {
-                    "success": True,
-                    "agent_response": agent_result,
-                    "raw_response": response_text,
-                    "ai_provider": "openrouter",
-                    "model": "gemini-2.0-flash-exp",
-                    "timestamp": datetime.now().isoformat()
-                }
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                return {
-                    "success": True,
-                    "agent_response": {
-                        "problem": "AI analysis completed but response format was unexpected",
-                        "root_cause": "Response parsing issue",
-                        "recommendations": ["Review AI response format", "Check API configuration"],
-                        "retry_test": False,
-                        "confidence": 0.5,
-                        "severity": "medium"
-                    },
-                    "raw_response": response_text,
-                    "ai_provider": "openrouter",
-                    "model": "gemini-2.0-flash-exp",
-                    "timestamp": datetime.now().isoformat()
-                }
-                
+            return run_blocking(analyze_results, test_results)
         except Exception as e:
-            print(f"OpenRouter analysis failed: {e}")
-            return {
-                "success": False,
-                "error": f"OpenRouter analysis failed: {str(e)}",
-                "ai_provider": "openrouter",
-                "timestamp": datetime.now().isoformat()
-            }
+            print(f"Statistical analysis failed: {e}")
+            return None
 
-    def _gemini_analysis(self, jmeter_output, image_url=None):
-        """Use Google Gemini Pro for analysis"""
+    def _similar_runs(self, test_results):
+        """The most similar previously analyzed runs of other tests"""
+        if not isinstance(test_results, dict) or AGENT_MEMORY_NEIGHBOURS <= 0:
+            return []
         try:
-            prompt = f"""
-            You are an intelligent Performance Testing AI Agent. Analyze the following JMeter test results and act as a performance engineer would.
-            
-            JMETER TEST RESULTS:
-            {json.dumps(jmeter_output, indent=2)}
-            
-            As an AI Agent, you need to:
-            1. Identify the MAIN PROBLEM (if any)
-            2. Determine the ROOT CAUSE
-            3. Provide SPECIFIC RECOMMENDATIONS
-            4. Decide if a RETRY TEST is needed
-            
-            Consider these factors:
-            - Response times and their distribution
-            - Success/failure rates
-            - Throughput and RPS patterns
-            - Error patterns and types
-            - Resource utilization indicators
-            - Performance degradation patterns
-            
-            Respond ONLY with valid JSON in this exact format:
-            {{
-                "problem": "Clear description of the main issue or 'No significant problems detected'",
-                "root_cause": "Technical root cause analysis",
-                "recommendations": ["Specific recommendation 1", "Specific recommendation 2"],
-                "retry_test": true/false,
-                "confidence": 0.85,
-                "severity": "high/medium/low"
-            }}
-            """
-            
-            response = model.generate_content(prompt)
-            response_text = response.text
-            
-            # Parse JSON response
-            try:
-                agent_result = json.loads(response_text)
-                return {
-                    "success": True,
-                    "agent_response": agent_result,
-                    "raw_response": response_text,
-                    "ai_provider": "gemini",
-                    "model": "gemini-pro",
-                    "timestamp": datetime.now().isoformat()
-                }
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                return {
-                    "success": True,
-                    "agent_response": {
-                        "problem": "AI analysis completed but response format was unexpected",
-                        "root_cause": "Response parsing issue",
-                        "recommendations": ["Review AI response format", "Check API configuration"],
-                        "retry_test": False,
-                        "confidence": 0.5,
-                        "severity": "medium"
-                    },
-                    "raw_response": response_text,
-                    "ai_provider": "gemini",
-                    "model": "gemini-pro",
-                    "timestamp": datetime.now().isoformat()
-                }
-                
+            return self.run_memory.nearest(test_results, AGENT_MEMORY_NEIGHBOURS, exclude_test_id=test_results.get('testId'))
         except Exception as e:
-            print(f"Gemini analysis failed: {e}")
-            return {
-                "success": False,
-                "error": f"Gemini analysis failed: {str(e)}",
-                "ai_provider": "gemini",
-                "timestamp": datetime.now().isoformat()
+            print(f"Agent memory lookup failed: {e}")
+            return []
+
+    def _llm_evidence(self, test_results, statistical, similar_runs):
+        """Results plus statistical findings and similar past runs as one-line evidence for the prompt"""
+        evidence = {}
+        if statistical and statistical['findings']:
+            evidence['statisticalFindings'] = [f"{f['severity']}: {f['message']}" for f in statistical['findings']]
+        if similar_runs:
+            evidence['similarRuns'] = [
+                f"{run['testId']} ({run['similarity']:.0%} similar): p95 {run['summary'].get('p95')} ms, "
+                f"success {run['summary'].get('successRate') or 0:.1f}%, "
+                f"{run['analysis'].get('severity')}: {(run['analysis'].get('problem') or '')[:120]}"
+                for run in similar_runs
+            ]
+        return dict(test_results, **evidence) if evidence else test_results
+
+    def _provider_analysis(self, cache_key, jmeter_output, image_url=None):
+        """Call the configured provider and cache a complete analysis from it"""
+        # A leader that finished after this caller's cache miss may have stored the analysis already
+        cached = self.analysis_cache.get(cache_key, count=False)
+        if cached is not None:
+            return dict(cached, cached=True)
+        
+        result = self._llm_analysis(jmeter_output, image_url)
+        
+        if self._cacheable(result):
+            self.analysis_cache.put(cache_key, result)
+        return result
+
+    def _cacheable(self, result):
+        """
+        A complete verdict from the provider and model the cache key names. A
+        placeholder for an unparsable reply, or an answer from a secondary
+        provider, would otherwise be served for identical results until it expires.
+        """
+        return (result.get("success") and not result.get("validation_errors")
+                and result.get("ai_provider") == self.ai_provider and result.get("model") == self._model_name())
+
+    def _llm_analysis(self, jmeter_output, image_url=None):
+        """
+        Analysis through the provider router. Raises ProviderError when every
+        provider failed or is circuit-open, so agent_brain falls back at once.
+        Results that carry a testId are streamed to that test's room.
+        """
+        prompt, prompt_stats = build_analysis_prompt(jmeter_output, AI_PROMPT_TOKEN_BUDGET)
+        test_id = jmeter_output.get('testId') if isinstance(jmeter_output, dict) else None
+        on_chunk = self._stream_to_room(test_id) if AI_STREAM_ANALYSIS and test_id else None
+        response_text, provider = self.provider_router.complete(prompt, 1000, image_url, on_chunk)
+        
+        # Parse and validate the assembled JSON response
+        agent_result, problems = parse_verdict(response_text)
+        if agent_result is None:
+            # Fallback if JSON parsing fails
+            agent_result = {
+                "problem": "AI analysis completed but response format was unexpected",
+                "root_cause": "Response parsing issue",
+                "recommendations": ["Review AI response format", "Check API configuration"],
+                "retry_test": False,
+                "confidence": 0.5,
+                "severity": "medium"
             }
+        
+        if on_chunk:
+            socketio.emit('ai_analysis_stream_end', {
+                'test_id': test_id,
+                'provider': provider.name,
+                'valid': not problems,
+                'agent_response': agent_result
+            }, to=test_id)
+        
+        result = {
+            "success": True,
+            "agent_response": agent_result,
+            "raw_response": response_text,
+            "ai_provider": provider.name,
+            "model": provider.model,
+            "prompt_stats": prompt_stats,
+            "timestamp": datetime.now().isoformat()
+        }
+        if problems:
+            result["validation_errors"] = problems
+        return result
+
+    def _stream_to_room(self, test_id):
+        """Chunk callback forwarding partial analysis text to a test's Socket.IO room"""
+        sequence = [0]
+        
+        def on_chunk(text, provider):
+            socketio.emit('ai_analysis_chunk', {
+                'test_id': test_id,
+                'provider': provider.name,
+                'sequence': sequence[0],
+                'text': text
+            }, to=test_id)
+            sequence[0] += 1
+        
+        return on_chunk
 
     def analyze_performance_data(self, test_results, image_url=None):
         """Analyze performance test results with AI agent"""
@@ -261,29 +427,7 @@ class PerformanceAnalyzer:
             ai_result = self.agent_brain(test_results, image_url)
             
             if ai_result.get("success"):
-                # Store in agent memory
-                memory_entry = {
-                    "timestamp": datetime.now().isoformat(),
-                    "test_results": test_results,
-                    "ai_analysis": ai_result,
-                    "image_url": image_url
-                }
-                self.agent_memory.append(memory_entry)
-                
-                # Keep only last 50 entries
-                if len(self.agent_memory) > 50:
-                    self.agent_memory = self.agent_memory[-50:]
-                
-                # Determine overall assessment
-                assessment = self._determine_assessment(ai_result)
-                
-                return {
-                    "success": True,
-                    "assessment": assessment,
-                    "ai_analysis": ai_result,
-                    "memory_count": len(self.agent_memory),
-                    "timestamp": datetime.now().isoformat()
-                }
+                return self._complete_analysis(test_results, ai_result, image_url)
             else:
                 return ai_result
                 
@@ -295,6 +439,107 @@ class PerformanceAnalyzer:
                 "timestamp": datetime.now().isoformat()
             }
 
+    def _complete_analysis(self, test_results, ai_result, image_url=None):
+        """Store a successful analysis in agent memory and add the overall assessment"""
+        # Store in agent memory, one analysis per test: a cached or coalesced result is new to a test
+        # that has not been analyzed before. Without a test id it would only repeat a stored run; a
+        # reply that did not parse into a complete verdict is not worth recalling
+        if (isinstance(test_results, dict) and not ai_result.get("validation_errors")
+                and (test_results.get("testId") or not (ai_result.get("cached") or ai_result.get("coalesced")))):
+            try:
+                self.run_memory.add(test_results, ai_result)
+            except Exception as e:
+                print(f"Failed to store analysis in agent memory: {e}")
+        
+        # Determine overall assessment
+        assessment = self._determine_assessment(ai_result)
+        
+        return {
+            "success": True,
+            "assessment": assessment,
+            "ai_analysis": ai_result,
+            "memory_count": self.run_memory.count(),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def analyze_batch(self, runs):
+        """
+        Analyze several test runs with as few provider calls as possible.
+        Cached runs are reused, the rest are packed into batch prompts within
+        AI_BATCH_TOKEN_BUDGET, and runs a batch reply does not cover are
+        analyzed one by one.
+        """
+        analyses = [None] * len(runs)
+        stats = {"runs": len(runs), "cached": 0, "batched": 0, "fallbacks": 0, "provider_calls": 0}
+        
+        pending = []
+        for i, test_results in enumerate(runs):
+            if self.ai_provider == 'fallback':
+                analyses[i] = self.analyze_performance_data(test_results)
+                continue
+            
+            cache_key = analysis_key(test_results, self.ai_provider, self._model_name(), PROMPT_VERSION)
+            cached = self.analysis_cache.get(cache_key)
+            if cached is not None:
+                analyses[i] = self._complete_analysis(test_results, dict(cached, cached=True))
+                stats["cached"] += 1
+            else:
+                pending.append((i, cache_key))
+        
+        # Runs plus their statistical findings and similar past runs, as sent to the provider
+        evidence = {
+            i: self._llm_evidence(runs[i], self._statistical_analysis(runs[i]), self._similar_runs(runs[i]))
+            for i, _ in pending
+        }
+        
+        while pending:
+            prompt, packed = build_batch_prompt(
+                [evidence[i] for i, _ in pending[:AI_BATCH_MAX_RUNS]], AI_BATCH_TOKEN_BUDGET
+            )
+            batch, pending = pending[:packed], pending[packed:]
+            
+            verdicts = {}
+            try:
+                stats["provider_calls"] += 1
+                response_text, provider = self._provider_completion(prompt, AI_BATCH_TOKENS_PER_RUN * packed)
+                verdicts = parse_batch_response(response_text, packed)
+            except Exception as e:
+                print(f"Batch analysis of {packed} runs failed, analyzing them one by one: {e}")
+            
+            for position, (i, cache_key) in enumerate(batch):
+                if position in verdicts:
+                    ai_result = {
+                        "success": True,
+                        "agent_response": verdicts[position],
+                        "ai_provider": provider.name,
+                        "model": provider.model,
+                        "batched": True,
+                        "timestamp": datetime.now().isoformat()
+                    }
+                    if self._cacheable(ai_result):
+                        self.analysis_cache.put(cache_key, ai_result)
+                    analyses[i] = self._complete_analysis(runs[i], ai_result)
+                    stats["batched"] += 1
+                else:
+                    analyses[i] = self.analyze_performance_data(runs[i])
+                    stats["fallbacks"] += 1
+                    if not analyses[i].get("ai_analysis", {}).get("cached"):
+                        stats["provider_calls"] += 1
+        
+        for test_results, analysis in zip(runs, analyses):
+            analysis["testId"] = test_results.get("testId")
+        
+        return {
+            "success": True,
+            "analyses": analyses,
+            "batch_stats": stats,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def _provider_completion(self, prompt, max_tokens=1000):
+        """Raw text completion of a prompt through the provider router, and the provider that answered"""
+        return self.provider_router.complete(prompt, max_tokens)
+
     def _determine_assessment(self, agent_result):
         """Determine overall performance assessment based on AI analysis"""
         try:
@@ -317,48 +562,27 @@ class PerformanceAnalyzer:
         except Exception as e:
             return "Assessment Error - Unable to Determine"
 
-    def _generate_fallback_analysis(self, test_results):
-        """Generate basic analysis when AI services are unavailable"""
+    def _generate_fallback_analysis(self, test_results, statistical=None):
+        """Statistical-engine analysis when AI services are unavailable"""
         try:
-            # Basic rule-based analysis
-            total_requests = test_results.get('totalRequests', 0)
-            successful_requests = test_results.get('successfulRequests', 0)
-            avg_response_time = test_results.get('avgResponseTime', 0)
-            
-            success_rate = (successful_requests / total_requests * 100) if total_requests > 0 else 0
+            if statistical is None:
+                statistical = analyze_results(test_results)
+            verdict = statistical['verdict']
             
             # Determine performance level
-            if success_rate >= 95 and avg_response_time <= 500:
-                assessment = "Good Performance"
-                problem = "No significant problems detected"
-                recommendations = ["Continue monitoring", "Consider load testing at higher scale"]
-                retry_test = False
-                severity = "low"
-            elif success_rate >= 80 and avg_response_time <= 1000:
-                assessment = "Moderate Performance"
-                problem = "Some performance degradation detected"
-                recommendations = ["Optimize database queries", "Consider caching", "Monitor resource usage"]
-                retry_test = True
-                severity = "medium"
-            else:
-                assessment = "Poor Performance"
-                problem = "Significant performance issues detected"
-                recommendations = ["Investigate server resources", "Check database performance", "Review application code"]
-                retry_test = True
-                severity = "high"
+            assessment = {
+                "low": "Good Performance",
+                "medium": "Moderate Performance",
+                "high": "Poor Performance"
+            }[verdict['severity']]
             
             return {
                 "success": True,
-                "agent_response": {
-                    "problem": problem,
-                    "root_cause": "Basic analysis - AI services unavailable",
-                    "recommendations": recommendations,
-                    "retry_test": retry_test,
-                    "confidence": 0.6,
-                    "severity": severity
-                },
+                "agent_response": verdict,
                 "assessment": assessment,
                 "ai_provider": "fallback",
+                "engine": "statistical",
+                "statistical_analysis": statistical,
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -372,6 +596,36 @@ class PerformanceAnalyzer:
 
 # Initialize analyzer
 analyzer = PerformanceAnalyzer()
+analysis_queue = AnalysisJobQueue(ANALYSIS_WORKERS, ANALYSIS_QUEUE_SIZE)
+
+# Background health probes; /health serves their cached results
+health_monitor = HealthMonitor(HEALTH_DEEP_MIN_INTERVAL)
+health_monitor.register('disk', lambda: disk_probe(jmeter_runner.results_dir, HEALTH_MIN_FREE_DISK_MB),
+                        HEALTH_PROBE_INTERVAL, timeout=1, critical=True)
+# The JMeter probe starts a JVM, so it waits until startup is over
+health_monitor.register('jmeter', lambda: jmeter_probe(jmeter_runner.jmeter_bin),
+                        HEALTH_JMETER_PROBE_INTERVAL, timeout=15, delay=HEALTH_JMETER_PROBE_DELAY)
+for provider_name, provider in analyzer.providers.items():
+    health_monitor.register(provider_name, lambda provider=provider: provider_probe(provider),
+                            HEALTH_PROVIDER_PROBE_INTERVAL, timeout=5)
+health_monitor.start()
+
+# Backend state read when /metrics is scraped
+REGISTRY.gauge('ludo_monitor_threads', 'Real-time test monitor threads running', function=lambda: len(monitored_tests))
+REGISTRY.gauge('ludo_tests_running', 'Tests running',
+               function=lambda: sum(1 for test in list(jmeter_runner.active_tests.values())
+                                    if test.get('status') == 'running'))
+REGISTRY.gauge('ludo_analysis_queue_depth', 'Analysis jobs waiting for a worker',
+               function=lambda: analysis_queue.stats()['queue_depth'])
+REGISTRY.gauge('ludo_analysis_jobs_running', 'Analysis jobs running', function=lambda: analysis_queue.stats()['running'])
+REGISTRY.gauge('ludo_llm_circuit_open', 'Whether a provider\'s circuit breaker is open', ('provider',),
+               function=lambda: {(name,): int(provider.breaker.stats().get('state') == 'open')
+                                 for name, provider in analyzer.providers.items()})
+REGISTRY.gauge('ludo_health_check_up', 'Whether a health check\'s last cached result is ok', ('check',),
+               function=lambda: {(name,): int(check['status'] == 'ok')
+                                 for name, check in health_monitor.snapshot()['checks'].items()
+                                 if check['status'] != 'pending'})
+startup.mark('analyzer, queues and health probes')
 
 # WebSocket event handlers
 @socketio.on('connect')
@@ -390,20 +644,62 @@ def handle_join_test_monitor(data):
     test_id = data.get('test_id')
     if test_id:
         test_monitors[request.sid] = test_id
+        join_room(test_id)  # Receives streamed AI analysis of this test
         print(f"Client {request.sid} monitoring test {test_id}")
 
+def _live_monitor(test_id):
+    """
+    Tails a test's results for its /metrics series and the streaming detectors,
+    which emit test_anomaly events; None when both are disabled
+    """
+    if not (LIVE_ANOMALY_DETECTION or METRICS_ENABLED):
+        return None
+    
+    def on_event(event):
+        socketio.emit('test_anomaly', event)
+        socketio.emit(f'test_{test_id}_anomaly', event)
+    
+    return LiveAnomalyMonitor(test_id, jmeter_runner.results_dir / f"{test_id}.jtl", on_event,
+                              detect=LIVE_ANOMALY_DETECTION)
+
+def _drop_test_metrics(live):
+    """Remove a finished test's series once METRICS_TEST_RETENTION has passed"""
+    timer = threading.Timer(METRICS_TEST_RETENTION, live.drop_metrics)
+    timer.daemon = True
+    timer.start()
+
+def _record_history(test_id):
+    """Add a finished test to the history index; the runner calls this once its final status is set"""
+    status = jmeter_runner.get_test_status(test_id)
+    try:
+        test_history.record(status, status.get('config', {}).get('slo'))
+        finalized_tests.add(test_id)
+    except Exception as e:
+        print(f"Could not record history of {test_id}: {e}")
+
+jmeter_runner.on_finished = _record_history
+
 def monitor_test_real_time(test_id, test_config):
     """Monitor JMeter test in real-time and emit updates"""
+    monitored_tests.add(test_id)
+    live = None
     try:
         start_time = time.time()
-        duration = test_config.get('duration', 60)
+        # How long the engine runs: soak tests run twice the duration, after the ramp-up
+        profile = load_profile(test_config)
+        duration = profile['ramp_up'] + profile['duration']
+        live = _live_monitor(test_id)
         
-        while time.time() - start_time < duration:
+        # Engines take a moment past the duration to stop and write their results
+        while time.time() - start_time < duration + MONITOR_GRACE_SECONDS:
             try:
                 # Get current test status
                 status = jmeter_runner.get_test_status(test_id)
                 
                 if status.get('status') == 'running':
+                    if live:
+                        live.poll(time.time())
+                    
                     # Calculate progress
                     elapsed = time.time() - start_time
                     progress = min((elapsed / duration) * 100, 100)
@@ -417,16 +713,24 @@ def monitor_test_real_time(test_id, test_config):
                         'avg_response_time': status.get('results', {}).get('avgResponseTime', 0),
                         'success_rate': status.get('results', {}).get('successRate', 0),
                         'requests_per_second': status.get('results', {}).get('requestsPerSecond', 0),
+                        'open_anomalies': len(live.open) if live else 0,
                         'timestamp': datetime.now().isoformat()
                     }
                     
-                    # Emit to all clients monitoring this test
-                    socketio.emit('test_update', real_time_data)
-                    
-                    # Also emit to specific test room
-                    socketio.emit(f'test_{test_id}_update', real_time_data)
+                    with STAGES.span(test_id, 'emit'):
+                        # Emit to all clients monitoring this test
+                        socketio.emit('test_update', real_time_data)
+                        
+                        # Also emit to specific test room
+                        socketio.emit(f'test_{test_id}_update', real_time_data)
                     
                 elif status.get('status') == 'completed':
+                    if live:
+                        anomalies = live.finish()
+                        if LIVE_ANOMALY_DETECTION and status.get('results'):
+                            # Anomaly windows become evidence for the post-test analysis
+                            status['results']['liveAnomalies'] = anomalies
+                    
                     # Test completed, emit final results
                     final_results = {
                         'test_id': test_id,
@@ -436,18 +740,17 @@ def monitor_test_real_time(test_id, test_config):
                         'timestamp': datetime.now().isoformat()
                     }
                     
-                    socketio.emit('test_completed', final_results)
-                    socketio.emit(f'test_{test_id}_completed', final_results)
+                    with STAGES.span(test_id, 'emit_completed'):
+                        socketio.emit('test_completed', final_results)
+                        socketio.emit(f'test_{test_id}_completed', final_results)
                     
-                    # Generate AI analysis
+                    # Generate AI analysis in the background; the result arrives via ai_analysis_ready
                     if status.get('results'):
-                        ai_analysis = analyzer.analyze_performance_data(status['results'])
-                        final_results['ai_analysis'] = ai_analysis
-                        
-                        socketio.emit('ai_analysis_ready', {
-                            'test_id': test_id,
-                            'analysis': ai_analysis
-                        })
+                        try:
+                            analysis_queue.submit(_timed_analysis, test_id, status['results'],
+                                                  on_complete=_emit_analysis_ready, test_id=test_id)
+                        except QueueFullError as e:
+                            print(f"Skipping AI analysis for {test_id}: {e}")
                     
                     break
                     
@@ -464,6 +767,9 @@ def monitor_test_real_time(test_id, test_config):
                     socketio.emit(f'test_{test_id}_failed', error_data)
                     break
                 
+                elif status.get('status') == 'stopped':
+                    break
+                
                 time.sleep(2)  # Update every 2 seconds
                 
             except Exception as e:
@@ -477,6 +783,10 @@ def monitor_test_real_time(test_id, test_config):
             'error': str(e),
             'timestamp': datetime.now().isoformat()
         })
+    finally:
+        monitored_tests.discard(test_id)
+        if live:
+            _drop_test_metrics(live)
 
 @app.route('/')
 def home():
@@ -491,41 +801,216 @@ def home():
         "backend_url": BACKEND_URL,
         "frontend_url": FRONTEND_URL,
         "endpoints": {
-            "POST /analyze": "Analyze performance test results with AI",
-            "POST /analyze/image": "Analyze performance test results with image",
-            "GET /health": "Health check",
-            "POST /test/start": "Start a new JMeter test",
+            "POST /analyze": "Queue an AI analysis of test results (202 + job id, ?sync=true to wait)",
+            "POST /analyze/image": "Queue an AI analysis of test results with image",
+            "POST /analyze/batch": "Queue one AI analysis of many test runs ({runs: [...]})",
+            "GET /analyze/:job_id": "Get analysis job status and result",
+            "GET /health": "Health check from cached background probes",
+            "GET /health/deep": "Run the health probes now (?checks=jmeter,disk,...)",
+            "GET /health/startup": "Startup phase timings and time to first request",
+            "GET /metrics": "Prometheus metrics: live per-test series and backend internals",
+            "POST /admin/profile": "Sample the backend's stacks for a window and write a profile (admin)",
+            "GET /admin/profile": "Running and written profiles (admin)",
+            "POST /test/start": "Start a new JMeter test (engine: jmeter or native)",
             "GET /test/:id/status": "Get test status",
             "GET /tests": "List all tests",
-            "POST /test/:id/stop": "Stop a running test"
+            "POST /test/:id/stop": "Stop a running test",
+            "GET /test/:id/compare?baseline=:id": "Compare a run against a baseline run",
+            "GET /tests/history": "Paginated, filterable history of finished tests",
+            "GET /tests/history/aggregate": "Metric trends over the history (e.g. p95 per URL per day)"
         }
     })
 
 @app.route('/health')
 def health():
-    # Check JMeter availability
-    jmeter_available = False
-    jmeter_path = os.getenv('JMETER_HOME', 'C:\\Users\\Sneha\\Downloads\\apache-jmeter-5.6.3')
-    jmeter_bin = os.path.join(jmeter_path, 'bin', 'jmeter.bat' if os.name == 'nt' else 'jmeter')
-    
-    if os.path.exists(jmeter_bin):
-        try:
-            result = subprocess.run([jmeter_bin, '--version'], 
-                                  capture_output=True, text=True, timeout=5)
-            jmeter_available = result.returncode == 0
-        except:
-            jmeter_available = False
-    
+    """Cached probe results; never probes anything itself"""
+    return _health_response(health_monitor.snapshot())
+
+@app.route('/health/deep')
+def health_deep():
+    """Re-run probes now (?checks=jmeter,disk limits which ones)"""
+    names = [name for name in request.args.get('checks', '').split(',') if name]
+    return _health_response(run_blocking(health_monitor.deep, names or None))
+
+@app.route('/health/startup')
+def health_startup():
+    """Boot phase durations, time to the first served request and lazily imported modules"""
+    return jsonify(startup.report(LAZY_MODULES))
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint; OpenMetrics when the Accept header asks for it"""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled (METRICS_ENABLED=false)"}), 404
+    openmetrics = wants_openmetrics(request.headers.get('Accept'))
+    return app.response_class(REGISTRY.render(openmetrics),
+                              content_type=OPENMETRICS_CONTENT_TYPE if openmetrics else CONTENT_TYPE)
+
+def _is_loopback(address):
+    try:
+        ip = ipaddress.ip_address(address or '')
+    except ValueError:
+        return False
+    return (getattr(ip, 'ipv4_mapped', None) or ip).is_loopback
+
+def _admin_denied():
+    """403 response unless the request may use the admin endpoints, otherwise None"""
+    if ADMIN_TOKEN:
+        if hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+            return None
+    elif not IS_PRODUCTION and _is_loopback(request.remote_addr):
+        # HOST defaults to 0.0.0.0, so without a token only this machine may profile
+        return None
     return jsonify({
-        "status": "healthy",
+        "success": False,
+        "error": "Admin endpoints need a valid X-Admin-Token header (ADMIN_TOKEN)"
+    }), 403
+
+@app.route('/admin/profile', methods=['POST'])
+def start_profile():
+    """Sample every thread's stack for a window ({duration: seconds, interval_ms}) and write the profile"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    try:
+        profile = profiler.start(float(data.get('duration', 30)), float(data.get('interval_ms', 10)) / 1000)
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": f"Invalid profile window: {e}"}), 400
+    except RuntimeError as e:
+        return jsonify({"success": False, "error": str(e)}), 409
+    return jsonify({
+        "success": True,
+        "profile": profile,
+        "status_url": "/admin/profile"
+    }), 202
+
+@app.route('/admin/profile', methods=['GET'])
+def get_profile_status():
+    """Running profile, the last finished one and the profiles written so far"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    return jsonify(dict(profiler.status(), success=True))
+
+@app.route('/admin/profile/<name>', methods=['GET'])
+def download_profile(name):
+    """A written profile: <id>.folded (flame graph input) or <id>.json (top functions)"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if not (name.startswith('profile_') and name.endswith(('.folded', '.json'))):
+        return jsonify({"success": False, "error": "Not a profile file"}), 404
+    return send_from_directory(os.path.abspath(PROFILE_DIR), name)
+
+@app.after_request
+def _record_first_request(response):
+    startup.request_served(request.path)
+    return response
+
+def _health_response(snapshot):
+    response = jsonify({
+        "status": snapshot["status"],
         "timestamp": datetime.now().isoformat(),
         "gemini_available": GEMINI_API_KEY != 'your-gemini-api-key-here',
         "openrouter_available": OPENROUTER_API_KEY != 'your-openrouter-api-key-here',
         "ai_provider": analyzer.ai_provider,
-        "jmeter_available": jmeter_available,
-        "jmeter_path": jmeter_path,
-        "environment": "production" if IS_PRODUCTION else "development"
+        "jmeter_available": health_monitor.status_of('jmeter') == 'ok',
+        "jmeter_path": jmeter_runner.jmeter_home,
+        "environment": "production" if IS_PRODUCTION else "development",
+        "checks": snapshot["checks"]
     })
+    # Load balancers take a failed critical check (disk space) out of rotation
+    if snapshot["status"] == "unhealthy":
+        response.status_code = 503
+    return response
+
+def _auto_retry(data, analysis_result):
+    """Schedule a retry of the analyzed test when the AI agent recommends one"""
+    agent_response = analysis_result.get("ai_analysis", {}).get("agent_response", {})
+    if not (analysis_result.get("success") and agent_response.get("retry_test", False)):
+        analysis_result["auto_retry"] = {
+            "triggered": False,
+            "reason": "No retry recommended by AI agent"
+        }
+        return analysis_result
+    
+    # Retries reuse the original test config, so only known tests can be retried
+    test_info = jmeter_runner.active_tests.get(data.get("testId"))
+    if test_info is None:
+        analysis_result["auto_retry"] = {
+            "triggered": False,
+            "reason": "Retry recommended, but the analyzed results do not belong to a known test"
+        }
+        return analysis_result
+    
+    try:
+        analysis_result["auto_retry"] = retry_scheduler.request_retry(
+            test_info["config"], reason=agent_response.get("problem")
+        )
+    except Exception as retry_error:
+        analysis_result["auto_retry"] = {
+            "triggered": False,
+            "error": f"Retry test failed: {str(retry_error)}"
+        }
+    
+    return analysis_result
+
+def _analyze_with_auto_retry(data):
+    """Analysis job for /analyze: AI agent analysis followed by the auto-retry decision"""
+    return _auto_retry(data, analyzer.analyze_performance_data(data))
+
+def _timed_analysis(test_id, test_results):
+    """Post-test analysis of a finished test, timed as its 'analysis' stage"""
+    with STAGES.span(test_id, 'analysis'):
+        return analyzer.analyze_performance_data(test_results)
+
+def _emit_analysis_ready(job):
+    """Push a finished analysis job to Socket.IO clients"""
+    started = time.perf_counter()
+    socketio.emit('ai_analysis_ready', {
+        'job_id': job['job_id'],
+        'test_id': job.get('test_id'),
+        'status': job['status'],
+        'analysis': job.get('result'),
+        'error': job.get('error')
+    })
+    if job.get('test_id'):
+        STAGES.record(job['test_id'], 'emit_analysis', time.perf_counter() - started)
+
+def _wants_sync():
+    """Callers can opt into the old blocking behaviour with ?sync=true"""
+    return request.args.get('sync', '').lower() in ('1', 'true', 'yes')
+
+def _json_flag(value):
+    """Boolean from a JSON body field: true/false, or the strings and numbers ?sync= accepts"""
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes'):
+        return True
+    if text in ('0', 'false', 'no', ''):
+        return False
+    raise ValueError(f"expected a boolean, got {value!r}")
+
+def _submit_analysis(fn, *args, test_id=None):
+    """Queue an analysis job and answer 202 with its id, or 503 when the queue is full"""
+    try:
+        job = analysis_queue.submit(fn, *args, on_complete=_emit_analysis_ready, test_id=test_id)
+    except QueueFullError as e:
+        response = jsonify({
+            "success": False,
+            "error": str(e)
+        })
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    return jsonify({
+        "success": True,
+        "job_id": job['job_id'],
+        "status": job['status'],
+        "status_url": f"/analyze/{job['job_id']}"
+    }), 202
 
 @app.route('/analyze', methods=['POST'])
 def analyze_performance():
@@ -538,41 +1023,10 @@ def analyze_performance():
                 "error": "No test data provided"
             }), 400
         
-        # Perform AI agent analysis
-        analysis_result = analyzer.analyze_performance_data(data)
-        
-        # Check if agent recommends retry test
-        if analysis_result.get("success") and analysis_result.get("agent_response", {}).get("retry_test", False):
-            # Auto-trigger new test if recommended
-            try:
-                retry_response = requests.post(f'{BACKEND_URL}/test/start', 
-                                             json=data,  # Use same test parameters
-                                             headers={'Content-Type': 'application/json'})
-                
-                if retry_response.status_code == 200:
-                    retry_data = retry_response.json()
-                    analysis_result["auto_retry"] = {
-                        "triggered": True,
-                        "new_test_id": retry_data.get("testId"),
-                        "message": "Auto-retry test initiated based on AI agent recommendation"
-                    }
-                else:
-                    analysis_result["auto_retry"] = {
-                        "triggered": False,
-                        "error": "Failed to start retry test"
-                    }
-            except Exception as retry_error:
-                analysis_result["auto_retry"] = {
-                    "triggered": False,
-                    "error": f"Retry test failed: {str(retry_error)}"
-                }
-        else:
-            analysis_result["auto_retry"] = {
-                "triggered": False,
-                "reason": "No retry recommended by AI agent"
-            }
+        if _wants_sync():
+            return jsonify(_analyze_with_auto_retry(data))
         
-        return jsonify(analysis_result)
+        return _submit_analysis(_analyze_with_auto_retry, data, test_id=data.get('testId'))
         
     except Exception as e:
         return jsonify({
@@ -595,9 +1049,10 @@ def analyze_performance_with_image():
         image_url = data.get('image_url')
         
         # Perform AI agent analysis with image
-        analysis_result = analyzer.analyze_performance_data(test_data, image_url)
+        if _wants_sync():
+            return jsonify(analyzer.analyze_performance_data(test_data, image_url))
         
-        return jsonify(analysis_result)
+        return _submit_analysis(analyzer.analyze_performance_data, test_data, image_url, test_id=test_data.get('testId'))
         
     except Exception as e:
         return jsonify({
@@ -605,6 +1060,62 @@ def analyze_performance_with_image():
             "error": f"AI agent analysis with image failed: {str(e)}"
         }), 500
 
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_performance_batch():
+    """AI Agent Analysis of many test runs in few provider calls (no auto-retry)"""
+    try:
+        data = request.get_json()
+        runs = data.get('runs') if isinstance(data, dict) else None
+        if not isinstance(runs, list) or not runs or not all(isinstance(run, dict) for run in runs):
+            return jsonify({
+                "success": False,
+                "error": "runs must be a non-empty list of test results"
+            }), 400
+        
+        if _wants_sync():
+            return jsonify(analyzer.analyze_batch(runs))
+        
+        return _submit_analysis(analyzer.analyze_batch, runs)
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"AI agent batch analysis failed: {str(e)}"
+        }), 500
+
+@app.route('/analyze/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Get the status (and, once finished, the result) of an analysis job"""
+    job = analysis_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "error": "Analysis job not found"
+        }), 404
+    
+    if job['status'] in ('completed', 'failed'):
+        # Finished jobs are immutable
+        return body_cache.response(('job', job_id), lambda: {"success": True, "job": job})
+    return jsonify({
+        "success": True,
+        "job": job
+    })
+
+def _launch_test(test_config):
+    """Start a test on its engine and its real-time monitor; used by /test/start and retries"""
+    result = jmeter_runner.run_jmeter_test(test_config)
+    if result['success']:
+        # Start real-time monitoring in a separate thread
+        threading.Thread(target=monitor_test_real_time, args=(test_config['id'], test_config)).start()
+    return result
+
+def _test_running(test_id):
+    test_info = jmeter_runner.active_tests.get(test_id)
+    return test_info is not None and test_info['status'] == 'running'
+
+retry_scheduler = RetryScheduler(_launch_test, AUTO_RETRY_MAX, AUTO_RETRY_BACKOFF, AUTO_RETRY_BACKOFF_FACTOR,
+                                 _test_running)
+
 @app.route('/test/start', methods=['POST'])
 def start_test():
     """Start a new JMeter performance test"""
@@ -625,6 +1136,85 @@ def start_test():
                     "error": f"Missing required field: {field}"
                 }), 400
         
+        engine = data.get("engine", DEFAULT_LOAD_ENGINE)
+        if engine not in LOAD_ENGINES:
+            return jsonify({
+                "success": False,
+                "error": f"Unknown engine: {engine}. Expected one of {', '.join(LOAD_ENGINES)}"
+            }), 400
+        
+        recording = data.get("recording", DEFAULT_RECORDING_MODE)
+        if recording not in RECORDING_MODES:
+            return jsonify({
+                "success": False,
+                "error": f"Unknown recording mode: {recording}. Expected one of {', '.join(RECORDING_MODES)}"
+            }), 400
+        
+        # Access-log replay runs on the native engine only
+        replay = None
+        if data.get("replay"):
+            replay_request = data["replay"]
+            if "engine" in data and engine != "native":
+                return jsonify({
+                    "success": False,
+                    "error": "Access-log replay requires the native engine"
+                }), 400
+            try:
+                if not isinstance(replay_request, dict):
+                    raise ValueError("replay must be an object")
+                replay = {
+                    "log_file": resolve_log_file(replay_request.get("accessLog", ""), REPLAY_LOG_DIR),
+                    "speedup": float(replay_request.get("speedup", 1.0)),
+                    "methods": normalize_methods(replay_request.get("methods"))
+                }
+            except (ValueError, TypeError) as e:
+                return jsonify({
+                    "success": False,
+                    "error": f"Invalid replay configuration: {str(e)}"
+                }), 400
+            if replay["speedup"] <= 0:
+                return jsonify({
+                    "success": False,
+                    "error": "Invalid replay configuration: speedup must be positive"
+                }), 400
+            engine = "native"
+        
+        # Weighted multi-endpoint scenario (defaults to a single GET on the target URL)
+        try:
+            scenario = normalize_scenario(data.get("scenario"), data["url"])
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": f"Invalid scenario: {str(e)}"
+            }), 400
+        
+        # Coordinated-omission correction: checked now, since the results are only parsed at the end
+        try:
+            co_correction = _json_flag(data.get("coCorrection", False))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": f"Invalid coCorrection: {str(e)}"
+            }), 400
+        expected_interval = data.get("expectedInterval")
+        if expected_interval is not None:
+            if isinstance(expected_interval, str) and expected_interval.strip().isdigit():
+                expected_interval = int(expected_interval)
+            if isinstance(expected_interval, bool) or not isinstance(expected_interval, int) or expected_interval <= 0:
+                return jsonify({
+                    "success": False,
+                    "error": "Invalid expectedInterval: must be a positive integer (ms)"
+                }), 400
+        
+        # Thresholds the finished test is checked against (snake_case, error_rate in percent)
+        try:
+            slo = normalize_slo(data.get("slo"), DEFAULT_SLO)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": f"Invalid SLO: {str(e)}"
+            }), 400
+        
         # Create test configuration
         test_id = f"test_{int(datetime.now().timestamp())}"
         test_config = {
@@ -634,20 +1224,24 @@ def start_test():
             "users": data.get("users", 100),
             "duration": data.get("duration", 600),  # Convert to seconds
             "ramp_up": data.get("rampUp", 10),
-            "think_time": data.get("thinkTime", 1000)
+            "think_time": data.get("thinkTime", 1000),
+            "engine": engine,
+            "recording": recording,
+            "co_correction": co_correction,  # Coordinated-omission-corrected percentiles
+            "expected_interval": expected_interval,  # ms per thread, defaults to the think time
+            "replay": replay,
+            "scenario": scenario,
+            "slo": slo
         }
         
         # Start JMeter test
-        result = jmeter_runner.run_jmeter_test(test_config)
+        result = _launch_test(test_config)
         
         if result['success']:
-            # Start real-time monitoring in a separate thread
-            threading.Thread(target=monitor_test_real_time, args=(test_id, test_config)).start()
-
             return jsonify({
                 "success": True,
                 "testId": test_id,
-                "message": f"JMeter {test_config['type']} started successfully",
+                "message": f"{'Native' if engine == 'native' else 'JMeter'} {test_config['type']} started successfully",
                 "config": test_config
             })
         else:
@@ -667,10 +1261,31 @@ def get_test_status(test_id):
     """Get JMeter test status"""
     try:
         status = jmeter_runner.get_test_status(test_id)
-        return jsonify({
+        lineage = retry_scheduler.lineage_of(test_id)
+        found = 'testId' in status
+        if found and DEBUG_TIMINGS:
+            # Where the time went: JMX, launch, run, JTL parsing stages, analysis, emits
+            status['timings'] = STAGES.timings(test_id)
+        if test_id in finalized_tests and found:
+            # A finished run only changes when a retry joins its lineage (or, with
+            # timings, when a stage such as its analysis is recorded). Its status and
+            # results are keyed too: a stopped run turns completed once its engine exits
+            key = ('status', test_id, status['status'], 'results' in status, json.dumps(lineage, sort_keys=True),
+                   STAGES.version(test_id) if DEBUG_TIMINGS else None)
+            return body_cache.response(key, lambda: {"success": True, "status": dict(status, lineage=lineage)})
+        if found:
+            status['lineage'] = lineage
+        elif lineage['pending']:
+            # A retry waiting out its backoff has not reached the runner yet
+            status = {'testId': test_id, 'status': 'scheduled', 'lineage': lineage}
+        started = time.perf_counter()
+        response = jsonify({
             "success": True,
             "status": status
         })
+        if found:
+            STAGES.record(test_id, 'status_serialize', time.perf_counter() - started)
+        return response
     except Exception as e:
         return jsonify({
             "success": False,
@@ -681,6 +1296,8 @@ def get_test_status(test_id):
 def stop_test(test_id):
     """Stop a running JMeter test"""
     try:
+        if retry_scheduler.cancel(test_id):
+            return jsonify({'success': True, 'message': 'Scheduled retry cancelled'})
         result = jmeter_runner.stop_test(test_id)
         return jsonify(result)
     except Exception as e:
@@ -689,6 +1306,71 @@ def stop_test(test_id):
             "error": f"Failed to stop test: {str(e)}"
         }), 500
 
+@app.route('/test/<test_id>/compare', methods=['GET'])
+def compare_test(test_id):
+    """
+    Compare a finished run against ?baseline=<id> from their stored histograms.
+    Optional: alpha (significance level, default 0.05) and min_change
+    (smallest relative p95 change called a regression, default 0.05).
+    """
+    try:
+        baseline_id = request.args.get('baseline')
+        if not baseline_id:
+            return jsonify({
+                "success": False,
+                "error": "baseline query parameter is required"
+            }), 400
+        if not TEST_ID_PATTERN.match(baseline_id) or not TEST_ID_PATTERN.match(test_id):
+            return jsonify({
+                "success": False,
+                "error": "Test ids may only contain letters, digits and underscores"
+            }), 400
+        
+        try:
+            alpha = float(request.args.get('alpha', 0.05))
+            min_change = float(request.args.get('min_change', 0.05))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "alpha and min_change must be numbers"
+            }), 400
+        if not 0 < alpha < 1 or min_change < 0:
+            return jsonify({
+                "success": False,
+                "error": "alpha must be between 0 and 1 and min_change must not be negative"
+            }), 400
+        
+        def compare():
+            runs = {run_id: jmeter_runner.load_histograms(run_id) for run_id in (baseline_id, test_id)}
+            missing = [run_id for run_id, histograms in runs.items() if histograms is None]
+            if missing:
+                raise LookupError(f"No stored results for {', '.join(missing)}")
+            try:
+                comparison = run_blocking(compare_runs, runs[baseline_id], runs[test_id], alpha, min_change)
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                raise LookupError(f"Stored results are malformed: {e!r}")
+            return dict(
+                comparison,
+                success=True,
+                testId=test_id,
+                baselineId=baseline_id,
+                timestamp=datetime.now().isoformat()
+            )
+        
+        # Stored histograms never change, so neither does their comparison
+        try:
+            return body_cache.response(('compare', test_id, baseline_id, alpha, min_change), compare)
+        except LookupError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 404
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Failed to compare tests: {str(e)}"
+        }), 500
+
 @app.route('/tests', methods=['GET'])
 def list_tests():
     """List all JMeter tests"""
@@ -711,49 +1393,114 @@ def list_tests():
 
 @app.route('/tests/history', methods=['GET'])
 def get_test_history():
-    """Get test history from JMeter results"""
+    """
+    Finished tests, one page at a time (newest first by default). Query
+    parameters: limit (max 500), cursor (next_cursor of the previous page),
+    sort and order, and the filters type, url, url_prefix, engine, status,
+    slo (pass or fail), from and to (ISO dates or timestamps).
+    """
     try:
-        # Get completed tests from JMeter runner
-        tests = jmeter_runner.list_tests()
-        history = []
-        
-        for test_id in tests:
-            status = jmeter_runner.get_test_status(test_id)
-            if status.get('status') == 'completed' and 'results' in status:
-                results = status['results']
-                history.append({
-                    "id": test_id,
-                    "type": status.get('config', {}).get('type', 'Unknown'),
-                    "url": status.get('config', {}).get('url', 'Unknown'),
-                    "users": status.get('config', {}).get('users', 0),
-                    "duration": status.get('config', {}).get('duration', 0),
-                    "status": status.get('status', 'unknown'),
-                    "success_rate": results.get('successRate', 0),
-                    "avg_response_time": results.get('avgResponseTime', 0),
-                    "peak_rps": results.get('peakRPS', 0),
-                    "timestamp": status.get('startTime', datetime.now().isoformat())
-                })
-        
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        entries, next_cursor = test_history.page(
+            _history_filters(), request.args.get('sort', 'started_at'), request.args.get('order', 'desc'),
+            limit, request.args.get('cursor')
+        )
         return jsonify({
             "success": True,
-            "history": history
+            "history": entries,
+            "next_cursor": next_cursor,
+            "limit": limit
         })
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid history query: {str(e)}"
+        }), 400
     except Exception as e:
         return jsonify({
             "success": False,
             "error": f"Failed to get test history: {str(e)}"
         }), 500
 
+@app.route('/tests/history/aggregate', methods=['GET'])
+def get_test_history_aggregate():
+    """
+    Trend of a metric over the history: runs, avg, min and max of metric
+    (default p95) per group_by columns (comma-separated, default url) and
+    bucket (hour, day, week, month or none; default day), with the same
+    filters as /tests/history.
+    """
+    try:
+        group_by = [column for column in request.args.get('group_by', 'url').split(',') if column]
+        bucket = request.args.get('bucket', 'day')
+        rows = test_history.aggregate(
+            request.args.get('metric', 'p95'), group_by, None if bucket == 'none' else bucket, _history_filters()
+        )
+        return jsonify({
+            "success": True,
+            "aggregates": rows
+        })
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid aggregate query: {str(e)}"
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Failed to aggregate test history: {str(e)}"
+        }), 500
+
+def _history_filters():
+    return {name: request.args.get(name) for name in ('type', 'url', 'url_prefix', 'engine', 'status', 'slo', 'from', 'to')}
+
 @app.route('/agent/memory', methods=['GET'])
 def get_agent_memory():
-    """Get AI agent's analysis memory"""
-    return jsonify({
-        "success": True,
-        "agent_memory": analyzer.agent_memory,
-        "memory_count": len(analyzer.agent_memory),
-        "ai_provider": analyzer.ai_provider,
-        "timestamp": datetime.now().isoformat()
-    })
+    """
+    Get AI agent's analysis memory, newest first. Query parameters: offset,
+    limit (max 200), severity, test_id, or similar_to=<test_id> with k for the
+    runs most similar to that test's latest remembered run.
+    """
+    try:
+        similar_to = request.args.get('similar_to')
+        if similar_to:
+            reference = analyzer.run_memory.get_by_test_id(similar_to)
+            if reference is None:
+                return jsonify({
+                    "success": False,
+                    "error": f"No remembered run for test {similar_to}"
+                }), 404
+            
+            k = min(int(request.args.get('k', 5)), 50)
+            started = time.perf_counter()
+            neighbours = analyzer.run_memory.nearest_to_features(reference.pop('features'), k, exclude_test_id=similar_to)
+            return jsonify({
+                "success": True,
+                "reference": reference,
+                "similar_runs": neighbours,
+                "lookup_ms": (time.perf_counter() - started) * 1000,
+                "timestamp": datetime.now().isoformat()
+            })
+        
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+        entries, total = analyzer.run_memory.page(
+            offset, limit, request.args.get('severity'), request.args.get('test_id')
+        )
+        return jsonify({
+            "success": True,
+            "agent_memory": entries,
+            "memory_count": total,
+            "offset": offset,
+            "limit": limit,
+            "ai_provider": analyzer.ai_provider,
+            "timestamp": datetime.now().isoformat()
+        })
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "error": "offset, limit and k must be integers"
+        }), 400
 
 @app.route('/agent/status', methods=['GET'])
 def get_agent_status():
@@ -769,24 +1516,45 @@ def get_agent_status():
             "Auto-retry decision making",
             "Memory retention",
             "Image analysis (OpenRouter)",
+            "Statistical analysis (changepoints, error bursts, saturation, tail spread)",
             "JMeter integration"
         ],
         "gemini_connected": GEMINI_API_KEY != 'your-gemini-api-key-here',
         "openrouter_connected": OPENROUTER_API_KEY != 'your-openrouter-api-key-here',
         "ai_provider": analyzer.ai_provider,
-        "memory_entries": len(analyzer.agent_memory),
+        "memory_entries": analyzer.run_memory.count(),
+        "agent_memory": analyzer.run_memory.stats(),
+        "analysis_cache": analyzer.analysis_cache.stats(),
+        "analysis_queue": analysis_queue.stats(),
+        "single_flight": analyzer.single_flight.stats(),
+        "auto_retry": retry_scheduler.stats(),
+        "responses": {
+            "json_encoder": app.json.name,
+            "compression": compressor.stats(),
+            "body_cache": body_cache.stats()
+        },
+        "providers": analyzer.provider_router.stats() if analyzer.provider_router else None,
         "jmeter_available": True,
         "environment": "production" if IS_PRODUCTION else "development",
         "timestamp": datetime.now().isoformat()
     })
 
+startup.mark('routes')
+startup.ready()
+print(f"⏱️  {startup.summary()}")
+
 if __name__ == '__main__':
     print("🚀 Starting Ludeosaurous AI Performance Testing Suite...")
     print(f"📍 Backend URL: {BACKEND_URL}")
     print(f"📍 Frontend URL: {FRONTEND_URL}")
     print(f"🤖 AI Provider: {analyzer.ai_provider}")
     print(f"🔧 Environment: {'Production' if IS_PRODUCTION else 'Development'}")
+    print(f"🧵 Server mode: {SERVER_MODE}")
     print("=" * 60)
     
-    # Start Flask server (HTTP endpoints will work, Socket.IO will also work)
-    app.run(host='0.0.0.0', port=5000, debug=not IS_PRODUCTION) 
\ No newline at end of file
+    if SERVER_MODE == 'gevent':
+        # HTTP and websockets on green threads; no per-request log in production
+        run_gevent_server(app, HOST, PORT, log_output=not IS_PRODUCTION)
+    else:
+        # Start Flask server (HTTP endpoints will work, Socket.IO will also work)
+        app.run(host=HOST, port=PORT, debug=not IS_PRODUCTION)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization and compression of the backend's large payloads.
+
+Synthetic payloads shaped like the real ones are built:
+
+- status: a finished run's /test/<id>/status with --seconds of timeSeries,
+  per-label breakdown, live anomalies and coordinated-omission summaries
+- memory: an /agent/memory page of 50 entries with analyses and raw LLM text
+- history: a /tests/history page of 500 entries
+
+For each payload: serialization time with the standard library and the
+orjson encoders (median of --repeat), body size raw, gzip'ed and brotli'd, and
+the time to compress. Then the backend itself serves a finished run's status
+through its test client: before (standard library, no compression, no body
+cache), with orjson and compression, and from the body cache.
+
+    python benchmarks/bench_json_responses.py --seconds 3600 --output json.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from flask import Flask
+
+from json_responses import OrjsonProvider, StdlibJSONProvider, compress, brotli, orjson
+
+LABELS = ('GET /api/items', 'GET /api/items/:id', 'POST /api/cart', 'GET /api/search', 'POST /api/checkout')
+
+
+def _percentiles(rng, base):
+    p50 = base * rng.uniform(0.8, 1.2)
+    return {'min': round(p50 * 0.2, 1), 'p50': round(p50, 1), 'p90': round(p50 * 2.1, 1),
+            'p95': round(p50 * 2.8, 1), 'p99': round(p50 * 5.3, 1), 'max': round(p50 * 12.0, 1)}
+
+
+def run_results(rng, test_id, seconds):
+    """Parsed results of one finished run"""
+    started = 1_760_000_000_000
+    time_series = [{
+        'timestamp': started + i * 1000,
+        'requests': rng.randint(180, 220),
+        'errors': rng.randint(0, 3),
+        'avgResponseTime': round(rng.uniform(80, 140), 3),
+        'maxResponseTime': rng.randint(300, 900),
+        'activeThreads': 50
+    } for i in range(seconds)]
+    return {
+        'testId': test_id,
+        'totalRequests': sum(point['requests'] for point in time_series),
+        'successfulRequests': sum(point['requests'] - point['errors'] for point in time_series),
+        'failedRequests': sum(point['errors'] for point in time_series),
+        'successRate': 99.2,
+        'avgResponseTime': 112.4,
+        'responseTimePercentiles': _percentiles(rng, 100),
+        'peakRPS': 201.7,
+        'duration': seconds,
+        'labelBreakdown': {label: dict(_percentiles(rng, 90), requests=rng.randint(10000, 90000),
+                                       errors=rng.randint(0, 300), throughput=round(rng.uniform(20, 60), 2))
+                           for label in LABELS},
+        'errorBreakdown': {'500': rng.randint(50, 200), '503': rng.randint(0, 50), 'timeout': rng.randint(0, 20)},
+        'timeSeries': time_series,
+        'liveAnomalies': [{'testId': test_id, 'metric': 'p95', 'detector': 'cusum', 'direction': 'up',
+                           'state': 'closed', 'windowStart': i * 60, 'windowEnd': i * 60 + 12,
+                           'baseline': 210.5, 'peak': 640.0, 'magnitude': 2.04} for i in range(5)],
+        'coordinatedOmission': {'expectedInterval': 250, 'syntheticSamples': 1234,
+                                'raw': _percentiles(rng, 100), 'corrected': _percentiles(rng, 130)},
+        'timestamp': datetime(2026, 10, 1).isoformat()
+    }
+
+
+def status_payload(rng, seconds):
+    test_id = 'test_1760000000'
+    return {'success': True, 'status': {
+        'testId': test_id, 'status': 'completed',
+        'startTime': datetime(2026, 10, 1).isoformat(),
+        'endTime': (datetime(2026, 10, 1) + timedelta(seconds=seconds)).isoformat(),
+        'config': {'id': test_id, 'type': 'Load Test', 'url': 'https://shop.example.com', 'users': 50,
+                   'duration': seconds, 'ramp_up': 10, 'think_time': 250, 'engine': 'native'},
+        'results': run_results(rng, test_id, seconds),
+        'lineage': {'parent': None, 'root': test_id, 'attempt': 0, 'children': [], 'pending': []}
+    }}
+
+
+def memory_payload(rng, entries=50):
+    words = 'latency p95 saturation connection pool database queue retry throughput error burst'.split()
+    page = []
+    for i in range(entries):
+        raw_text = ' '.join(rng.choice(words) for _ in range(500))
+        page.append({
+            'id': 1000 - i, 'testId': f'test_{1760000000 + i}', 'timestamp': datetime(2026, 10, 1).isoformat(),
+            'config': {'type': 'Load Test', 'users': 50, 'duration': 600},
+            'summary': {'totalRequests': 120000, 'successRate': 99.2, 'avgResponseTime': 112.4,
+                        'p95': 280.1, 'p99': 530.7, 'peakRPS': 201.7},
+            'analysis': {'severity': 'medium', 'problem': raw_text[:200], 'root_cause': raw_text[200:600],
+                         'recommendations': [raw_text[j:j + 120] for j in range(0, 600, 120)],
+                         'retry_test': False, 'ai_provider': 'openrouter', 'raw_response': raw_text}
+        })
+    return {'success': True, 'agent_memory': page, 'memory_count': 5000, 'offset': 0, 'limit': entries}
+
+
+def history_payload(rng, entries=500):
+    return {'success': True, 'limit': entries, 'next_cursor': 'WyJzdGFydGVkX2F0IiwgImRlc2MiXQ', 'history': [{
+        'id': f'test_{1760000000 + i}', 'type': 'Load Test', 'url': f'https://svc{i % 7}.example.com/api',
+        'users': 50, 'duration': 600, 'engine': 'native', 'status': 'completed',
+        'success_rate': round(rng.uniform(95, 100), 3), 'error_rate': round(rng.uniform(0, 5), 3),
+        'avg_response_time': round(rng.uniform(80, 140), 3), 'p50': 101.2, 'p95': round(rng.uniform(200, 600), 1),
+        'p99': 530.7, 'peak_rps': 201.7, 'total_requests': 120000, 'slo': {'p95_ms': 500},
+        'slo_passed': True, 'slo_violations': [], 'error': None, 'parent_test_id': None, 'retry_attempt': 0,
+        'timestamp': datetime(2026, 10, 1).isoformat(), 'end_time': datetime(2026, 10, 1).isoformat()
+    } for i in range(entries)]}
+
+
+def _median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(times), 3)
+
+
+def bench_payload(name, payload, repeat):
+    app = Flask('bench')
+    providers = [StdlibJSONProvider(app)] + ([OrjsonProvider(app)] if orjson else [])
+    row = {'payload': name, 'serialize_ms': {}}
+    for provider in providers:
+        row['serialize_ms'][provider.name] = _median_ms(lambda: provider.dumps_bytes(payload), repeat)
+    body = providers[-1].dumps_bytes(payload)
+    row['bytes'] = {'raw': len(body)}
+    row['compress_ms'] = {}
+    for encoding in ('gzip', 'br') if brotli else ('gzip',):
+        row['bytes'][encoding] = len(compress(body, encoding))
+        row['compress_ms'][encoding] = _median_ms(lambda: compress(body, encoding), repeat)
+    return row
+
+
+def bench_backend(payload, repeat):
+    """Serve a finished run's status before and after: encoder, compression and body cache"""
+    os.environ.setdefault('AGENT_MEMORY_PATH', ':memory:')
+    os.environ.setdefault('TEST_HISTORY_PATH', ':memory:')
+    os.chdir(tempfile.mkdtemp(prefix='ludo_bench_json_'))
+    import app as backend
+
+    status = payload['status']
+    test_id = status['testId']
+    backend.jmeter_runner.active_tests[test_id] = {
+        'status': 'completed', 'start_time': datetime(2026, 10, 1), 'end_time': datetime(2026, 10, 1),
+        'config': status['config'], 'results': status['results']
+    }
+    client = backend.app.test_client()
+    url = f'/test/{test_id}/status'
+    headers = {'Accept-Encoding': 'gzip, br'}
+
+    def serve(setup):
+        setup()
+        response = client.get(url, headers=headers)
+        return len(response.data)
+
+    stdlib_provider = StdlibJSONProvider(backend.app)
+    fast_provider = backend.app.json
+    min_size = backend.compressor.min_size
+    modes = {
+        # The backend as it was: standard library encoder, no compression, every request serialized
+        'before': lambda: (setattr(backend.app, 'json', stdlib_provider),
+                           setattr(backend.compressor, 'min_size', float('inf')),
+                           backend.finalized_tests.discard(test_id)),
+        'encoder_and_compression': lambda: (setattr(backend.app, 'json', fast_provider),
+                                            setattr(backend.compressor, 'min_size', min_size),
+                                            backend.finalized_tests.discard(test_id)),
+        'body_cache': lambda: (setattr(backend.app, 'json', fast_provider),
+                               setattr(backend.compressor, 'min_size', min_size),
+                               backend.finalized_tests.add(test_id))
+    }
+    rows = {}
+    for mode, setup in modes.items():
+        size = serve(setup)
+        rows[mode] = {'response_bytes': size, 'latency_ms': _median_ms(lambda: serve(setup), repeat)}
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=int, default=3600, help='timeSeries length of the status payload')
+    parser.add_argument('--repeat', type=int, default=20, help='Repetitions per timing (median reported)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    payloads = {
+        'status': status_payload(rng, args.seconds),
+        'memory': memory_payload(rng),
+        'history': history_payload(rng)
+    }
+    rows = [bench_payload(name, payload, args.repeat) for name, payload in payloads.items()]
+    backend = bench_backend(payloads['status'], args.repeat)
+
+    print(f"{'payload':<9} {'raw KB':>8} {'gzip KB':>8} {'br KB':>7} {'stdlib ms':>10} {'orjson ms':>10} "
+          f"{'gzip ms':>8} {'br ms':>7}")
+    for row in rows:
+        size, ser, comp = row['bytes'], row['serialize_ms'], row['compress_ms']
+        print(f"{row['payload']:<9} {size['raw'] / 1024:>8.1f} {size['gzip'] / 1024:>8.1f} "
+              f"{size.get('br', 0) / 1024:>7.1f} {ser['stdlib']:>10} {ser.get('orjson', '-'):>10} "
+              f"{comp['gzip']:>8} {comp.get('br', '-'):>7}")
+    print()
+    print(f"GET /test/<id>/status ({args.seconds} s of timeSeries):")
+    for mode, row in backend.items():
+        print(f"  {mode:<24} {row['response_bytes'] / 1024:>8.1f} KB {row['latency_ms']:>9} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'payloads': rows, 'backend_status': backend}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Benchmark the JTL parsers: parse_jtl_results, which parses a finished run,
+and the live tail (JTLTail and SecondBuckets), which follows a running one.
+
+A synthetic JTL file is generated for every --rows size. Sizes run from 1K
+to 100M rows; a full-layout row is about 170 bytes, so 100M rows need some
+17 GB of disk. Each file has --labels sampler labels and --error-ratio failed
+samples. Response and failure messages contain commas and quotes. The layout
+is JMeter's full CSV layout or the lean one. The live tail reads the file as
+it grows, --chunk-rows rows per poll, the way a running test writes it.
+
+Each parser runs --repeat times, each time in a fresh process. The benchmark
+reports the median wall time, rows/s, MB/s and the process's peak RSS. Every
+parser's output is checked against a reference implementation. The reference
+reads the file with csv.DictReader and counts exact latencies. These must
+match exactly: totals, errors per response code, per-label counts and
+per-second requests and errors. Percentiles must fall within the latency
+histogram's precision.
+
+With --compare, results are checked against an earlier --output file. The
+script exits with status 1 when a parser's rows/s dropped, or its peak RSS
+grew, by more than --max-regression percent, or when a check failed.
+
+    python benchmarks/bench_jtl_parsing.py --rows 1000 100000 1000000 --output jtl.json
+    python benchmarks/bench_jtl_parsing.py --rows 1000000 --compare jtl.json --max-regression 20
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from native_engine import JTL_FIELDS, LEAN_JTL_FIELDS
+
+PARSERS = ('parse_jtl_results', 'live_tail')
+PERCENTILES = (50, 90, 95, 99)
+
+# Latency histogram precision: a reported percentile is at most 1/64 above the exact one
+PERCENTILE_TOLERANCE = 1 / 64
+
+ERROR_CODES = ('500', '503', 'Non HTTP response code: java.net.SocketTimeoutException')
+ERROR_MESSAGES = (
+    'Internal Server Error, please retry',
+    'Service Unavailable, upstream "cart" timed out, giving up',
+    'Read timed out, after 30,000 ms'
+)
+START_TIMESTAMP = 1_760_000_000_000
+
+
+def generate_jtl(path, rows, labels, error_ratio, layout, rps, seed):
+    """Write a JTL file of rows samples; timestamps advance at rps with up to 50 ms of jitter"""
+    rng = random.Random(seed)
+    label_names = [f"{'POST' if i % 3 == 0 else 'GET'} /api/endpoint_{i}" for i in range(labels)]
+    medians = [math.log(rng.uniform(20, 400)) for _ in label_names]
+    full = layout == 'full'
+    with open(path, 'w', newline='', buffering=1024 * 1024) as f:
+        writer = csv.writer(f)
+        writer.writerow(JTL_FIELDS if full else LEAN_JTL_FIELDS)
+        batch = []
+        for i in range(rows):
+            label = rng.randrange(labels)
+            elapsed = int(rng.lognormvariate(medians[label], 0.6))
+            timestamp = START_TIMESTAMP + i * 1000 // rps + rng.randrange(50)
+            threads = 1 + i * 50 // rows
+            if rng.random() >= error_ratio:
+                code, message, success, failure = '200', 'OK', 'true', ''
+            else:
+                code = ERROR_CODES[rng.randrange(len(ERROR_CODES))]
+                message = failure = ERROR_MESSAGES[rng.randrange(len(ERROR_MESSAGES))]
+                success = 'false'
+            if full:
+                batch.append([timestamp, elapsed, label_names[label], code, message, f"Thread Group 1-{threads}",
+                              'text', success, failure, 1024 + elapsed, 180, threads, threads,
+                              f"https://shop.example.com/api/endpoint_{label}", elapsed, 0, 0])
+            else:
+                batch.append([timestamp, elapsed, label_names[label], code, success, threads, threads])
+            if len(batch) >= 10000:
+                writer.writerows(batch)
+                batch.clear()
+        writer.writerows(batch)
+
+
+def _exact_percentile(values, count, p):
+    """Nearest-rank percentile of a Counter of exact values"""
+    rank = max(1, -(-p * count // 100))
+    cumulative = 0
+    for value in sorted(values):
+        cumulative += values[value]
+        if cumulative >= rank:
+            return value
+    return 0
+
+
+def reference(path):
+    """The numbers the parsers should report, computed independently and exactly"""
+    total = successful = elapsed_total = 0
+    errors = {}
+    values = Counter()
+    labels = {}
+    seconds = {}
+    first = last = None
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            elapsed = int(row['elapsed'])
+            timestamp = int(row['timeStamp'])
+            success = row['success'] == 'true'
+            total += 1
+            successful += success
+            elapsed_total += elapsed
+            values[elapsed] += 1
+            if not success:
+                errors[row['responseCode']] = errors.get(row['responseCode'], 0) + 1
+            label = labels.setdefault(row['label'], {'requests': 0, 'successful': 0, 'values': Counter()})
+            label['requests'] += 1
+            label['successful'] += success
+            label['values'][elapsed] += 1
+            second = seconds.setdefault(timestamp // 1000, [0, 0, 0])
+            second[0] += 1
+            second[1] += not success
+            second[2] = max(second[2], elapsed)
+            first = timestamp if first is None else min(first, timestamp)
+            last = timestamp if last is None else max(last, timestamp)
+
+    first_second = min(seconds) if seconds else 0
+    return {
+        'totalRequests': total,
+        'successfulRequests': successful,
+        'errorBreakdown': errors,
+        'avgResponseTime': elapsed_total / total if total else 0,
+        'min': min(values) if values else 0,
+        'max': max(values) if values else 0,
+        'percentiles': {p: _exact_percentile(values, total, p) for p in PERCENTILES},
+        'duration': (last - first) / 1000 if total else 0,
+        'labels': {name: {'requests': label['requests'], 'successful': label['successful'],
+                          'p95': _exact_percentile(label['values'], label['requests'], 95)}
+                   for name, label in labels.items()},
+        'seconds': [[second - first_second] + counts for second, counts in sorted(seconds.items())]
+    }
+
+
+def _percentile_ok(actual, exact):
+    return exact <= actual <= exact * (1 + PERCENTILE_TOLERANCE)
+
+
+def check_parse_jtl_results(results, ref):
+    """Differences between parse_jtl_results' output and the reference"""
+    if 'error' in results:
+        return [results['error']]
+    mismatches = []
+
+    def expect(name, actual, expected):
+        if actual != expected:
+            mismatches.append(f"{name}: {actual!r} != {expected!r}")
+
+    expect('totalRequests', results['totalRequests'], ref['totalRequests'])
+    expect('successfulRequests', results['successfulRequests'], ref['successfulRequests'])
+    expect('failedRequests', results['failedRequests'], ref['totalRequests'] - ref['successfulRequests'])
+    expect('errorBreakdown', results['errorBreakdown'], ref['errorBreakdown'])
+    expect('duration', results['duration'], ref['duration'])
+    if not math.isclose(results['avgResponseTime'], ref['avgResponseTime'], rel_tol=1e-9):
+        mismatches.append(f"avgResponseTime: {results['avgResponseTime']} != {ref['avgResponseTime']}")
+    percentiles = results['responseTimePercentiles']
+    expect('min', percentiles['min'], ref['min'])
+    expect('max', percentiles['max'], ref['max'])
+    for p, exact in ref['percentiles'].items():
+        if not _percentile_ok(percentiles[f"p{p}"], exact):
+            mismatches.append(f"p{p}: {percentiles[f'p{p}']} not within the histogram precision of {exact}")
+
+    breakdown = results['labelBreakdown']
+    expect('labels', sorted(breakdown), sorted(ref['labels']))
+    for name, label in ref['labels'].items():
+        if name not in breakdown:
+            continue
+        expect(f"{name} requests", breakdown[name]['totalRequests'], label['requests'])
+        expect(f"{name} successful", breakdown[name]['successfulRequests'], label['successful'])
+        if not _percentile_ok(breakdown[name]['responseTimePercentiles']['p95'], label['p95']):
+            mismatches.append(f"{name} p95: {breakdown[name]['responseTimePercentiles']['p95']} "
+                              f"not within the histogram precision of {label['p95']}")
+
+    series = [[point['t'], point['requests'], point['errors'], point['maxResponseTime']]
+              for point in results['timeSeries']]
+    if series != ref['seconds']:
+        mismatches.append(f"timeSeries differs ({len(series)} seconds, reference {len(ref['seconds'])})")
+    return mismatches
+
+
+def check_live_tail(digest, ref):
+    """Differences between the live tail's per-second points and the reference"""
+    mismatches = []
+    if digest['samples'] != ref['totalRequests']:
+        mismatches.append(f"samples: {digest['samples']} != {ref['totalRequests']}")
+    if digest['late']:
+        mismatches.append(f"{digest['late']} samples arrived after their second was closed")
+    # The tail emits empty seconds too; the reference only has seconds with samples
+    points = [point for point in digest['seconds'] if point[1]]
+    if points != [second[:3] for second in ref['seconds']]:
+        mismatches.append(f"per-second points differ ({len(points)} seconds, reference {len(ref['seconds'])})")
+    return mismatches
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def worker(parser, jtl, digest_path, chunk_rows):
+    """One timed parse in this process; prints its time and peak RSS, writes its output to digest_path"""
+    from jmeter_runner import JMeterRunner
+    from live_metrics import JTLTail, SecondBuckets
+
+    baseline_rss = _peak_rss_mb()
+    if parser == 'parse_jtl_results':
+        runner = JMeterRunner()
+        started = time.perf_counter()
+        digest = runner.parse_jtl_results(Path(jtl))
+        seconds = time.perf_counter() - started
+    else:
+        # Grow a copy of the file chunk by chunk and poll after each, timing only the polls
+        live_file = Path(digest_path).with_suffix('.live.jtl')
+        tail = JTLTail(live_file)
+        buckets = SecondBuckets()
+        points = []
+        samples = 0
+        seconds = 0.0
+        with open(jtl, 'rb') as source, open(live_file, 'wb') as target:
+            while True:
+                chunk = [line for _, line in zip(range(chunk_rows), source)]
+                if chunk:
+                    target.writelines(chunk)
+                    target.flush()
+                started = time.perf_counter()
+                new = tail.read()
+                samples += len(new)
+                buckets.add(new)
+                if new:
+                    # Seconds close as later samples arrive, as when polled during a run
+                    points.extend(buckets.close(max(sample[0] for sample in new) // 1000))
+                if not chunk and buckets.buckets:
+                    # The run is over: close its last seconds
+                    points.extend(buckets.drain())
+                seconds += time.perf_counter() - started
+                if not chunk:
+                    break
+        live_file.unlink()
+        digest = {'samples': samples, 'late': buckets.late,
+                  'seconds': [[point['t'], point['requests'], point['errors']] for point in points]}
+
+    with open(digest_path, 'w') as f:
+        json.dump(digest, f)
+    print(json.dumps({'seconds': seconds, 'peak_rss_mb': _peak_rss_mb(), 'baseline_rss_mb': baseline_rss}))
+
+
+def run_parser(parser, jtl, workdir, chunk_rows):
+    """Run worker() in a fresh process; returns (timing, the parser's output)"""
+    digest_path = Path(workdir) / f"{parser}.digest.json"
+    result = subprocess.run(
+        [sys.executable, __file__, '--worker', parser, '--jtl', str(jtl), '--digest', str(digest_path),
+         '--chunk-rows', str(chunk_rows)],
+        cwd=workdir, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"{parser} failed on {jtl}:\n{result.stderr[-2000:]}")
+    timing = json.loads(result.stdout.strip().splitlines()[-1])
+    with open(digest_path) as f:
+        digest = json.load(f)
+    digest_path.unlink()
+    return timing, digest
+
+
+def bench_file(args, workdir, rows, layout):
+    jtl = Path(workdir) / f"bench_{layout}_{rows}.jtl"
+    started = time.perf_counter()
+    generate_jtl(jtl, rows, args.labels, args.error_ratio, layout, args.rps, args.seed)
+    generate_seconds = time.perf_counter() - started
+    size = jtl.stat().st_size
+
+    ref = reference(jtl) if rows <= args.reference_max_rows else None
+    results = []
+    for parser in args.parsers:
+        timings = []
+        for _ in range(args.repeat):
+            timing, digest = run_parser(parser, jtl, workdir, args.chunk_rows)
+            timings.append(timing)
+        seconds = statistics.median(timing['seconds'] for timing in timings)
+        if ref is None:
+            mismatches = None
+        elif parser == 'parse_jtl_results':
+            mismatches = check_parse_jtl_results(digest, ref)
+        else:
+            mismatches = check_live_tail(digest, ref)
+        results.append({
+            'parser': parser,
+            'layout': layout,
+            'rows': rows,
+            'bytes': size,
+            'seconds': round(seconds, 4),
+            'rows_per_second': round(rows / seconds) if seconds else None,
+            'mb_per_second': round(size / seconds / (1024 * 1024), 1) if seconds else None,
+            'peak_rss_mb': max(timing['peak_rss_mb'] for timing in timings),
+            'baseline_rss_mb': min(timing['baseline_rss_mb'] for timing in timings),
+            'correct': None if mismatches is None else not mismatches,
+            'mismatches': (mismatches or [])[:10]
+        })
+
+    if not args.keep:
+        jtl.unlink()
+        jtl.with_suffix('.hist.json').unlink(missing_ok=True)
+    return {'rows': rows, 'layout': layout, 'bytes': size, 'generate_seconds': round(generate_seconds, 2)}, results
+
+
+def regressions(results, baseline_file, max_regression):
+    """Parsers slower, or using more memory, than in baseline_file by more than max_regression percent"""
+    with open(baseline_file) as f:
+        baseline = {(r['parser'], r['layout'], r['rows']): r for r in json.load(f)['results']}
+    found = []
+    for row in results:
+        before = baseline.get((row['parser'], row['layout'], row['rows']))
+        if before is None:
+            continue
+        if row['rows_per_second'] < before['rows_per_second'] * (1 - max_regression / 100):
+            found.append(f"{row['parser']} {row['layout']} {row['rows']} rows: "
+                         f"{row['rows_per_second']} rows/s, was {before['rows_per_second']}")
+        if row['peak_rss_mb'] > before['peak_rss_mb'] * (1 + max_regression / 100):
+            found.append(f"{row['parser']} {row['layout']} {row['rows']} rows: "
+                         f"peak RSS {row['peak_rss_mb']} MB, was {before['peak_rss_mb']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help='JTL sizes in rows (1000 up to 100000000)')
+    parser.add_argument('--layouts', nargs='+', choices=['full', 'lean'], default=['full'])
+    parser.add_argument('--parsers', nargs='+', choices=PARSERS, default=list(PARSERS))
+    parser.add_argument('--labels', type=int, default=10, help='Distinct sampler labels')
+    parser.add_argument('--error-ratio', type=float, default=0.02, help='Fraction of failed samples')
+    parser.add_argument('--rps', type=int, default=2000, help='Samples per second of the synthetic run')
+    parser.add_argument('--chunk-rows', type=int, default=4000, help='Rows the live tail reads per poll')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per parser and size (median reported)')
+    parser.add_argument('--reference-max-rows', type=int, default=10_000_000,
+                        help='Skip the correctness check above this many rows')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--workdir', help='Directory for the generated files (default: a temporary one)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated JTL files')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier --output file to check for regressions')
+    parser.add_argument('--max-regression', type=float, default=20,
+                        help='Percent slower or bigger than --compare that fails the run')
+    parser.add_argument('--worker', choices=PARSERS, help=argparse.SUPPRESS)
+    parser.add_argument('--jtl', help=argparse.SUPPRESS)
+    parser.add_argument('--digest', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.jtl, args.digest, args.chunk_rows)
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='ludo_bench_jtl_')
+    os.makedirs(workdir, exist_ok=True)
+    files, results = [], []
+    try:
+        for layout in args.layouts:
+            for rows in args.rows:
+                generated, rows_results = bench_file(args, workdir, rows, layout)
+                files.append(generated)
+                results.extend(rows_results)
+                print(f"{layout} layout, {rows} rows ({generated['bytes'] / (1024 * 1024):.1f} MB, "
+                      f"generated in {generated['generate_seconds']} s):")
+                for row in rows_results:
+                    check = {True: 'ok', False: 'MISMATCH', None: 'not checked'}[row['correct']]
+                    print(f"  {row['parser']:<18} {row['seconds']:>9} s {row['rows_per_second']:>10} rows/s "
+                          f"{row['mb_per_second']:>7} MB/s  peak RSS {row['peak_rss_mb']:>7} MB  {check}")
+                    for mismatch in row['mismatches']:
+                        print(f"    {mismatch}")
+    finally:
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        environment = {'python': platform.python_version(), 'platform': platform.platform(),
+                       'cpus': os.cpu_count()}
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'environment': environment, 'files': files,
+                       'results': results}, f, indent=2)
+
+    failed = [f"{row['parser']} {row['layout']} {row['rows']} rows: wrong results"
+              for row in results if row['correct'] is False]
+    if args.compare:
+        failed += regressions(results, args.compare, args.max_regression)
+    if failed:
+        print('\n'.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark full vs lean results recording.
+
+Runs the same short load test twice against a local stub target, once per
+recording mode, and reports load generator CPU time and JTL bytes written
+per sample. Uses the native engine by default; pass --engine jmeter to
+measure JMeter itself (JMETER_HOME must point at an installation).
+CPU time is read from getrusage, so this runs on Unix-like systems.
+
+    python benchmarks/bench_recording_modes.py --users 20 --duration 15
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jmeter_runner import JMeterRunner
+from stub_server import start_stub_server
+
+
+def run_mode(runner, target_url, args, recording):
+    """Run one test and measure CPU used by the generator processes"""
+    test_id = f"bench_{recording}_{int(time.time())}"
+    test_config = {
+        'id': test_id,
+        'type': 'Load Test',
+        'url': target_url,
+        'users': args.users,
+        'duration': args.duration,
+        'ramp_up': 0,
+        'think_time': args.think_time,
+        'engine': args.engine,
+        'recording': recording
+    }
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    result = runner.run_jmeter_test(test_config)
+    if not result['success']:
+        raise SystemExit(result['error'])
+
+    while runner.active_tests[test_id]['status'] == 'running':
+        time.sleep(0.2)
+    wall = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    results = runner.active_tests[test_id].get('results', {})
+    samples = results.get('totalRequests', 0)
+    jtl_bytes = (runner.results_dir / f"{test_id}.jtl").stat().st_size
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+
+    return {
+        'recording': recording,
+        'samples': samples,
+        'wall_seconds': round(wall, 3),
+        'generator_cpu_seconds': round(cpu, 3),
+        'cpu_ms_per_1k_samples': round(cpu * 1000 / samples * 1000, 3) if samples else None,
+        'jtl_bytes': jtl_bytes,
+        'jtl_bytes_per_sample': round(jtl_bytes / samples, 1) if samples else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', choices=['native', 'jmeter'], default='native')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duration', type=int, default=10)
+    parser.add_argument('--think-time', type=int, default=0)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    server, target_url = start_stub_server()
+    workdir = tempfile.mkdtemp(prefix='ludo_bench_')
+    os.chdir(workdir)
+    runner = JMeterRunner()
+
+    rows = [run_mode(runner, target_url, args, mode) for mode in ('full', 'lean')]
+    server.shutdown()
+
+    print(f"{'mode':<6} {'samples':>9} {'cpu s':>8} {'cpu ms/1k':>10} {'bytes/sample':>13}")
+    for row in rows:
+        print(f"{row['recording']:<6} {row['samples']:>9} {row['generator_cpu_seconds']:>8} "
+              f"{row['cpu_ms_per_1k_samples']:>10} {row['jtl_bytes_per_sample']:>13}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'engine': args.engine, 'users': args.users, 'duration': args.duration, 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Benchmark the backend's serving modes (SERVER_MODE=threading and gevent).
+
+For each mode the backend is started as a subprocess on a free port, with a
+long, light native test running against a local stub target, so /tests,
+/test/<id>/status and the test_update broadcast all serve real state. Then:
+
+1. polling: --concurrency clients request /tests and /test/<id>/status
+   back-to-back for --seconds; requests/second and latency per path
+2. fan-out: --subscribers Socket.IO clients connect over websockets and join
+   the test; the delay of each test_update (emitted every 2 s) from its
+   timestamp to its arrival is measured over --updates broadcasts, while the
+   polling clients keep up a fixed --fan-out-rate requests/second
+
+All clients run on one asyncio loop in this process (aiohttp; subscribers
+speak the Socket.IO wire protocol directly to stay cheap), so on a small
+machine the client side shares the CPU with the server; compare the modes
+against each other, not against absolute numbers.
+
+    python benchmarks/bench_serving.py --subscribers 1000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from stub_server import start_stub_server
+
+PATHS = ('/tests', '/test/{test_id}/status')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _percentiles(values):
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 2)
+
+    return {'count': len(ordered), 'p50': pick(50), 'p95': pick(95), 'p99': pick(99), 'max': round(ordered[-1], 2)}
+
+
+def start_backend(mode, port, workdir):
+    """Start app.py in the given mode; returns the process once it answers"""
+    env = dict(
+        os.environ,
+        SERVER_MODE=mode,
+        HOST='127.0.0.1',
+        PORT=str(port),
+        FLASK_ENV='production',
+        AGENT_MEMORY_PATH=':memory:',
+        NATIVE_ENGINE_WORKERS='1'
+    )
+    process = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / 'app.py')],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Backend exited in {mode} mode (code {process.returncode})")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f"Backend did not start in {mode} mode")
+
+
+async def start_test(session, base_url, target_url):
+    """Start a long, light native test whose state the benchmark polls and subscribes to"""
+    async with session.post(f"{base_url}/test/start", json={
+        'type': 'Load Test', 'url': target_url, 'users': 1, 'duration': 3600,
+        'rampUp': 0, 'thinkTime': 1000, 'engine': 'native'
+    }) as response:
+        body = await response.json()
+    if not body.get('success'):
+        raise SystemExit(f"Could not start the background test: {body.get('error')}")
+    return body['testId']
+
+
+async def poll(session, base_url, test_id, stop_at, latencies, errors, interval=0):
+    """One polling client: alternate between the paths until stop_at, one request per interval (0: back-to-back)"""
+    i = 0
+    next_at = time.perf_counter()
+    while time.perf_counter() < stop_at:
+        if interval:
+            await asyncio.sleep(max(0, next_at - time.perf_counter()))
+            next_at += interval
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            async with session.get(base_url + path.format(test_id=test_id)) as response:
+                await response.read()
+                ok = response.status == 200
+        except aiohttp.ClientError:
+            ok = False
+        if ok:
+            latencies[path].append((time.perf_counter() - started) * 1000)
+        else:
+            errors[path] += 1
+
+
+async def polling_load(base_url, test_id, concurrency, seconds, rate=None):
+    """
+    Run concurrency polling clients for seconds, as fast as possible or at a
+    total of rate requests/second; returns per-path rates and latencies
+    """
+    interval = concurrency / rate if rate else 0
+    latencies = {path: [] for path in PATHS}
+    errors = {path: 0 for path in PATHS}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        stop_at = started + seconds
+        await asyncio.gather(*(poll(session, base_url, test_id, stop_at, latencies, errors, interval)
+                               for _ in range(concurrency)))
+        await asyncio.sleep(max(0, stop_at - time.perf_counter()))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'requests_per_second': round(sum(len(v) for v in latencies.values()) / elapsed, 1),
+        'errors': sum(errors.values()),
+        'paths': {
+            path: dict(_percentiles(latencies[path]), requests_per_second=round(len(latencies[path]) / elapsed, 1),
+                       errors=errors[path])
+            for path in PATHS
+        }
+    }
+
+
+async def subscriber(session, base_url, test_id, sockets, received):
+    """
+    One websocket subscriber speaking Engine.IO 4 / Socket.IO 5 directly (open,
+    namespace connect, join_test_monitor, answer pings), recording the emit
+    timestamp and delay of every test_update of the test
+    """
+    url = base_url.replace('http://', 'ws://') + '/socket.io/?EIO=4&transport=websocket'
+    async with session.ws_connect(url) as ws:
+        await ws.receive()  # Engine.IO open packet
+        await ws.send_str('40')
+        await ws.receive()  # Namespace connected
+        await ws.send_str('42' + json.dumps(['join_test_monitor', {'test_id': test_id}]))
+        sockets.append(ws)
+        async for message in ws:  # Ends when fan_out closes the socket
+            if message.type != aiohttp.WSMsgType.TEXT:
+                break
+            if message.data == '2':
+                await ws.send_str('3')
+            elif message.data.startswith('42["test_update"'):
+                event, data = json.loads(message.data[2:])
+                if data.get('test_id') == test_id:
+                    emitted = datetime.fromisoformat(data['timestamp']).timestamp()
+                    received.append((emitted, (time.time() - emitted) * 1000))
+
+
+async def fan_out(base_url, test_id, subscribers, updates, concurrency, rate, grace=5):
+    """
+    Connect subscribers, then measure the broadcasts emitted over the next
+    updates * 2 seconds under a fixed polling load of rate requests/second;
+    each broadcast gets grace seconds to arrive
+    """
+    received = []
+    sockets = []
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(subscriber(session, base_url, test_id, sockets, received))
+                 for _ in range(subscribers)]
+        while len(sockets) < subscribers and not all(task.done() for task in tasks):
+            if time.perf_counter() - started > 60:
+                break
+            await asyncio.sleep(0.05)
+        connect_seconds = time.perf_counter() - started
+        connected = len(sockets)
+
+        # Broadcasts come every 2 seconds; keep the polling load up meanwhile
+        window_start = time.time()
+        polling = await polling_load(base_url, test_id, concurrency, updates * 2, rate)
+        window_end = time.time()
+        await asyncio.sleep(grace)
+
+        await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    measured = [(emitted, delay) for emitted, delay in received if window_start <= emitted < window_end]
+    broadcasts = len({emitted for emitted, _ in measured})
+    expected = connected * broadcasts
+    return {
+        'subscribers': subscribers,
+        'connected': connected,
+        'failed': sum(isinstance(r, Exception) for r in results),
+        'connect_seconds': round(connect_seconds, 2),
+        'broadcasts': broadcasts,
+        'updates_received': len(measured),
+        'delivery_ratio': round(len(measured) / expected, 3) if expected else 0,
+        'delay_ms': _percentiles([delay for _, delay in measured]),
+        'polling_during_fan_out': polling
+    }
+
+
+async def bench_mode(mode, target_url, args):
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix=f'ludo_bench_{mode}_')
+    process = start_backend(mode, port, workdir)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with aiohttp.ClientSession() as session:
+            test_id = await start_test(session, base_url, target_url)
+            await asyncio.sleep(2)
+            polling = await polling_load(base_url, test_id, args.concurrency, args.seconds)
+            fan = await fan_out(base_url, test_id, args.subscribers, args.updates, args.concurrency, args.fan_out_rate)
+            async with session.post(f"{base_url}/test/{test_id}/stop") as response:
+                await response.read()
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {'mode': mode, 'polling': polling, 'fan_out': fan}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=['threading', 'gevent'], default=['threading', 'gevent'])
+    parser.add_argument('--concurrency', type=int, default=50, help='Concurrent polling clients')
+    parser.add_argument('--seconds', type=int, default=10, help='Length of the polling-only phase')
+    parser.add_argument('--subscribers', type=int, default=500, help='Socket.IO subscribers in the fan-out phase')
+    parser.add_argument('--updates', type=int, default=5, help='test_update broadcasts measured')
+    parser.add_argument('--fan-out-rate', type=int, default=200,
+                        help='Polling requests/second kept up during fan-out (the same offered load in every mode)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    # Each subscriber holds a socket on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    server, target_url = start_stub_server()
+    rows = [asyncio.run(bench_mode(mode, target_url, args)) for mode in args.modes]
+    server.shutdown()
+
+    print(f"{'mode':<10} {'poll req/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'subs':>6} {'connect s':>10} "
+          f"{'delivered':>10} {'fan-out p50':>12} {'fan-out p99':>12}")
+    for row in rows:
+        polling, fan = row['polling'], row['fan_out']
+        status = polling['paths'][PATHS[1]]
+        print(f"{row['mode']:<10} {polling['requests_per_second']:>11} {status.get('p50', '-'):>8} "
+              f"{status.get('p99', '-'):>8} {fan['connected']:>6} {fan['connect_seconds']:>10} "
+              f"{fan['delivery_ratio']:>10} {fan['delay_ms'].get('p50', '-'):>12} {fan['delay_ms'].get('p99', '-'):>12}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
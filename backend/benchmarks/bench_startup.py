@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark backend startup, to catch regressions in boot time.
+
+1. imports: `python -X importtime -c "import app"` in a fresh interpreter,
+   --runs times; total import time and the heaviest modules app.py imports
+   directly (cumulative, median over the runs), and whether the lazily
+   imported modules (numpy) were loaded by the import
+2. first request: app.py is started as a server --runs times; wall time from
+   spawning the process to the first answered GET /health, plus the boot
+   phases the backend reports at /health/startup
+
+With --max-first-request-ms the script exits with status 1 when the median
+time to the first request is above that budget.
+
+    python benchmarks/bench_startup.py --runs 5 --max-first-request-ms 3000
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# requests is not among them: the Socket.IO client stack (engineio.client) imports it with flask_socketio
+LAZY_MODULES = ('numpy',)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _env(**extra):
+    # No AI keys and an in-memory agent memory: the same boot on every run
+    return dict(
+        os.environ,
+        FLASK_ENV='production',
+        AGENT_MEMORY_PATH=':memory:',
+        GEMINI_API_KEY='your-gemini-api-key-here',
+        OPENROUTER_API_KEY='your-openrouter-api-key-here',
+        PYTHONPATH=str(BACKEND_DIR),
+        **extra
+    )
+
+
+def import_times(workdir, mode):
+    """Per-module cumulative import times (ms) of one `import app`, and the lazy modules loaded"""
+    check = f"import sys, json, app; print(json.dumps({{m: m in sys.modules for m in {LAZY_MODULES!r}}}))"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', check],
+        cwd=workdir, env=_env(SERVER_MODE=mode), capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import app failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nested names indented by 2
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        modules[(depth, name.strip())] = int(cumulative) / 1000
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return modules, loaded
+
+
+def bench_imports(workdir, mode, runs, top):
+    samples = [import_times(workdir, mode) for _ in range(runs)]
+    totals = [modules.get((0, 'app'), 0) for modules, _ in samples]
+    # Direct imports of app.py are one level below it
+    direct = {}
+    for modules, _ in samples:
+        for (depth, name), ms in modules.items():
+            if depth == 1:
+                direct.setdefault(name, []).append(ms)
+    heaviest = sorted(((name, statistics.median(ms)) for name, ms in direct.items()), key=lambda x: -x[1])[:top]
+    return {
+        'import_app_ms': {'median': round(statistics.median(totals), 1), 'min': round(min(totals), 1),
+                          'max': round(max(totals), 1)},
+        'heaviest_imports_ms': {name: round(ms, 1) for name, ms in heaviest},
+        'lazy_modules_loaded': samples[-1][1]
+    }
+
+
+def first_request(workdir, mode, timeout=60):
+    """Spawn app.py; returns (ms until GET /health answered, the backend's /health/startup report)"""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / 'app.py')],
+        cwd=workdir, env=_env(SERVER_MODE=mode, HOST='127.0.0.1', PORT=str(port)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            if process.poll() is not None:
+                raise SystemExit(f"Backend exited in {mode} mode (code {process.returncode})")
+            if time.perf_counter() - started > timeout:
+                raise SystemExit(f"Backend did not answer within {timeout}s in {mode} mode")
+            try:
+                with urllib.request.urlopen(f"{base_url}/health", timeout=1) as response:
+                    response.read()
+                break
+            except OSError:
+                time.sleep(0.01)
+        elapsed = (time.perf_counter() - started) * 1000
+        with urllib.request.urlopen(f"{base_url}/health/startup", timeout=5) as response:
+            report = json.loads(response.read())
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return elapsed, report
+
+
+def bench_first_request(workdir, mode, runs):
+    samples = [first_request(workdir, mode) for _ in range(runs)]
+    elapsed = [ms for ms, _ in samples]
+    phases = {}
+    for _, report in samples:
+        for phase in report['phases']:
+            phases.setdefault(phase['phase'], []).append(phase['ms'])
+    return {
+        'first_request_ms': {'median': round(statistics.median(elapsed), 1), 'min': round(min(elapsed), 1),
+                             'max': round(max(elapsed), 1)},
+        'backend_ready_ms': round(statistics.median(r['readyMs'] for _, r in samples), 1),
+        'phases_ms': {name: round(statistics.median(ms), 1) for name, ms in phases.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=['threading', 'gevent'], default=['threading'])
+    parser.add_argument('--runs', type=int, default=5, help='Repetitions per measurement (medians are reported)')
+    parser.add_argument('--top', type=int, default=8, help='Heaviest direct imports listed')
+    parser.add_argument('--max-first-request-ms', type=float,
+                        help='Fail when the median time to the first request is above this')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ludo_bench_startup_')
+    rows = []
+    for mode in args.modes:
+        row = {'mode': mode}
+        row.update(bench_imports(workdir, mode, args.runs, args.top))
+        row.update(bench_first_request(workdir, mode, args.runs))
+        rows.append(row)
+
+    for row in rows:
+        print(f"{row['mode']}: import app {row['import_app_ms']['median']} ms, "
+              f"first request {row['first_request_ms']['median']} ms "
+              f"(min {row['first_request_ms']['min']}, max {row['first_request_ms']['max']})")
+        print(f"  lazy modules loaded by import: {row['lazy_modules_loaded']}")
+        print("  heaviest imports: " + ', '.join(f"{name} {ms} ms" for name, ms in row['heaviest_imports_ms'].items()))
+        print("  boot phases: " + ', '.join(f"{name} {ms} ms" for name, ms in row['phases_ms'].items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': rows}, f, indent=2)
+
+    if args.max_first_request_ms:
+        slow = [row['mode'] for row in rows if row['first_request_ms']['median'] > args.max_first_request_ms]
+        if slow:
+            print(f"Time to first request above {args.max_first_request_ms} ms in: {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
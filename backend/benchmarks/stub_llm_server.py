@@ -0,0 +1,105 @@
+"""
+Local stand-in for the LLM providers: answers OpenAI-style chat completions
+(POST .../chat/completions) and Gemini generateContent
+(POST .../models/<model>:generateContent) with a fixed analysis verdict, or
+streams it as server-sent events (chat completions with "stream": true, and
+:streamGenerateContent).
+Point OPENROUTER_BASE_URL / GEMINI_BASE_URL at it to exercise timeouts,
+circuit breaking and hedging without real API calls.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+VERDICT = {
+    'problem': 'No significant problems detected',
+    'root_cause': 'Stub provider',
+    'recommendations': ['Continue monitoring'],
+    'retry_test': False,
+    'confidence': 0.9,
+    'severity': 'low'
+}
+
+# Characters per streamed event
+CHUNK_SIZE = 16
+
+
+class _StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+        server = self.server
+        server.requests += 1
+        if server.delay:
+            time.sleep(server.delay)
+
+        path = self.path.split('?')[0]
+        if server.status == 200 and (request.get('stream') or path.endswith(':streamGenerateContent')):
+            return self._stream(path.endswith(':streamGenerateContent'))
+
+        if server.status != 200:
+            body = b'{"error": "stub failure"}'
+        elif path.endswith(':generateContent'):
+            body = json.dumps({
+                'candidates': [{'content': {'parts': [{'text': json.dumps(VERDICT)}]}}]
+            }).encode()
+        else:
+            body = json.dumps({
+                'choices': [{'message': {'role': 'assistant', 'content': json.dumps(VERDICT)}}]
+            }).encode()
+
+        try:
+            self.send_response(server.status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up (timeout or a hedge that lost)
+
+    def _stream(self, gemini):
+        """Send the verdict in CHUNK_SIZE pieces, chunk_delay seconds apart"""
+        text = json.dumps(VERDICT)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for i in range(0, len(text), CHUNK_SIZE):
+                piece = text[i:i + CHUNK_SIZE]
+                if gemini:
+                    event = {'candidates': [{'content': {'parts': [{'text': piece}]}}]}
+                else:
+                    event = {'choices': [{'delta': {'content': piece}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+                if self.server.chunk_delay:
+                    time.sleep(self.server.chunk_delay)
+            if not gemini:
+                self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_llm_server(host='127.0.0.1', port=0, delay=0, status=200, chunk_delay=0):
+    """
+    Start the stub in a daemon thread; returns (server, base_url). delay,
+    status and chunk_delay can be changed on the returned server while it runs.
+    """
+    server = ThreadingHTTPServer((host, port), _StubLLMHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.status = status
+    server.chunk_delay = chunk_delay
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
@@ -0,0 +1,37 @@
+"""
+Local HTTP target for benchmarks: answers every request with a small fixed
+body over keep-alive, so measurements reflect the load generator rather than
+the system under test.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BODY = b'{"status": "ok"}'
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(host='127.0.0.1', port=0):
+    """Start the stub target in a daemon thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
@@ -0,0 +1,200 @@
+"""
+Health checks served from a cache. Probes (JMeter, AI providers, disk space)
+run on a background thread, each on its own interval, and /health only reads
+their latest results, so a load balancer probing every few seconds never
+starts a JVM or calls a provider. Probes run in parallel on a small pool, and
+one that has not answered within its timeout is reported as down. Deep checks
+re-run probes on demand, at most once per probe every min_deep_interval seconds.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+
+# A result older than this many probe intervals (plus the probe timeout) is stale
+STALE_INTERVALS = 2
+
+# Statuses that mean the checked dependency is not working; 'unavailable' and
+# 'unconfigured' are optional dependencies that were never set up
+FAILED_STATUSES = ('down',)
+
+# Query strings of URLs quoted in error text, which may carry credentials
+URL_QUERY = re.compile(r'(https?://[^\s?\'"]*)\?[^\s\'"]*')
+
+
+def redact_urls(text):
+    """Error text with the query string of every URL removed"""
+    return URL_QUERY.sub(r'\1', text)
+
+
+class HealthMonitor:
+    """Runs registered probes in the background and keeps their latest results"""
+
+    def __init__(self, min_deep_interval=10, max_workers=8):
+        self.min_deep_interval = min_deep_interval
+        self.checks = {}  # name -> {'probe', 'interval', 'timeout', 'critical', 'next_run'}
+        self.results = {}  # name -> (result, monotonic time checked)
+        self.running = {}  # name -> future of its latest probe call
+        self.lock = threading.Lock()
+        self.deep_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='health-probe')
+        self.thread = None
+
+    def register(self, name, probe, interval, timeout=10, critical=False, delay=0):
+        """
+        probe() returns a dict with a 'status' ('ok', 'degraded', 'down',
+        'unavailable' or 'unconfigured') and any details; an exception, or no
+        answer within timeout seconds, counts as 'down'. A critical check that
+        is down makes the service unhealthy.
+        Its first background run is delay seconds after start().
+        """
+        self.checks[name] = {
+            'probe': probe,
+            'interval': interval,
+            'timeout': timeout,
+            'critical': critical,
+            'next_run': time.monotonic() + delay
+        }
+
+    def start(self):
+        """Start the background probe thread (once)"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name='health-probes', daemon=True)
+            self.thread.start()
+
+    def _loop(self):
+        while True:
+            now = time.monotonic()
+            due = [name for name, check in list(self.checks.items()) if now >= check['next_run']]
+            self._run_all(due)
+            next_run = min((check['next_run'] for check in self.checks.values()), default=now + 60)
+            time.sleep(min(max(next_run - time.monotonic(), 0.5), 60))
+
+    def run(self, name):
+        """Run one probe now and cache its result"""
+        return self._run_all([name])[name]
+
+    def _run_all(self, names):
+        """Run probes in parallel, waiting for each at most its timeout; returns name -> result"""
+        started = time.monotonic()
+        futures = {name: self._submit(name) for name in names}
+        return {name: self._collect(name, future, started) for name, future in futures.items()}
+
+    def _submit(self, name):
+        """Start a probe, unless its previous call is still running past its timeout"""
+        with self.lock:
+            future = self.running.get(name)
+            if future is None or future.done():
+                future = self.running[name] = self.executor.submit(self._call, self.checks[name]['probe'])
+            return future
+
+    @staticmethod
+    def _call(probe):
+        """One probe call on the pool; returns (result, monotonic time it finished)"""
+        try:
+            result = dict(probe())
+        except Exception as e:
+            result = {'status': 'down', 'error': redact_urls(str(e))}
+        return result, time.monotonic()
+
+    def _collect(self, name, future, started):
+        check = self.checks[name]
+        try:
+            result, finished = future.result(timeout=max(started + check['timeout'] - time.monotonic(), 0))
+        except FutureTimeout:
+            result = {'status': 'down', 'error': f"No answer within {check['timeout']}s"}
+            finished = time.monotonic()
+        result['checkedAt'] = datetime.now().isoformat()
+        result['durationMs'] = round(max(finished - started, 0) * 1000, 1)
+        with self.lock:
+            self.results[name] = (result, finished)
+            check['next_run'] = finished + check['interval']
+        return result
+
+    def deep(self, names=None):
+        """
+        Re-run the named probes (default: all) in parallel, except those checked
+        less than min_deep_interval seconds ago, and return the snapshot.
+        Concurrent deep checks wait for each other instead of probing twice.
+        """
+        names = [name for name in (names or self.checks) if name in self.checks]
+        with self.deep_lock:
+            now = time.monotonic()
+            with self.lock:
+                due = [name for name in names
+                       if name not in self.results or now - self.results[name][1] >= self.min_deep_interval]
+            self._run_all(due)
+        return self.snapshot(names)
+
+    def snapshot(self, names=None):
+        """Overall status and every cached result with its age and staleness"""
+        now = time.monotonic()
+        checks = {}
+        status = 'healthy'
+        with self.lock:
+            for name in names or self.checks:
+                check = self.checks[name]
+                cached = self.results.get(name)
+                if cached is None:
+                    checks[name] = {'status': 'pending', 'stale': True, 'ageSeconds': None}
+                    continue
+                result, checked = cached
+                age = now - checked
+                stale = age > STALE_INTERVALS * check['interval'] + check['timeout']
+                checks[name] = dict(result, ageSeconds=round(age, 1), stale=stale)
+
+                if result['status'] in FAILED_STATUSES and check['critical']:
+                    status = 'unhealthy'
+                elif (result['status'] in FAILED_STATUSES or result['status'] == 'degraded' or stale) \
+                        and status == 'healthy':
+                    status = 'degraded'
+        return {'status': status, 'checks': checks}
+
+    def status_of(self, name):
+        """Cached status of one check, or None before its first run"""
+        with self.lock:
+            cached = self.results.get(name)
+        return cached[0]['status'] if cached else None
+
+
+def jmeter_probe(jmeter_bin, timeout=15):
+    """JMeter installed and runnable: starts a JVM, so keep its interval long"""
+    if not os.path.exists(jmeter_bin):
+        return {'status': 'unavailable', 'path': jmeter_bin}
+    result = subprocess.run([jmeter_bin, '--version'], capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        return {'status': 'down', 'path': jmeter_bin, 'error': (result.stderr or result.stdout)[-200:]}
+    version = next((line.strip() for line in result.stdout.splitlines() if line.strip()), '')
+    return {'status': 'ok', 'path': jmeter_bin, 'version': version}
+
+
+def disk_probe(path, min_free_mb):
+    """Free space where results are written; down below min_free_mb"""
+    usage = shutil.disk_usage(path)
+    free_mb = usage.free / (1024 * 1024)
+    return {
+        'status': 'ok' if free_mb >= min_free_mb else 'down',
+        'path': str(path),
+        'freeMb': round(free_mb),
+        'freePercent': round(usage.free / usage.total * 100, 1) if usage.total else 0,
+        'minFreeMb': min_free_mb
+    }
+
+
+def provider_probe(provider, timeout=5):
+    """
+    Provider reachable and the key accepted, through an endpoint that costs no
+    tokens; degraded while the provider's circuit breaker is not closed
+    """
+    circuit = provider.breaker.stats()
+    try:
+        latency = provider.probe(timeout)
+    except Exception as e:
+        return {'status': 'down', 'model': provider.model, 'circuit': circuit, 'error': redact_urls(str(e))}
+    status = 'ok' if circuit.get('state') == 'closed' else 'degraded'
+    return {'status': status, 'model': provider.model, 'circuit': circuit, 'latencyMs': round(latency * 1000, 1)}
@@ -0,0 +1,267 @@
+"""
+Index of finished tests behind the history API. Each test is one SQLite row
+whose config, status, SLO verdict and headline metrics are indexed columns,
+so a history page is a keyset (cursor) query whose cost follows the page size,
+and trends such as p95 per URL per day are GROUP BY queries over the index
+rather than a walk over every test.
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+
+# Sortable columns; missing metrics sort as -1 (last in descending order)
+SORT_COLUMNS = ('started_at', 'duration', 'users', 'p95', 'p99', 'avg_response_time',
+                'success_rate', 'error_rate', 'peak_rps')
+
+# Metrics that can be aggregated, and the columns results can be grouped by
+AGGREGATE_METRICS = ('p50', 'p95', 'p99', 'avg_response_time', 'success_rate', 'error_rate',
+                     'peak_rps', 'total_requests')
+GROUP_COLUMNS = ('url', 'type', 'engine', 'status')
+
+# Time buckets over started_at (ISO timestamps)
+BUCKETS = {
+    'hour': "strftime('%Y-%m-%dT%H:00', started_at)",
+    'day': "substr(started_at, 1, 10)",
+    'week': "strftime('%Y-W%W', started_at)",
+    'month': "substr(started_at, 1, 7)"
+}
+
+# Most groups one aggregate query returns
+MAX_AGGREGATE_ROWS = 5000
+
+# SLO thresholds a test config may set: results field checks
+SLO_FIELDS = ('p95_ms', 'p99_ms', 'avg_response_time_ms', 'error_rate', 'min_rps')
+
+
+def normalize_slo(slo, defaults=None):
+    """
+    SLO thresholds from a test config (p95_ms, p99_ms, avg_response_time_ms,
+    error_rate in percent, min_rps) over defaults; None when nothing is set.
+    Raises ValueError for unknown or non-numeric thresholds.
+    """
+    merged = dict(defaults or {})
+    if slo:
+        if not isinstance(slo, dict):
+            raise ValueError("slo must be an object")
+        unknown = set(slo) - set(SLO_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown SLO thresholds: {', '.join(sorted(unknown))}")
+        merged.update(slo)
+    thresholds = {}
+    for field, value in merged.items():
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"SLO threshold {field} must be a non-negative number")
+        thresholds[field] = value
+    return thresholds or None
+
+
+def evaluate_slo(slo, results):
+    """(passed, violations) of results against the thresholds; (None, []) without an SLO"""
+    if not slo:
+        return None, []
+    percentiles = results.get('responseTimePercentiles') or {}
+    observed = {
+        'p95_ms': percentiles.get('p95'),
+        'p99_ms': percentiles.get('p99'),
+        'avg_response_time_ms': results.get('avgResponseTime'),
+        'error_rate': _error_rate(results),
+        'min_rps': results.get('peakRPS')
+    }
+    violations = []
+    for field, threshold in slo.items():
+        value = observed.get(field)
+        if value is None:
+            violations.append({'slo': field, 'threshold': threshold, 'observed': None})
+        elif (value < threshold) if field == 'min_rps' else (value > threshold):
+            violations.append({'slo': field, 'threshold': threshold, 'observed': round(value, 3)})
+    return not violations, violations
+
+
+def _error_rate(results):
+    success_rate = results.get('successRate')
+    if not isinstance(success_rate, (int, float)) or not results.get('totalRequests'):
+        return None
+    return 100 - success_rate
+
+
+def history_entry(status, slo=None):
+    """
+    History entry of one finished test from its runner status; its metrics are
+    None (NULL, left out of aggregates) when the test produced no results
+    """
+    config = status.get('config') or {}
+    results = status.get('results') or {}
+    percentiles = results.get('responseTimePercentiles') or {}
+    slo_passed, violations = evaluate_slo(slo, results) if results else (None, [])
+    return {
+        "id": status.get('testId'),
+        "type": config.get('type', 'Unknown'),
+        "url": config.get('url', 'Unknown'),
+        "users": config.get('users', 0),
+        "duration": config.get('duration', 0),
+        "engine": config.get('engine'),
+        "status": status.get('status', 'unknown'),
+        "success_rate": results.get('successRate'),
+        "error_rate": _error_rate(results),
+        "avg_response_time": results.get('avgResponseTime'),
+        "p50": percentiles.get('p50'),
+        "p95": percentiles.get('p95'),
+        "p99": percentiles.get('p99'),
+        "peak_rps": results.get('peakRPS'),
+        "total_requests": results.get('totalRequests'),
+        "slo": slo,
+        "slo_passed": slo_passed,
+        "slo_violations": violations,
+        "error": status.get('error'),
+        "parent_test_id": config.get('parent_test_id'),
+        "retry_attempt": config.get('retry_attempt', 0),
+        "timestamp": status.get('startTime'),
+        "end_time": status.get('endTime')
+    }
+
+
+def encode_cursor(sort, order, value, row_id):
+    raw = json.dumps([sort, order, value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort, order):
+    """(sort value, row id) of a cursor made for the same sort and order"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_order, value, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError("Cursor was issued for a different sort order")
+    return value, row_id
+
+
+class HistoryIndex:
+    """SQLite-backed index of finished tests"""
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS tests ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, test_id TEXT UNIQUE, started_at TEXT NOT NULL, '
+            'type TEXT, url TEXT, engine TEXT, status TEXT, users INTEGER, duration REAL, '
+            'p50 REAL, p95 REAL, p99 REAL, avg_response_time REAL, success_rate REAL, error_rate REAL, '
+            'peak_rps REAL, total_requests INTEGER, slo_passed INTEGER, parent_test_id TEXT, record TEXT)'
+        )
+        # Every filter column leads an index that continues in the default sort order
+        self.db.execute('CREATE INDEX IF NOT EXISTS tests_started ON tests (started_at, id)')
+        for column in ('url', 'type', 'status', 'engine', 'slo_passed'):
+            self.db.execute(f'CREATE INDEX IF NOT EXISTS tests_{column} ON tests ({column}, started_at, id)')
+        self.db.commit()
+
+    def record(self, status, slo=None):
+        """Store (or replace) a finished test from its runner status; returns its history entry"""
+        entry = history_entry(status, slo)
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO tests (test_id, started_at, type, url, engine, status, users, duration, '
+                'p50, p95, p99, avg_response_time, success_rate, error_rate, peak_rps, total_requests, '
+                'slo_passed, parent_test_id, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (entry['id'], entry['timestamp'] or '', entry['type'], entry['url'], entry['engine'],
+                 entry['status'], entry['users'], entry['duration'], entry['p50'], entry['p95'], entry['p99'],
+                 entry['avg_response_time'], entry['success_rate'], entry['error_rate'], entry['peak_rps'],
+                 entry['total_requests'], entry['slo_passed'], entry['parent_test_id'],
+                 json.dumps(entry, default=str))
+            )
+            self.db.commit()
+        return entry
+
+    def page(self, filters=None, sort='started_at', order='desc', limit=50, cursor=None):
+        """
+        One page of entries matching filters, sorted by sort (then by insertion
+        order); returns (entries, cursor of the next page or None)
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort: {sort}. Expected one of {', '.join(SORT_COLUMNS)}")
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be asc or desc")
+        key = sort if sort == 'started_at' else f'IFNULL({sort}, -1)'
+        where, params = self._where(filters)
+        if cursor:
+            value, row_id = decode_cursor(cursor, sort, order)
+            where.append(f"({key}, id) {'<' if order == 'desc' else '>'} (?, ?)")
+            params += [value, row_id]
+        clause = f" WHERE {' AND '.join(where)}" if where else ''
+
+        with self.lock:
+            rows = self.db.execute(
+                f'SELECT id, {key}, record FROM tests{clause} ORDER BY {key} {order}, id {order} LIMIT ?',
+                params + [limit + 1]
+            ).fetchall()
+        next_cursor = encode_cursor(sort, order, rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        return [json.loads(record) for _, _, record in rows[:limit]], next_cursor
+
+    def aggregate(self, metric, group_by=('url',), bucket='day', filters=None):
+        """
+        Count, mean, min and max of a metric over the matching tests, per
+        combination of the group_by columns and time bucket (None: no bucket)
+        """
+        if metric not in AGGREGATE_METRICS:
+            raise ValueError(f"Unknown metric: {metric}. Expected one of {', '.join(AGGREGATE_METRICS)}")
+        unknown = [column for column in group_by if column not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(unknown)}. Expected any of {', '.join(GROUP_COLUMNS)}")
+        if bucket is not None and bucket not in BUCKETS:
+            raise ValueError(f"Unknown bucket: {bucket}. Expected one of {', '.join(BUCKETS)}")
+
+        groups = list(group_by) + ([f'{BUCKETS[bucket]} AS period'] if bucket else [])
+        group_names = list(group_by) + (['period'] if bucket else [])
+        where, params = self._where(filters)
+        where.append(f'{metric} IS NOT NULL')
+        select = ', '.join(groups + ['COUNT(*)', f'AVG({metric})', f'MIN({metric})', f'MAX({metric})'])
+        group_clause = f" GROUP BY {', '.join(group_names)} ORDER BY {', '.join(group_names)}" if group_names else ''
+
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {select} FROM tests WHERE {' AND '.join(where)}{group_clause} LIMIT ?",
+                params + [MAX_AGGREGATE_ROWS]
+            ).fetchall()
+
+        names = group_names + ['runs', 'avg', 'min', 'max']
+        return [
+            {name: round(value, 3) if isinstance(value, float) else value for name, value in zip(names, row)}
+            for row in rows
+        ]
+
+    def count(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM tests').fetchone()[0]
+
+    def _where(self, filters):
+        """WHERE conditions and parameters for type, url, url_prefix, engine, status, slo, from and to"""
+        where, params = [], []
+        filters = filters or {}
+        for column in ('type', 'url', 'engine', 'status'):
+            if filters.get(column):
+                where.append(f'{column} = ?')
+                params.append(filters[column])
+        if filters.get('url_prefix'):
+            # Range on the url index rather than LIKE, which SQLite would not index case-sensitively
+            where.append('url >= ? AND url < ?')
+            params += [filters['url_prefix'], filters['url_prefix'] + '\uffff']
+        if filters.get('slo'):
+            if filters['slo'] not in ('pass', 'fail'):
+                raise ValueError("slo must be pass or fail")
+            where.append('slo_passed = ?')
+            params.append(1 if filters['slo'] == 'pass' else 0)
+        if filters.get('from'):
+            where.append('started_at >= ?')
+            params.append(filters['from'])
+        if filters.get('to'):
+            # A bare date includes the whole day
+            to = filters['to']
+            where.append('started_at <= ?')
+            params.append(to + 'T23:59:59.999999' if len(to) == 10 else to)
+        return where, params
@@ -1,11 +1,55 @@
 import subprocess
 import os
+import csv
+import itertools
 import json
+import re
 import xmltodict
 import time
 import threading
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape
+from native_engine import NativeLoadProcess, load_profile
+from latency_stats import LatencyHistogram
+from metrics import REGISTRY, SLOW_BUCKETS
+from profiling import STAGES
+from scenarios import normalize_scenario
+from serving import run_blocking
+
+# JMeter save-service overrides for lean recording: CSV with just the columns
+# parse_jtl_results and the live metrics read
+LEAN_SAVE_SERVICE_PROPERTIES = {
+    'jmeter.save.saveservice.output_format': 'csv',
+    'jmeter.save.saveservice.print_field_names': 'true',
+    'jmeter.save.saveservice.timestamp_format': 'ms',
+    'jmeter.save.saveservice.time': 'true',
+    'jmeter.save.saveservice.label': 'true',
+    'jmeter.save.saveservice.response_code': 'true',
+    'jmeter.save.saveservice.successful': 'true',
+    'jmeter.save.saveservice.thread_counts': 'true',
+    'jmeter.save.saveservice.response_message': 'false',
+    'jmeter.save.saveservice.thread_name': 'false',
+    'jmeter.save.saveservice.data_type': 'false',
+    'jmeter.save.saveservice.assertion_results_failure_message': 'false',
+    'jmeter.save.saveservice.assertions': 'false',
+    'jmeter.save.saveservice.subresults': 'false',
+    'jmeter.save.saveservice.bytes': 'false',
+    'jmeter.save.saveservice.sent_bytes': 'false',
+    'jmeter.save.saveservice.url': 'false',
+    'jmeter.save.saveservice.latency': 'false',
+    'jmeter.save.saveservice.idle_time': 'false',
+    'jmeter.save.saveservice.connect_time': 'false'
+}
+
+# Test ids name files in the results directory: test_<timestamp>, and <root>_retry<n> for retries
+TEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9_]+$')
+
+JTL_PARSE_SECONDS = REGISTRY.histogram('ludo_jtl_parse_duration_seconds', 'Time to parse a finished test\'s JTL file',
+                                       ('outcome',), SLOW_BUCKETS)
+JTL_ROWS_PARSED = REGISTRY.counter('ludo_jtl_rows_parsed', 'Samples read from parsed JTL files')
+
 
 class JMeterRunner:
     def __init__(self):
@@ -14,6 +58,8 @@ class JMeterRunner:
         self.results_dir = Path("jmeter_results")
         self.results_dir.mkdir(exist_ok=True)
         self.active_tests = {}
+        # Called with a test's id once its final status (and any results) is set
+        self.on_finished = None
         
     def create_jmx_file(self, test_config):
         """Create JMeter test plan (.jmx file) based on test configuration"""
@@ -24,18 +70,20 @@ class JMeterRunner:
         duration = test_config['duration']
         ramp_up = test_config['ramp_up']
         think_time = test_config['think_time']
+        scenario = test_config.get('scenario') or normalize_scenario(None, target_url)
+        recording = test_config.get('recording', 'full')
         
         # Create JMX content based on test type
         if test_type == "Load Test":
-            jmx_content = self._create_load_test_jmx(test_id, target_url, users, duration, ramp_up, think_time)
+            jmx_content = self._create_load_test_jmx(test_id, target_url, users, duration, ramp_up, think_time, scenario, recording)
         elif test_type == "Stress Test":
-            jmx_content = self._create_stress_test_jmx(test_id, target_url, users, duration, ramp_up, think_time)
+            jmx_content = self._create_stress_test_jmx(test_id, target_url, users, duration, ramp_up, think_time, scenario, recording)
         elif test_type == "Spike Test":
-            jmx_content = self._create_spike_test_jmx(test_id, target_url, users, duration, ramp_up, think_time)
+            jmx_content = self._create_spike_test_jmx(test_id, target_url, users, duration, ramp_up, think_time, scenario, recording)
         elif test_type == "Soak Test":
-            jmx_content = self._create_soak_test_jmx(test_id, target_url, users, duration, ramp_up, think_time)
+            jmx_content = self._create_soak_test_jmx(test_id, target_url, users, duration, ramp_up, think_time, scenario, recording)
         else:
-            jmx_content = self._create_load_test_jmx(test_id, target_url, users, duration, ramp_up, think_time)
+            jmx_content = self._create_load_test_jmx(test_id, target_url, users, duration, ramp_up, think_time, scenario, recording)
         
         # Save JMX file
         jmx_file = self.results_dir / f"{test_id}.jmx"
@@ -43,48 +91,62 @@ class JMeterRunner:
             f.write(jmx_content)
         
         return str(jmx_file)
-    
-    def _create_load_test_jmx(self, test_id, target_url, users, duration, ramp_up, think_time):
-        """Create JMX for Load Test"""
-        return f"""<?xml version="1.0" encoding="UTF-8"?>
-<jmeterTestPlan version="1.2" properties="5.0" jmeter="5.6.2">
-  <hashTree>
-    <TestPlan guiclass="TestPlanGui" testclass="TestPlan" testname="Load Test - {test_id}" enabled="true">
-      <stringProp name="TestPlan.comments"></stringProp>
-      <boolProp name="TestPlan.functional_mode">false</boolProp>
-      <boolProp name="TestPlan.tearDown_on_shutdown">true</boolProp>
-      <boolProp name="TestPlan.serialize_threadgroups">false</boolProp>
-      <elementProp name="TestPlan.arguments" elementType="Arguments" guiclass="ArgumentsPanel" testclass="Arguments" testname="User Defined Variables" enabled="true">
-        <collectionProp name="Arguments.arguments"/>
-      </elementProp>
-      <stringProp name="TestPlan.user_define_classpath"></stringProp>
-    </TestPlan>
-    <hashTree>
-      <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="Thread Group" enabled="true">
-        <stringProp name="ThreadGroup.on_sample_error">continue</stringProp>
-        <elementProp name="ThreadGroup.main_controller" elementType="LoopController" guiclass="LoopControllerPanel" testclass="LoopController" testname="Loop Controller" enabled="true">
-          <boolProp name="LoopController.continue_forever">false</boolProp>
-          <stringProp name="LoopController.loops">-1</stringProp>
-        </elementProp>
-        <stringProp name="ThreadGroup.num_threads">{users}</stringProp>
-        <stringProp name="ThreadGroup.ramp_time">{ramp_up}</stringProp>
-        <boolProp name="ThreadGroup.scheduler">true</boolProp>
-        <stringProp name="ThreadGroup.duration">{duration}</stringProp>
-        <stringProp name="ThreadGroup.delay">0</stringProp>
-        <boolProp name="ThreadGroup.same_user_on_next_iteration">true</boolProp>
-        <stringProp name="ThreadGroup.duration">600</stringProp>
-      </ThreadGroup>
-      <hashTree>
-        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="HTTP Request" enabled="true">
-          <elementProp name="HTTPsampler.Arguments" elementType="Arguments" guiclass="HTTPArgumentsPanel" testclass="Arguments" testname="User Defined Variables" enabled="true">
+
+    def _create_samplers_xml(self, target_url, scenario, think_time):
+        """
+        Build the sampler part of the thread group. A single request is emitted as a
+        plain sampler; a weighted scenario puts the samplers under a Switch Controller
+        whose value is drawn by weight once per iteration, so every iteration sends
+        exactly one request and the traffic mix follows the weights.
+        All samplers hit the same host with keep-alive, so each thread reuses its connection.
+        """
+        target = urlsplit(target_url)
+        domain = escape(target.hostname or '')
+        port = target.port or ''
+        protocol = escape(target.scheme or 'http')
+
+        samplers = []
+        for request in scenario:
+            label = escape(request['label'], {'"': '&quot;'})
+
+            if request.get('body') is not None:
+                arguments = f"""          <boolProp name="HTTPSampler.postBodyRaw">true</boolProp>
+          <elementProp name="HTTPsampler.Arguments" elementType="Arguments">
+            <collectionProp name="Arguments.arguments">
+              <elementProp name="" elementType="HTTPArgument">
+                <boolProp name="HTTPArgument.always_encode">false</boolProp>
+                <stringProp name="Argument.value">{escape(request['body'])}</stringProp>
+                <stringProp name="Argument.metadata">=</stringProp>
+              </elementProp>
+            </collectionProp>
+          </elementProp>"""
+            else:
+                arguments = """          <elementProp name="HTTPsampler.Arguments" elementType="Arguments" guiclass="HTTPArgumentsPanel" testclass="Arguments" testname="User Defined Variables" enabled="true">
             <collectionProp name="Arguments.arguments"/>
-          </elementProp>
-          <stringProp name="HTTPSampler.domain">{target_url.split('://')[1].split('/')[0]}</stringProp>
-          <stringProp name="HTTPSampler.port"></stringProp>
-          <stringProp name="HTTPSampler.protocol">{target_url.split('://')[0]}</stringProp>
+          </elementProp>"""
+
+            header_manager = ''
+            if request.get('headers'):
+                headers = '\n'.join(f"""              <elementProp name="" elementType="Header">
+                <stringProp name="Header.name">{escape(name)}</stringProp>
+                <stringProp name="Header.value">{escape(value)}</stringProp>
+              </elementProp>""" for name, value in request['headers'].items())
+                header_manager = f"""
+          <HeaderManager guiclass="HeaderPanel" testclass="HeaderManager" testname="HTTP Header Manager" enabled="true">
+            <collectionProp name="HeaderManager.headers">
+{headers}
+            </collectionProp>
+          </HeaderManager>
+          <hashTree/>"""
+
+            sampler = f"""        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="{label}" enabled="true">
+{arguments}
+          <stringProp name="HTTPSampler.domain">{domain}</stringProp>
+          <stringProp name="HTTPSampler.port">{port}</stringProp>
+          <stringProp name="HTTPSampler.protocol">{protocol}</stringProp>
           <stringProp name="HTTPSampler.contentEncoding"></stringProp>
-          <stringProp name="HTTPSampler.path">/</stringProp>
-          <stringProp name="HTTPSampler.method">GET</stringProp>
+          <stringProp name="HTTPSampler.path">{escape(request['path'])}</stringProp>
+          <stringProp name="HTTPSampler.method">{request['method']}</stringProp>
           <boolProp name="HTTPSampler.follow_redirects">true</boolProp>
           <boolProp name="HTTPSampler.auto_redirects">false</boolProp>
           <boolProp name="HTTPSampler.use_keepalive">true</boolProp>
@@ -97,46 +159,49 @@ class JMeterRunner:
           <ConstantTimer guiclass="ConstantTimerGui" testclass="ConstantTimer" testname="Constant Timer" enabled="true">
             <stringProp name="ConstantTimer.delay">{think_time}</stringProp>
           </ConstantTimer>
-          <hashTree/>
-        </hashTree>
-        <ResultCollector guiclass="ViewResultsFullVisualizer" testclass="ResultCollector" testname="View Results Tree" enabled="true">
-          <boolProp name="ResultCollector.error_logging">false</boolProp>
-          <objProp>
-            <name>saveConfig</name>
-            <value class="SampleSaveConfiguration">
-              <time>true</time>
-              <latency>true</latency>
-              <timestamp>true</timestamp>
-              <success>true</success>
-              <label>true</label>
-              <code>true</code>
-              <message>true</message>
-              <threadName>true</threadName>
-              <dataType>true</dataType>
-              <encoding>false</encoding>
-              <assertions>true</assertions>
-              <subresults>true</subresults>
-              <responseData>false</responseData>
-              <samplerData>false</samplerData>
-              <xml>false</xml>
-              <fieldNames>true</fieldNames>
-              <responseHeaders>false</responseHeaders>
-              <requestHeaders>false</requestHeaders>
-              <responseDataOnError>false</responseDataOnError>
-              <saveAssertionResultsFailureMessage>true</saveAssertionResultsFailureMessage>
-              <assertionsResultsToSave>0</assertionsResultsToSave>
-              <bytes>true</bytes>
-              <sentBytes>true</sentBytes>
-              <url>true</url>
-              <threadCounts>true</threadCounts>
-              <idleTime>true</idleTime>
-              <connectTime>true</connectTime>
-            </value>
-          </objProp>
-          <stringProp name="filename"></stringProp>
-        </ResultCollector>
-        <hashTree/>
-        <ResultCollector guiclass="SummaryReport" testclass="ResultCollector" testname="Summary Report" enabled="true">
+          <hashTree/>{header_manager}
+        </hashTree>"""
+
+            samplers.append(sampler)
+
+        if len(scenario) == 1:
+            return samplers[0]
+
+        # Indent the samplers one level under the controller
+        samplers = '\n'.join('  ' + line for sampler in samplers for line in sampler.split('\n'))
+        return f"""        <SwitchController guiclass="SwitchControllerGui" testclass="SwitchController" testname="Weighted scenario" enabled="true">
+          <stringProp name="SwitchController.value">{escape(self._weighted_choice(scenario))}</stringProp>
+        </SwitchController>
+        <hashTree>
+{samplers}
+        </hashTree>"""
+
+    @staticmethod
+    def _weighted_choice(scenario):
+        """
+        A __groovy function that returns a scenario index with probability
+        proportional to its weight. The Switch Controller evaluates its value
+        once per iteration. The expression has no commas, which JMeter would
+        read as function argument separators.
+        """
+        branches = []
+        cumulative = 0.0
+        for index, request in enumerate(scenario[:-1]):
+            cumulative += request['weight']
+            branches.append(f"r < {cumulative:.6f} ? {index} : ")
+        return f"${{__groovy(def r = Math.random() * 100; {''.join(branches)}{len(scenario) - 1})}}"
+
+    def _create_listeners_xml(self, recording, listeners):
+        """
+        Build the plan's result listeners. Lean recording drops them entirely: in
+        non-GUI mode they only duplicate the -l results file, at the cost of a
+        second write per sample.
+        """
+        if recording == 'lean':
+            return ''
+        
+        return ''.join(f"""
+        <ResultCollector guiclass="{guiclass}" testclass="ResultCollector" testname="{testname}" enabled="true">
           <boolProp name="ResultCollector.error_logging">false</boolProp>
           <objProp>
             <name>saveConfig</name>
@@ -172,13 +237,46 @@ class JMeterRunner:
           </objProp>
           <stringProp name="filename"></stringProp>
         </ResultCollector>
-        <hashTree/>
+        <hashTree/>""" for guiclass, testname in listeners)
+
+    def _create_load_test_jmx(self, test_id, target_url, users, duration, ramp_up, think_time, scenario, recording):
+        """Create JMX for Load Test"""
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<jmeterTestPlan version="1.2" properties="5.0" jmeter="5.6.2">
+  <hashTree>
+    <TestPlan guiclass="TestPlanGui" testclass="TestPlan" testname="Load Test - {test_id}" enabled="true">
+      <stringProp name="TestPlan.comments"></stringProp>
+      <boolProp name="TestPlan.functional_mode">false</boolProp>
+      <boolProp name="TestPlan.tearDown_on_shutdown">true</boolProp>
+      <boolProp name="TestPlan.serialize_threadgroups">false</boolProp>
+      <elementProp name="TestPlan.arguments" elementType="Arguments" guiclass="ArgumentsPanel" testclass="Arguments" testname="User Defined Variables" enabled="true">
+        <collectionProp name="Arguments.arguments"/>
+      </elementProp>
+      <stringProp name="TestPlan.user_define_classpath"></stringProp>
+    </TestPlan>
+    <hashTree>
+      <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="Thread Group" enabled="true">
+        <stringProp name="ThreadGroup.on_sample_error">continue</stringProp>
+        <elementProp name="ThreadGroup.main_controller" elementType="LoopController" guiclass="LoopControllerPanel" testclass="LoopController" testname="Loop Controller" enabled="true">
+          <boolProp name="LoopController.continue_forever">false</boolProp>
+          <stringProp name="LoopController.loops">-1</stringProp>
+        </elementProp>
+        <stringProp name="ThreadGroup.num_threads">{users}</stringProp>
+        <stringProp name="ThreadGroup.ramp_time">{ramp_up}</stringProp>
+        <boolProp name="ThreadGroup.scheduler">true</boolProp>
+        <stringProp name="ThreadGroup.duration">{duration}</stringProp>
+        <stringProp name="ThreadGroup.delay">0</stringProp>
+        <boolProp name="ThreadGroup.same_user_on_next_iteration">true</boolProp>
+        <stringProp name="ThreadGroup.duration">600</stringProp>
+      </ThreadGroup>
+      <hashTree>
+{self._create_samplers_xml(target_url, scenario, think_time)}{self._create_listeners_xml(recording, [("ViewResultsFullVisualizer", "View Results Tree"), ("SummaryReport", "Summary Report")])}
       </hashTree>
     </hashTree>
   </hashTree>
 </jmeterTestPlan>"""
     
-    def _create_stress_test_jmx(self, test_id, target_url, users, duration, ramp_up, think_time):
+    def _create_stress_test_jmx(self, test_id, target_url, users, duration, ramp_up, think_time, scenario, recording):
         """Create JMX for Stress Test - Higher load with gradual increase"""
         return f"""<?xml version="1.0" encoding="UTF-8"?>
 <jmeterTestPlan version="1.2" properties="5.0" jmeter="5.6.2">
@@ -208,73 +306,13 @@ class JMeterRunner:
         <boolProp name="ThreadGroup.same_user_on_next_iteration">true</boolProp>
       </ThreadGroup>
       <hashTree>
-        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="HTTP Request" enabled="true">
-          <elementProp name="HTTPsampler.Arguments" elementType="Arguments" guiclass="HTTPArgumentsPanel" testclass="Arguments" testname="User Defined Variables" enabled="true">
-            <collectionProp name="Arguments.arguments"/>
-          </elementProp>
-          <stringProp name="HTTPSampler.domain">{target_url.split('://')[1].split('/')[0]}</stringProp>
-          <stringProp name="HTTPSampler.port"></stringProp>
-          <stringProp name="HTTPSampler.protocol">{target_url.split('://')[0]}</stringProp>
-          <stringProp name="HTTPSampler.contentEncoding"></stringProp>
-          <stringProp name="HTTPSampler.path">/</stringProp>
-          <stringProp name="HTTPSampler.method">GET</stringProp>
-          <boolProp name="HTTPSampler.follow_redirects">true</boolProp>
-          <boolProp name="HTTPSampler.auto_redirects">false</boolProp>
-          <boolProp name="HTTPSampler.use_keepalive">true</boolProp>
-          <boolProp name="HTTPSampler.DO_MULTIPART_POST">false</boolProp>
-          <stringProp name="HTTPSampler.embedded_url_re"></stringProp>
-          <stringProp name="HTTPSampler.connect_timeout"></stringProp>
-          <stringProp name="HTTPSampler.response_timeout"></stringProp>
-        </HTTPSamplerProxy>
-        <hashTree>
-          <ConstantTimer guiclass="ConstantTimerGui" testclass="ConstantTimer" testname="Constant Timer" enabled="true">
-            <stringProp name="ConstantTimer.delay">{think_time // 2}</stringProp>
-          </ConstantTimer>
-          <hashTree/>
-        </hashTree>
-        <ResultCollector guiclass="SummaryReport" testclass="ResultCollector" testname="Summary Report" enabled="true">
-          <boolProp name="ResultCollector.error_logging">false</boolProp>
-          <objProp>
-            <name>saveConfig</name>
-            <value class="SampleSaveConfiguration">
-              <time>true</time>
-              <latency>true</latency>
-              <timestamp>true</timestamp>
-              <success>true</success>
-              <label>true</label>
-              <code>true</code>
-              <message>true</message>
-              <threadName>true</threadName>
-              <dataType>true</dataType>
-              <encoding>false</encoding>
-              <assertions>true</assertions>
-              <subresults>true</subresults>
-              <responseData>false</responseData>
-              <samplerData>false</samplerData>
-              <xml>false</xml>
-              <fieldNames>true</fieldNames>
-              <responseHeaders>false</responseHeaders>
-              <requestHeaders>false</requestHeaders>
-              <responseDataOnError>false</responseDataOnError>
-              <saveAssertionResultsFailureMessage>true</saveAssertionResultsFailureMessage>
-              <assertionsResultsToSave>0</assertionsResultsToSave>
-              <bytes>true</bytes>
-              <sentBytes>true</sentBytes>
-              <url>true</url>
-              <threadCounts>true</threadCounts>
-              <idleTime>true</idleTime>
-              <connectTime>true</connectTime>
-            </value>
-          </objProp>
-          <stringProp name="filename"></stringProp>
-        </ResultCollector>
-        <hashTree/>
+{self._create_samplers_xml(target_url, scenario, think_time // 2)}{self._create_listeners_xml(recording, [("SummaryReport", "Summary Report")])}
       </hashTree>
     </hashTree>
   </hashTree>
 </jmeterTestPlan>"""
     
-    def _create_spike_test_jmx(self, test_id, target_url, users, duration, ramp_up, think_time):
+    def _create_spike_test_jmx(self, test_id, target_url, users, duration, ramp_up, think_time, scenario, recording):
         """Create JMX for Spike Test - Sudden load spikes"""
         return f"""<?xml version="1.0" encoding="UTF-8"?>
 <jmeterTestPlan version="1.2" properties="5.0" jmeter="5.6.2">
@@ -304,73 +342,13 @@ class JMeterRunner:
         <boolProp name="ThreadGroup.same_user_on_next_iteration">true</boolProp>
       </ThreadGroup>
       <hashTree>
-        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="HTTP Request" enabled="true">
-          <elementProp name="HTTPsampler.Arguments" elementType="Arguments" guiclass="HTTPArgumentsPanel" testclass="Arguments" testname="User Defined Variables" enabled="true">
-            <collectionProp name="Arguments.arguments"/>
-          </elementProp>
-          <stringProp name="HTTPSampler.domain">{target_url.split('://')[1].split('/')[0]}</stringProp>
-          <stringProp name="HTTPSampler.port"></stringProp>
-          <stringProp name="HTTPSampler.protocol">{target_url.split('://')[0]}</stringProp>
-          <stringProp name="HTTPSampler.contentEncoding"></stringProp>
-          <stringProp name="HTTPSampler.path">/</stringProp>
-          <stringProp name="HTTPSampler.method">GET</stringProp>
-          <boolProp name="HTTPSampler.follow_redirects">true</boolProp>
-          <boolProp name="HTTPSampler.auto_redirects">false</boolProp>
-          <boolProp name="HTTPSampler.use_keepalive">true</boolProp>
-          <boolProp name="HTTPSampler.DO_MULTIPART_POST">false</boolProp>
-          <stringProp name="HTTPSampler.embedded_url_re"></stringProp>
-          <stringProp name="HTTPSampler.connect_timeout"></stringProp>
-          <stringProp name="HTTPSampler.response_timeout"></stringProp>
-        </HTTPSamplerProxy>
-        <hashTree>
-          <ConstantTimer guiclass="ConstantTimerGui" testclass="ConstantTimer" testname="Constant Timer" enabled="true">
-            <stringProp name="ConstantTimer.delay">100</stringProp>
-          </ConstantTimer>
-          <hashTree/>
-        </hashTree>
-        <ResultCollector guiclass="SummaryReport" testclass="ResultCollector" testname="Summary Report" enabled="true">
-          <boolProp name="ResultCollector.error_logging">false</boolProp>
-          <objProp>
-            <name>saveConfig</name>
-            <value class="SampleSaveConfiguration">
-              <time>true</time>
-              <latency>true</latency>
-              <timestamp>true</timestamp>
-              <success>true</success>
-              <label>true</label>
-              <code>true</code>
-              <message>true</message>
-              <threadName>true</threadName>
-              <dataType>true</dataType>
-              <encoding>false</encoding>
-              <assertions>true</assertions>
-              <subresults>true</subresults>
-              <responseData>false</responseData>
-              <samplerData>false</samplerData>
-              <xml>false</xml>
-              <fieldNames>true</fieldNames>
-              <responseHeaders>false</responseHeaders>
-              <requestHeaders>false</requestHeaders>
-              <responseDataOnError>false</responseDataOnError>
-              <saveAssertionResultsFailureMessage>true</saveAssertionResultsFailureMessage>
-              <assertionsResultsToSave>0</assertionsResultsToSave>
-              <bytes>true</bytes>
-              <sentBytes>true</sentBytes>
-              <url>true</url>
-              <threadCounts>true</threadCounts>
-              <idleTime>true</idleTime>
-              <connectTime>true</connectTime>
-            </value>
-          </objProp>
-          <stringProp name="filename"></stringProp>
-        </ResultCollector>
-        <hashTree/>
+{self._create_samplers_xml(target_url, scenario, 100)}{self._create_listeners_xml(recording, [("SummaryReport", "Summary Report")])}
       </hashTree>
     </hashTree>
   </hashTree>
 </jmeterTestPlan>"""
     
-    def _create_soak_test_jmx(self, test_id, target_url, users, duration, ramp_up, think_time):
+    def _create_soak_test_jmx(self, test_id, target_url, users, duration, ramp_up, think_time, scenario, recording):
         """Create JMX for Soak Test - Extended duration with steady load"""
         return f"""<?xml version="1.0" encoding="UTF-8"?>
 <jmeterTestPlan version="1.2" properties="5.0" jmeter="5.6.2">
@@ -400,67 +378,7 @@ class JMeterRunner:
         <boolProp name="ThreadGroup.same_user_on_next_iteration">true</boolProp>
       </ThreadGroup>
       <hashTree>
-        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="HTTP Request" enabled="true">
-          <elementProp name="HTTPsampler.Arguments" elementType="Arguments" guiclass="HTTPArgumentsPanel" testclass="Arguments" testname="User Defined Variables" enabled="true">
-            <collectionProp name="Arguments.arguments"/>
-          </elementProp>
-          <stringProp name="HTTPSampler.domain">{target_url.split('://')[1].split('/')[0]}</stringProp>
-          <stringProp name="HTTPSampler.port"></stringProp>
-          <stringProp name="HTTPSampler.protocol">{target_url.split('://')[0]}</stringProp>
-          <stringProp name="HTTPSampler.contentEncoding"></stringProp>
-          <stringProp name="HTTPSampler.path">/</stringProp>
-          <stringProp name="HTTPSampler.method">GET</stringProp>
-          <boolProp name="HTTPSampler.follow_redirects">true</boolProp>
-          <boolProp name="HTTPSampler.auto_redirects">false</boolProp>
-          <boolProp name="HTTPSampler.use_keepalive">true</boolProp>
-          <boolProp name="HTTPSampler.DO_MULTIPART_POST">false</boolProp>
-          <stringProp name="HTTPSampler.embedded_url_re"></stringProp>
-          <stringProp name="HTTPSampler.connect_timeout"></stringProp>
-          <stringProp name="HTTPSampler.response_timeout"></stringProp>
-        </HTTPSamplerProxy>
-        <hashTree>
-          <ConstantTimer guiclass="ConstantTimerGui" testclass="ConstantTimer" testname="Constant Timer" enabled="true">
-            <stringProp name="ConstantTimer.delay">{think_time}</stringProp>
-          </ConstantTimer>
-          <hashTree/>
-        </hashTree>
-        <ResultCollector guiclass="SummaryReport" testclass="ResultCollector" testname="Summary Report" enabled="true">
-          <boolProp name="ResultCollector.error_logging">false</boolProp>
-          <objProp>
-            <name>saveConfig</name>
-            <value class="SampleSaveConfiguration">
-              <time>true</time>
-              <latency>true</latency>
-              <timestamp>true</timestamp>
-              <success>true</success>
-              <label>true</label>
-              <code>true</code>
-              <message>true</message>
-              <threadName>true</threadName>
-              <dataType>true</dataType>
-              <encoding>false</encoding>
-              <assertions>true</assertions>
-              <subresults>true</subresults>
-              <responseData>false</responseData>
-              <samplerData>false</samplerData>
-              <xml>false</xml>
-              <fieldNames>true</fieldNames>
-              <responseHeaders>false</responseHeaders>
-              <requestHeaders>false</requestHeaders>
-              <responseDataOnError>false</responseDataOnError>
-              <saveAssertionResultsFailureMessage>true</saveAssertionResultsFailureMessage>
-              <assertionsResultsToSave>0</assertionsResultsToSave>
-              <bytes>true</bytes>
-              <sentBytes>true</sentBytes>
-              <url>true</url>
-              <threadCounts>true</threadCounts>
-              <idleTime>true</idleTime>
-              <connectTime>true</connectTime>
-            </value>
-          </objProp>
-          <stringProp name="filename"></stringProp>
-        </ResultCollector>
-        <hashTree/>
+{self._create_samplers_xml(target_url, scenario, think_time)}{self._create_listeners_xml(recording, [("SummaryReport", "Summary Report")])}
       </hashTree>
     </hashTree>
   </hashTree>
@@ -469,33 +387,48 @@ class JMeterRunner:
     def run_jmeter_test(self, test_config):
         """Run JMeter test and return results"""
         test_id = test_config['id']
-        
-        # Create JMX file
-        jmx_file = self.create_jmx_file(test_config)
+        engine = 'native' if test_config.get('replay') else test_config.get('engine', 'jmeter')
         
         # Prepare output files
         jtl_file = self.results_dir / f"{test_id}.jtl"
         log_file = self.results_dir / f"{test_id}.log"
         
-        # Build JMeter command
-        cmd = [
-            self.jmeter_bin,
-            '-n',  # Non-GUI mode
-            '-t', jmx_file,  # Test plan file
-            '-l', str(jtl_file),  # Results file
-            '-j', str(log_file),  # Log file
-            '-e',  # Generate report
-            '-o', str(self.results_dir / f"{test_id}_report")  # Report directory
-        ]
-        
         try:
-            # Run JMeter
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            if engine == 'native':
+                # JVM-free asyncio engine (and access-log replay), writes the same JTL layout
+                with STAGES.span(test_id, 'launch'):
+                    process = NativeLoadProcess(test_config, jtl_file).start()
+            else:
+                # Create JMX file
+                with STAGES.span(test_id, 'create_jmx'):
+                    jmx_file = self.create_jmx_file(test_config)
+                
+                # Build JMeter command
+                cmd = [
+                    self.jmeter_bin,
+                    '-n',  # Non-GUI mode
+                    '-t', jmx_file,  # Test plan file
+                    '-l', str(jtl_file),  # Results file
+                    '-j', str(log_file)  # Log file
+                ]
+                
+                if test_config.get('recording') == 'lean':
+                    # Only the columns the parser reads, buffered; the HTML report needs the full set
+                    cmd += [f"-J{name}={value}" for name, value in LEAN_SAVE_SERVICE_PROPERTIES.items()]
+                else:
+                    cmd += [
+                        '-e',  # Generate report
+                        '-o', str(self.results_dir / f"{test_id}_report")  # Report directory
+                    ]
+                
+                # Run JMeter
+                with STAGES.span(test_id, 'launch'):
+                    process = subprocess.Popen(
+                        cmd,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True
+                    )
             
             # Store process info
             self.active_tests[test_id] = {
@@ -516,77 +449,191 @@ class JMeterRunner:
             return {
                 'success': True,
                 'test_id': test_id,
-                'message': f"JMeter test {test_id} started successfully"
+                'message': f"{'Native' if engine == 'native' else 'JMeter'} test {test_id} started successfully"
             }
             
         except Exception as e:
             return {
                 'success': False,
-                'error': f"Failed to start JMeter test: {str(e)}"
+                'error': f"Failed to start {'native' if engine == 'native' else 'JMeter'} test: {str(e)}"
             }
     
     def _monitor_test(self, test_id, process, jtl_file):
         """Monitor test progress and update status"""
         try:
             # Wait for process to complete
-            stdout, stderr = process.communicate()
+            with STAGES.span(test_id, 'run'):
+                stdout, stderr = process.communicate()
             
             # Update test status
             if test_id in self.active_tests:
-                self.active_tests[test_id]['status'] = 'completed'
                 self.active_tests[test_id]['end_time'] = datetime.now()
                 self.active_tests[test_id]['stdout'] = stdout
                 self.active_tests[test_id]['stderr'] = stderr
                 
                 # Parse results if JTL file exists
                 if jtl_file.exists():
-                    results = self.parse_jtl_results(jtl_file)
+                    expected_interval = self._expected_interval(self.active_tests[test_id]['config'])
+                    results = run_blocking(self.parse_jtl_results, jtl_file, expected_interval)
                     self.active_tests[test_id]['results'] = results
+                
+                # Completed only once the results are stored: status readers treat it as final.
+                # A stopped test keeps its status, now with the results it recorded
+                if self.active_tests[test_id]['status'] != 'stopped':
+                    self.active_tests[test_id]['status'] = 'completed'
                     
         except Exception as e:
             if test_id in self.active_tests:
                 self.active_tests[test_id]['status'] = 'failed'
                 self.active_tests[test_id]['error'] = str(e)
+        
+        if self.on_finished and test_id in self.active_tests:
+            try:
+                self.on_finished(test_id)
+            except Exception as e:
+                print(f"Finish handler failed for {test_id}: {e}")
+    
+    def _expected_interval(self, test_config):
+        """Expected per-thread request interval (ms) for coordinated-omission correction, or None"""
+        if not test_config.get('co_correction'):
+            return None
+        if test_config.get('expected_interval'):
+            return int(test_config['expected_interval'])
+        # Closed model with a constant timer: each thread is meant to fire once per think time
+        return load_profile(test_config)['think_time'] or None
     
-    def parse_jtl_results(self, jtl_file):
-        """Parse JMeter JTL results file"""
+    def parse_jtl_results(self, jtl_file, expected_interval=None):
+        """
+        Parse JMeter JTL results file (CSV). Rows are streamed, so memory stays
+        flat regardless of file size. When expected_interval (ms) is given,
+        coordinated-omission-corrected percentiles are reported next to the raw ones.
+        timeSeries holds per-second requests, errors, latency and active threads.
+        Its stages (reading rows, aggregation, saving histograms) are timed per test.
+        """
+        test_id = jtl_file.stem
+        started = time.perf_counter()
         try:
-            with open(jtl_file, 'r') as f:
-                lines = f.readlines()
+            raw = LatencyHistogram()
+            corrected = LatencyHistogram() if expected_interval else None
+            synthetic_samples = 0
+            labels = {}
+            errors = {}
+            seconds = {}  # epoch second -> [requests, errors, elapsed sum, max elapsed, threads]
+            total_requests = 0
+            successful_requests = 0
+            start_time = None
+            end_time = None
             
-            # Skip header
-            data_lines = [line.strip().split(',') for line in lines[1:] if line.strip()]
+            with open(jtl_file, 'r', newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None) or []
+                
+                # Locate columns by name; fall back to JMeter's default CSV layout
+                if header and not header[0].isdigit():
+                    columns = {name: i for i, name in enumerate(header)}
+                    rows = reader
+                else:
+                    columns = {}
+                    rows = itertools.chain([header], reader) if header else reader
+                timestamp_col = columns.get('timeStamp', 0)
+                elapsed_col = columns.get('elapsed', 1)
+                success_col = columns.get('success', 7)
+                label_col = columns.get('label', 2)
+                code_col = columns.get('responseCode', 3)
+                threads_col = columns.get('allThreads', 12)
+                
+                for row in rows:
+                    if not row:
+                        continue
+                    total_requests += 1
+                    
+                    label_stats = labels.get(row[label_col])
+                    if label_stats is None:
+                        label_stats = labels[row[label_col]] = {'requests': 0, 'successful': 0, 'histogram': LatencyHistogram()}
+                    label_stats['requests'] += 1
+                    
+                    success = row[success_col] == 'true'
+                    if success:
+                        successful_requests += 1
+                        label_stats['successful'] += 1
+                    else:
+                        errors[row[code_col]] = errors.get(row[code_col], 0) + 1
+                    
+                    elapsed = row[elapsed_col]
+                    if elapsed.isdigit():
+                        elapsed = int(elapsed)
+                        raw.record(elapsed)
+                        label_stats['histogram'].record(elapsed)
+                        if corrected is not None:
+                            synthetic_samples += corrected.record_corrected(elapsed, expected_interval)
+                    else:
+                        elapsed = 0
+                    
+                    timestamp = row[timestamp_col]
+                    if timestamp.isdigit():
+                        timestamp = int(timestamp)
+                        if start_time is None or timestamp < start_time:
+                            start_time = timestamp
+                        if end_time is None or timestamp > end_time:
+                            end_time = timestamp
+                        
+                        second = seconds.get(timestamp // 1000)
+                        if second is None:
+                            second = seconds[timestamp // 1000] = [0, 0, 0, 0, 0]
+                        second[0] += 1
+                        second[1] += not success
+                        second[2] += elapsed
+                        if elapsed > second[3]:
+                            second[3] = elapsed
+                        if len(row) > threads_col and row[threads_col].isdigit():
+                            second[4] = max(second[4], int(row[threads_col]))
             
-            total_requests = len(data_lines)
-            successful_requests = len([line for line in data_lines if line[3] == 'true'])
+            rows_done = time.perf_counter()
+            STAGES.record(test_id, 'parse_jtl.rows', rows_done - started)
             failed_requests = total_requests - successful_requests
             
-            # Calculate response times
-            response_times = [float(line[1]) for line in data_lines if line[1].isdigit()]
-            avg_response_time = sum(response_times) / len(response_times) if response_times else 0
-            
             # Calculate TPS (Transactions Per Second)
-            if data_lines:
-                start_time = float(data_lines[0][0])
-                end_time = float(data_lines[-1][0])
-                duration = (end_time - start_time) / 1000  # Convert to seconds
-                tps = total_requests / duration if duration > 0 else 0
-            else:
-                tps = 0
+            duration = (end_time - start_time) / 1000 if start_time is not None else 0  # Convert to seconds
+            tps = total_requests / duration if duration > 0 else 0
             
-            return {
+            raw_summary = raw.summary()
+            results = {
                 'totalRequests': total_requests,
                 'successfulRequests': successful_requests,
                 'failedRequests': failed_requests,
                 'successRate': (successful_requests / total_requests * 100) if total_requests > 0 else 0,
-                'avgResponseTime': avg_response_time,
+                'avgResponseTime': raw_summary['mean'],
+                'responseTimePercentiles': {k: raw_summary[k] for k in ('p50', 'p90', 'p95', 'p99', 'min', 'max')},
                 'peakRPS': tps,
-                'duration': duration if 'duration' in locals() else 0,
+                'duration': duration,
+                'labelBreakdown': self._label_breakdown(labels, duration),
+                'errorBreakdown': errors,  # Failed samples per response code
+                'timeSeries': self._time_series(seconds),
                 'testId': jtl_file.stem,
                 'timestamp': datetime.now().isoformat()
             }
             
+            if corrected is not None:
+                results['coordinatedOmission'] = {
+                    'expectedInterval': expected_interval,
+                    'syntheticSamples': synthetic_samples,
+                    'raw': raw_summary,
+                    'corrected': corrected.summary()
+                }
+            
+            aggregated = time.perf_counter()
+            STAGES.record(test_id, 'parse_jtl.aggregate', aggregated - rows_done)
+            self._save_histograms(jtl_file, raw, labels, total_requests, successful_requests)
+            finished = time.perf_counter()
+            STAGES.record(test_id, 'parse_jtl.save_histograms', finished - aggregated)
+            STAGES.record(test_id, 'parse_jtl', finished - started)
+            JTL_PARSE_SECONDS.observe(finished - started, ('success',))
+            JTL_ROWS_PARSED.inc(total_requests)
+            return results
+            
         except Exception as e:
+            STAGES.record(test_id, 'parse_jtl', time.perf_counter() - started)
+            JTL_PARSE_SECONDS.observe(time.perf_counter() - started, ('failure',))
             return {
                 'error': f"Failed to parse JTL results: {str(e)}",
                 'totalRequests': 0,
@@ -597,6 +644,82 @@ class JMeterRunner:
                 'peakRPS': 0
             }
     
+    def _save_histograms(self, jtl_file, raw, labels, total_requests, successful_requests):
+        """
+        Keep the run's latency histograms and error counts next to the JTL as
+        {test_id}.hist.json, so runs can be compared without re-parsing JTL text
+        """
+        histograms = {
+            'version': 1,
+            'testId': jtl_file.stem,
+            'timestamp': datetime.now().isoformat(),
+            'overall': {
+                'requests': total_requests,
+                'errors': total_requests - successful_requests,
+                'histogram': raw.to_dict()
+            },
+            'labels': {
+                label: {
+                    'requests': stats['requests'],
+                    'errors': stats['requests'] - stats['successful'],
+                    'histogram': stats['histogram'].to_dict()
+                }
+                for label, stats in labels.items()
+            }
+        }
+        try:
+            with open(jtl_file.with_suffix('.hist.json'), 'w') as f:
+                json.dump(histograms, f)
+        except OSError as e:
+            print(f"Failed to save histograms for {jtl_file.stem}: {e}")
+    
+    def load_histograms(self, test_id):
+        """Stored histograms of a finished run, or None (also for an id that is not a test id)"""
+        if not TEST_ID_PATTERN.match(test_id or ''):
+            return None
+        try:
+            with open(self.results_dir / f"{test_id}.hist.json", 'r') as f:
+                histograms = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(histograms, dict) or not isinstance(histograms.get('overall'), dict) \
+                or not isinstance(histograms.get('labels'), dict):
+            return None
+        return histograms
+    
+    def _time_series(self, seconds):
+        """Per-second buckets as a list ordered by offset from the first second"""
+        if not seconds:
+            return []
+        first = min(seconds)
+        return [
+            {
+                't': second - first,
+                'requests': bucket[0],
+                'errors': bucket[1],
+                'avgResponseTime': bucket[2] / bucket[0],
+                'maxResponseTime': bucket[3],
+                'threads': bucket[4]
+            }
+            for second, bucket in sorted(seconds.items())
+        ]
+    
+    def _label_breakdown(self, labels, duration):
+        """Per-sampler-label request counts, success rate and latency percentiles"""
+        breakdown = {}
+        for label, stats in labels.items():
+            summary = stats['histogram'].summary()
+            breakdown[label] = {
+                'totalRequests': stats['requests'],
+                'successfulRequests': stats['successful'],
+                'failedRequests': stats['requests'] - stats['successful'],
+                'successRate': stats['successful'] / stats['requests'] * 100,
+                'avgResponseTime': summary['mean'],
+                'responseTimePercentiles': {k: summary[k] for k in ('p50', 'p90', 'p95', 'p99', 'min', 'max')},
+                'rps': stats['requests'] / duration if duration > 0 else 0
+            }
+        return breakdown
+    
     def get_test_status(self, test_id):
         """Get current test status"""
         if test_id not in self.active_tests:
@@ -0,0 +1,241 @@
+"""
+JSON responses for large payloads. The encoder is pluggable (orjson when it is
+installed, otherwise the standard library), bodies above a size threshold are
+compressed with brotli or gzip as the client's Accept-Encoding allows, and the
+serialized and compressed bodies of immutable resources, such as finished
+runs, are cached and served with an ETag for conditional requests.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_ENCODERS = ('auto', 'orjson', 'stdlib')
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'text/')
+
+# Compression settings for dynamic responses: brotli 5 costs about as much CPU
+# as gzip 6 and gives equal or smaller bodies; both shrink JSON 5-20x
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's own encoder, with the bytes interface the body cache uses"""
+
+    name = 'stdlib'
+
+    def dumps_bytes(self, obj):
+        return self.dumps(obj).encode()
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Serializes with orjson. Output matches Flask's encoder: sorted keys,
+    indented in debug mode, datetimes and other types orjson does not handle
+    go through Flask's default hook, and numpy values are supported.
+    """
+
+    name = 'orjson'
+
+    def _options(self, pretty=False):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, pretty=False):
+        return orjson.dumps(obj, default=self.default, option=self._options(pretty))
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj, pretty=bool(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, pretty) + b'\n', mimetype=self.mimetype)
+
+
+def json_provider(app, encoder='auto'):
+    """JSON provider for JSON_ENCODER: 'orjson', 'stdlib' or 'auto' (orjson when installed)"""
+    if encoder not in JSON_ENCODERS:
+        raise ValueError(f"Unknown JSON_ENCODER: {encoder}. Expected one of {', '.join(JSON_ENCODERS)}")
+    if encoder == 'orjson' and orjson is None:
+        print("⚠️  JSON_ENCODER=orjson but orjson is not installed; using the standard library encoder")
+    if encoder != 'stdlib' and orjson is not None:
+        return OrjsonProvider(app)
+    return StdlibJSONProvider(app)
+
+
+def negotiate_encoding(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header; brotli wins when both are accepted"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class ResponseCompressor:
+    """after_request hook compressing bodies of at least min_size bytes"""
+
+    def __init__(self, min_size=1024):
+        self.min_size = min_size
+        self.lock = threading.Lock()
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __call__(self, response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        compressed = compress(data, encoding)
+        self._record(len(data), len(compressed))
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _record(self, size, compressed_size):
+        with self.lock:
+            self.compressed += 1
+            self.bytes_in += size
+            self.bytes_out += compressed_size
+
+    def stats(self):
+        with self.lock:
+            return {
+                'min_size': self.min_size,
+                'compressed_responses': self.compressed,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'brotli_available': brotli is not None
+            }
+
+
+class BodyCache:
+    """
+    LRU of the serialized bodies of immutable resources, up to max_bytes,
+    with each compressed variant kept once it has been asked for
+    """
+
+    def __init__(self, compressor, max_bytes=64 * 1024 * 1024):
+        self.compressor = compressor
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> {'etag', 'bodies': {encoding: bytes}}
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def response(self, key, build):
+        """
+        JSON response for key, serializing build() only on a miss; answers 304
+        when the client's If-None-Match has the body's ETag
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            body = current_app.json.dumps_bytes(build()) + b'\n'
+            entry = {'etag': hashlib.sha1(body).hexdigest()[:20], 'bodies': {None: body}}
+            with self.lock:
+                self.misses += 1
+                self._store(key, entry, len(body))
+
+        if entry['etag'] in request.if_none_match:
+            response = current_app.response_class(status=304)
+        else:
+            body = entry['bodies'][None]
+            encoding = None
+            if len(body) >= self.compressor.min_size:
+                encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+            if encoding:
+                compressed = entry['bodies'].get(encoding)
+                if compressed is None:
+                    compressed = compress(body, encoding)
+                    with self.lock:
+                        if key in self.entries:
+                            entry['bodies'][encoding] = compressed
+                            self.size += len(compressed)
+                body = compressed
+            response = current_app.response_class(body, mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(entry['etag'])
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _store(self, key, entry, size):
+        """Called with the lock held"""
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= sum(len(body) for body in previous['bodies'].values())
+        self.entries[key] = entry
+        self.size += size
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= sum(len(body) for body in evicted['bodies'].values())
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,116 @@
+"""
+Latency statistics for JTL results - a compact log-linear histogram in the
+spirit of HdrHistogram, with optional coordinated-omission correction.
+"""
+
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of integer millisecond latencies (~1% relative precision)"""
+
+    def __init__(self, precision_bits=7):
+        self.precision_bits = precision_bits
+        self.linear_limit = 1 << precision_bits
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _bucket(self, value):
+        """Lower bound of the bucket holding value"""
+        if value < self.linear_limit:
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return (value >> shift) << shift
+
+    def _bucket_upper(self, bucket):
+        """Highest value that maps into the bucket starting at bucket"""
+        if bucket < self.linear_limit:
+            return bucket
+        shift = bucket.bit_length() - self.precision_bits
+        return bucket + (1 << shift) - 1
+
+    def record(self, value, count=1):
+        """Record a latency (ms) count times"""
+        value = max(0, int(value))
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def record_corrected(self, value, expected_interval):
+        """
+        Record a latency and back-fill the samples a closed-model thread never
+        sent while it was stalled (HdrHistogram's recordValueWithExpectedInterval).
+        Returns the number of synthetic samples added.
+        """
+        self.record(value)
+        if not expected_interval or expected_interval <= 0:
+            return 0
+
+        added = 0
+        missing = value - expected_interval
+        while missing >= expected_interval:
+            self.record(missing)
+            missing -= expected_interval
+            added += 1
+        return added
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        """Count, mean, min, max and the requested percentiles in a single pass"""
+        result = {
+            'count': self.count,
+            'mean': self.mean(),
+            'min': self.min or 0,
+            'max': self.max
+        }
+        if not self.count:
+            result.update({f"p{p}": 0 for p in percentiles})
+            return result
+
+        targets = sorted(percentiles)
+        ranks = [max(1, -(-p * self.count // 100)) for p in targets]  # ceil(p% of count)
+        cumulative = 0
+        index = 0
+        for bucket in sorted(self.counts):
+            cumulative += self.counts[bucket]
+            while index < len(targets) and cumulative >= ranks[index]:
+                result[f"p{targets[index]}"] = min(self._bucket_upper(bucket), self.max)
+                index += 1
+            if index == len(targets):
+                break
+        return result
+
+    def to_dict(self):
+        """JSON-serializable form, restored with from_dict"""
+        return {
+            'precisionBits': self.precision_bits,
+            'counts': sorted(self.counts.items()),
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data.get('precisionBits', 7))
+        histogram.counts = {int(bucket): count for bucket, count in data['counts']}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+    def bucket_upper(self, bucket):
+        """Highest value in a bucket, the value reported for its samples"""
+        return self._bucket_upper(bucket)
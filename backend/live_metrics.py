@@ -0,0 +1,554 @@
+"""
+Online anomaly detection on a running test. The JTL file (or the native
+engine's per-worker part files) is tailed incrementally, samples are bucketed
+per second, and every closed second is fed to streaming detectors: EWMA spike
+and CUSUM shift detectors on p50/p95 latency and error rate, and a sudden
+throughput drop detector. Each detector does O(1) work per point. Consecutive
+anomalous seconds form one anomaly window, reported when it opens and closes.
+The same samples and points feed the test's Prometheus series (requests,
+errors, response time buckets, per-second rate, error rate, p95 and active users).
+"""
+
+import csv
+import math
+from collections import Counter
+from pathlib import Path
+
+from metrics import REGISTRY
+
+# Seconds a bucket stays open for late samples (workers flush every second or so)
+CLOSE_LAG_SECONDS = 3
+
+# Rows of a part file can complete a few ms out of order; the handoff from the
+# part files to the merged JTL file allows for this much (ms)
+HANDOFF_MARGIN_MS = 1000
+
+# Points needed before a detector's baseline is trusted
+WARMUP_POINTS = 10
+
+# Fewest samples in a second for its latency percentiles to be used
+MIN_LATENCY_SAMPLES = 5
+
+# EWMA spike detector: smoothing and how many standard deviations count as a spike
+EWMA_ALPHA = 0.2
+EWMA_THRESHOLD = 4.0
+
+# CUSUM shift detector: slack and decision interval, in standard deviations.
+# Each point adds at most CUSUM_MAX_STEP and the sum is capped at twice the
+# threshold, so a short spike (the EWMA detector's job) drains away in a few seconds
+CUSUM_SLACK = 1.0
+CUSUM_THRESHOLD = 5.0
+CUSUM_MAX_STEP = 3.0
+# The CUSUM baseline moves slowly, so a step change keeps standing out
+CUSUM_ALPHA = 0.05
+
+# Throughput drop: requests/s below this fraction of the EWMA baseline
+THROUGHPUT_DROP_LEVEL = 0.5
+
+# Noise floors for the standard deviation: a fraction of the baseline, and an
+# absolute floor per metric (ms for latency, a fraction for the error rate). The
+# error rate also gets the binomial sampling noise of the second's request count
+RELATIVE_SIGMA_FLOOR = 0.05
+SIGMA_FLOORS = {'p50': 5.0, 'p95': 10.0, 'errorRate': 0.01}
+
+# Fewest errors in a second for an error-rate anomaly window to open
+MIN_ANOMALY_ERRORS = 3
+
+# Per-test series, labeled by test_id; dropped some time after the test ends
+TEST_REQUESTS = REGISTRY.counter('ludo_test_requests', 'Samples recorded by a test', ('test_id',))
+TEST_ERRORS = REGISTRY.counter('ludo_test_errors', 'Failed samples recorded by a test', ('test_id',))
+TEST_RESPONSE_TIME = REGISTRY.histogram('ludo_test_response_time_seconds', 'Response times of a test\'s samples',
+                                        ('test_id',))
+TEST_RPS = REGISTRY.gauge('ludo_test_requests_per_second', 'Requests in the test\'s last closed second',
+                          ('test_id',))
+TEST_ERROR_RATE = REGISTRY.gauge('ludo_test_error_rate', 'Fraction of failed requests in the last closed second',
+                                 ('test_id',))
+TEST_P95 = REGISTRY.gauge('ludo_test_response_time_p95_seconds', 'p95 response time in the last closed second',
+                          ('test_id',))
+TEST_ACTIVE_USERS = REGISTRY.gauge('ludo_test_active_users', 'Active threads (virtual users) in the last closed second',
+                                   ('test_id',))
+TEST_OPEN_ANOMALIES = REGISTRY.gauge('ludo_test_open_anomalies', 'Anomaly windows open on a test', ('test_id',))
+TEST_METRICS = (TEST_REQUESTS, TEST_ERRORS, TEST_RESPONSE_TIME, TEST_RPS, TEST_ERROR_RATE, TEST_P95,
+                TEST_ACTIVE_USERS, TEST_OPEN_ANOMALIES)
+
+
+class JTLTail:
+    """
+    Incremental reader of a test's JTL file or, for the native engine, its part
+    files. Once the engine has merged the parts into the JTL file and removed
+    them, the rows written since the last read are taken from the merged file.
+    """
+
+    def __init__(self, jtl_file):
+        self.jtl_file = Path(jtl_file)
+        self.files = {}  # path -> {'offset', 'columns'}
+        self.parts_seen = False
+        self.part_done = {}  # part path -> latest completion time (ms) read, None before its first row
+        self.recent = Counter()  # samples read from parts completing after the handoff cutoff
+        self.merged = False
+
+    def read(self):
+        """New complete rows as (timestamp ms, elapsed ms, success, active threads) tuples"""
+        parts = sorted(self.jtl_file.parent.glob(f"{self.jtl_file.name}.part*"))
+        if parts:
+            self.parts_seen = True
+        elif self.parts_seen:
+            return self._read_merged()
+        paths = parts if self.parts_seen else [self.jtl_file]
+
+        samples = []
+        for path in paths:
+            try:
+                new = self._read_file(path)
+            except OSError:
+                continue  # Not created yet, or removed by the merge
+            samples.extend(new)
+            if self.parts_seen:
+                self._track(path, new)
+        return samples
+
+    def _read_file(self, path):
+        state = self.files.get(path)
+        if state is None:
+            state = self.files[path] = {'offset': 0, 'columns': None}
+
+        with open(path, 'rb') as f:
+            f.seek(state['offset'])
+            data = f.read()
+        end = data.rfind(b'\n')
+        if end < 0:
+            return []
+        state['offset'] += end + 1
+        lines = data[:end].decode('utf-8', errors='replace').splitlines()
+
+        samples = []
+        for row in csv.reader(lines):
+            if not row:
+                continue
+            if state['columns'] is None:
+                state['columns'] = _columns(row)
+                if state['columns'] is not None:
+                    continue
+                state['columns'] = DEFAULT_COLUMNS
+            sample = _sample(row, state['columns'])
+            if sample is not None:
+                samples.append(sample)
+        return samples
+
+    def _track(self, path, samples):
+        """Remember what was read from a part file, for the handoff to the merged file"""
+        done = self.part_done.get(path)
+        for sample in samples:
+            completed = sample[0] + sample[1]
+            if done is None or completed > done:
+                done = completed
+            self.recent[sample] += 1
+        self.part_done[path] = done
+
+        cutoff = self._cutoff()
+        if cutoff is not None:
+            for sample in [sample for sample in self.recent if sample[0] + sample[1] < cutoff]:
+                del self.recent[sample]
+
+    def _cutoff(self):
+        """Completion time before which every part's rows were read, or None"""
+        if not self.part_done or None in self.part_done.values():
+            return None
+        return min(self.part_done.values()) - HANDOFF_MARGIN_MS
+
+    def _read_merged(self):
+        """
+        Rows of the merged JTL file that were not read from the parts. It is
+        sorted by completion time, so reading starts near the cutoff.
+        """
+        if self.merged:
+            return []
+        try:
+            f = open(self.jtl_file, 'rb')
+        except OSError:
+            return []  # The merge failed or has not been written
+        self.merged = True
+        cutoff = self._cutoff()
+        samples = []
+        with f:
+            columns = _columns(next(csv.reader([f.readline().decode('utf-8', errors='replace')]), []))
+            columns = columns or DEFAULT_COLUMNS
+            if cutoff is not None:
+                f.seek(_seek_completion(f, f.tell(), cutoff - HANDOFF_MARGIN_MS, columns))
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                row = next(csv.reader([line.decode('utf-8', errors='replace')]), None)
+                sample = _sample(row, columns) if row else None
+                if sample is None or (cutoff is not None and sample[0] + sample[1] < cutoff):
+                    continue
+                if self.recent[sample]:
+                    self.recent[sample] -= 1
+                    continue
+                samples.append(sample)
+        self.recent.clear()
+        return samples
+
+
+# JMeter's default CSV layout: timeStamp, elapsed, success, allThreads
+DEFAULT_COLUMNS = (0, 1, 7, 12)
+
+
+def _columns(row):
+    """Column positions from a header row; None when the row is not a header"""
+    if not row or row[0].isdigit():
+        return None
+    names = {name: i for i, name in enumerate(row)}
+    return (names.get('timeStamp', 0), names.get('elapsed', 1), names.get('success', 7),
+            names.get('allThreads', 12))
+
+
+def _sample(row, columns):
+    timestamp_col, elapsed_col, success_col, threads_col = columns
+    if len(row) <= max(timestamp_col, elapsed_col, success_col) or not row[timestamp_col].isdigit():
+        return None
+    elapsed = row[elapsed_col]
+    threads = row[threads_col] if len(row) > threads_col else ''
+    return (int(row[timestamp_col]), int(elapsed) if elapsed.isdigit() else 0,
+            row[success_col] == 'true', int(threads) if threads.isdigit() else 0)
+
+
+def _seek_completion(f, start, cutoff, columns):
+    """
+    Offset of the first row at or after start completing at cutoff or later, by
+    binary search over a file sorted by completion time. Rows that do not parse
+    count as late, so the search errs towards reading more.
+    """
+    f.seek(0, 2)
+    low, high = start, f.tell()
+    while low < high:
+        middle = (low + high) // 2
+        offset = _line_start(f, middle, start)
+        line = f.readline()
+        row = next(csv.reader([line.decode('utf-8', errors='replace')]), None) if line.endswith(b'\n') else None
+        sample = _sample(row, columns) if row else None
+        if sample is not None and sample[0] + sample[1] < cutoff:
+            low = middle + 1
+        else:
+            high = middle
+    return _line_start(f, low, start)
+
+
+def _line_start(f, offset, start):
+    """First line start at or after offset, leaving the file there"""
+    if offset <= start:
+        f.seek(start)
+    else:
+        f.seek(offset - 1)
+        f.readline()
+    return f.tell()
+
+
+def _percentile(ordered, p):
+    return ordered[max(1, -(-p * len(ordered) // 100)) - 1]
+
+
+class SecondBuckets:
+    """
+    Per-second aggregation of samples; a second is emitted once it is
+    CLOSE_LAG_SECONDS old and a later second has samples
+    """
+
+    def __init__(self, lag=CLOSE_LAG_SECONDS):
+        self.lag = lag
+        self.buckets = {}  # epoch second -> [requests, errors, elapsed list, most active threads]
+        self.first = None
+        self.last = None
+        self.next_second = None
+        self.late = 0
+
+    def add(self, samples):
+        for timestamp, elapsed, success, threads in samples:
+            second = timestamp // 1000
+            if self.next_second is not None and second < self.next_second:
+                self.late += 1  # Its second was already emitted
+                continue
+            bucket = self.buckets.get(second)
+            if bucket is None:
+                bucket = self.buckets[second] = [0, 0, [], 0]
+            bucket[0] += 1
+            bucket[1] += not success
+            bucket[2].append(elapsed)
+            if threads > bucket[3]:
+                bucket[3] = threads
+            if self.first is None or second < self.first:
+                self.first = second
+            if self.last is None or second > self.last:
+                self.last = second
+
+    def close(self, now):
+        """
+        Points for every second up to now - lag, in order, including empty seconds
+        between samples. Nothing is emitted past the newest second with samples,
+        which is held back as the test may end within it; drain() emits the rest.
+        """
+        if self.first is None:
+            return []
+        return self._points(min(now - self.lag, self.last - 1))
+
+    def drain(self):
+        """Points for every second still buffered, up to the newest with samples"""
+        if self.first is None:
+            return []
+        return self._points(self.last)
+
+    def _points(self, until):
+        if self.next_second is None:
+            self.next_second = self.first
+
+        points = []
+        while self.next_second <= until:
+            requests, errors, elapsed, threads = self.buckets.pop(self.next_second, (0, 0, [], 0))
+            point = {
+                't': self.next_second - self.first,
+                'requests': requests,
+                'errors': errors,
+                'errorRate': errors / requests if requests else None,
+                'p50': None,
+                'p95': None,
+                'activeThreads': threads
+            }
+            if len(elapsed) >= MIN_LATENCY_SAMPLES:
+                elapsed.sort()
+                point['p50'] = _percentile(elapsed, 50)
+                point['p95'] = _percentile(elapsed, 95)
+            points.append(point)
+            self.next_second += 1
+        return points
+
+
+class _Baseline:
+    """EWMA mean and variance of a metric"""
+
+    def __init__(self, metric, alpha=EWMA_ALPHA):
+        self.alpha = alpha
+        self.floor = SIGMA_FLOORS.get(metric, 0.0)
+        self.binomial = metric == 'errorRate'
+        self.mean = None
+        self.variance = 0.0
+        self.points = 0
+
+    def ready(self):
+        return self.points >= WARMUP_POINTS
+
+    def sigma(self, samples=None):
+        sigma = max(math.sqrt(self.variance), abs(self.mean) * RELATIVE_SIGMA_FLOOR, self.floor)
+        if self.binomial and samples:
+            rate = min(max(self.mean, 1.0 / samples), 1.0)
+            sigma = max(sigma, math.sqrt(rate * (1 - rate) / samples))
+        return sigma
+
+    def update(self, x):
+        self.points += 1
+        if self.mean is None:
+            self.mean = x
+            return
+        # Plain averages during warmup, so the first few points do not dominate
+        alpha = max(self.alpha, 1.0 / self.points)
+        diff = x - self.mean
+        self.mean += alpha * diff
+        self.variance = (1 - alpha) * (self.variance + alpha * diff * diff)
+
+
+class EWMADetector:
+    """Spikes: a point more than EWMA_THRESHOLD standard deviations above the EWMA baseline"""
+
+    name = 'ewma'
+
+    def __init__(self, metric, threshold=EWMA_THRESHOLD):
+        self.baseline = _Baseline(metric)
+        self.threshold = threshold
+
+    def update(self, x, samples=None):
+        """Returns (anomalous, baseline mean); anomalous points are kept out of the baseline"""
+        baseline = self.baseline
+        if baseline.ready():
+            if (x - baseline.mean) / baseline.sigma(samples) > self.threshold:
+                return True, baseline.mean
+        baseline.update(x)
+        return False, baseline.mean
+
+
+class CUSUMDetector:
+    """
+    Sustained upward shifts: one-sided CUSUM of standardized deviations from an
+    EWMA baseline, which is frozen while the sum is above the threshold
+    """
+
+    name = 'cusum'
+
+    def __init__(self, metric, slack=CUSUM_SLACK, threshold=CUSUM_THRESHOLD):
+        self.baseline = _Baseline(metric, CUSUM_ALPHA)
+        self.slack = slack
+        self.threshold = threshold
+        self.sum = 0.0
+
+    def update(self, x, samples=None):
+        baseline = self.baseline
+        if not baseline.ready():
+            baseline.update(x)
+            return False, baseline.mean
+
+        z = min((x - baseline.mean) / baseline.sigma(samples), CUSUM_MAX_STEP)
+        self.sum = min(max(0.0, self.sum + z - self.slack), 2 * self.threshold)
+        alarm = self.sum > self.threshold
+        if not alarm:
+            baseline.update(x)
+        return alarm, baseline.mean
+
+
+class ThroughputDropDetector:
+    """Sudden drops: requests/s below THROUGHPUT_DROP_LEVEL of its EWMA baseline"""
+
+    name = 'drop'
+
+    def __init__(self, metric, level=THROUGHPUT_DROP_LEVEL):
+        self.baseline = _Baseline(metric)
+        self.level = level
+
+    def update(self, x, samples=None):
+        baseline = self.baseline
+        if baseline.ready() and x < baseline.mean * self.level:
+            return True, baseline.mean
+        baseline.update(x)
+        return False, baseline.mean
+
+
+# (metric, point field, detector classes)
+DETECTORS = (
+    ('p95', 'p95', (EWMADetector, CUSUMDetector)),
+    ('p50', 'p50', (CUSUMDetector,)),
+    ('errorRate', 'errorRate', (EWMADetector, CUSUMDetector)),
+    ('throughput', 'requests', (ThroughputDropDetector,))
+)
+
+
+class LiveAnomalyMonitor:
+    """
+    Tails one test's results, exports its series and runs the detectors over
+    its per-second points (unless detect is False). on_event(event) is called
+    when an anomaly window opens and when it closes.
+    """
+
+    def __init__(self, test_id, jtl_file, on_event=None, lag=CLOSE_LAG_SECONDS, detect=True):
+        self.test_id = test_id
+        self.labels = (test_id,)
+        self.tail = JTLTail(jtl_file)
+        self.buckets = SecondBuckets(lag)
+        self.on_event = on_event
+        self.detectors = [
+            (metric, field, detector_class(metric))
+            for metric, field, detector_classes in DETECTORS
+            for detector_class in detector_classes
+        ] if detect else []
+        self.open = {}  # (metric, detector) -> window
+        self.anomalies = []
+        self.points = 0
+
+    def poll(self, now):
+        """Read new samples and process every second closed by now (epoch seconds)"""
+        self._read()
+        for point in self.buckets.close(now):
+            self.process(point)
+        TEST_OPEN_ANOMALIES.set(len(self.open), self.labels)
+
+    def _read(self):
+        samples = self.tail.read()
+        if samples:
+            TEST_REQUESTS.inc(len(samples), self.labels)
+            TEST_ERRORS.inc(sum(not success for _, _, success, _ in samples), self.labels)
+            TEST_RESPONSE_TIME.observe_many([elapsed / 1000 for _, elapsed, _, _ in samples], self.labels)
+        self.buckets.add(samples)
+
+    def process(self, point, last=False):
+        """Export one second and run the detectors over it; last marks the test's final second"""
+        self.points += 1
+        self._export(point)
+        for metric, field, detector in self.detectors:
+            value = point[field]
+            if value is None:
+                continue
+            if last and metric == 'throughput':
+                continue  # The final second is cut short by the end of the test
+            anomalous, baseline = detector.update(value, point['requests'])
+            key = (metric, detector.name)
+            window = self.open.get(key)
+            if anomalous:
+                if window is None:
+                    if metric == 'errorRate' and point['errors'] < MIN_ANOMALY_ERRORS:
+                        continue
+                    window = self.open[key] = self._window(metric, detector.name, point['t'], baseline)
+                    self._emit(window)
+                self._extend(window, point['t'], value)
+            elif window is not None:
+                self._close(key)
+
+    def _export(self, point):
+        TEST_RPS.set(point['requests'], self.labels)
+        TEST_ERROR_RATE.set(point['errorRate'] or 0, self.labels)
+        if point['p95'] is not None:
+            TEST_P95.set(point['p95'] / 1000, self.labels)
+        if point['requests']:
+            TEST_ACTIVE_USERS.set(point['activeThreads'], self.labels)
+
+    def drop_metrics(self):
+        """Remove the test's series; call once nothing polls this monitor anymore"""
+        for metric in TEST_METRICS:
+            metric.remove(self.labels)
+
+    def finish(self):
+        """
+        Process the samples and seconds still buffered, then close any open
+        windows; returns every anomaly seen. Call once the test has ended.
+        """
+        self._read()
+        points = self.buckets.drain()
+        for i, point in enumerate(points):
+            self.process(point, last=i == len(points) - 1)
+        for key in list(self.open):
+            self._close(key)
+        TEST_OPEN_ANOMALIES.set(0, self.labels)
+        return self.anomalies
+
+    def _window(self, metric, detector, t, baseline):
+        return {
+            'testId': self.test_id,
+            'metric': metric,
+            'detector': detector,
+            'direction': 'down' if detector == 'drop' else 'up',
+            'state': 'open',
+            'windowStart': t,
+            'windowEnd': t,
+            'baseline': round(baseline, 4),
+            'peak': None,
+            'magnitude': None
+        }
+
+    def _extend(self, window, t, value):
+        window['windowEnd'] = t
+        if window['peak'] is None or (value < window['peak'] if window['direction'] == 'down' else value > window['peak']):
+            window['peak'] = round(value, 4)
+            # Error rates change by percentage points; everything else relative to the baseline
+            baseline = window['baseline']
+            if window['metric'] == 'errorRate' or not baseline:
+                window['magnitude'] = round(value - baseline, 4)
+            else:
+                window['magnitude'] = round((value - baseline) / baseline, 4)
+
+    def _close(self, key):
+        window = self.open.pop(key)
+        window['state'] = 'closed'
+        self.anomalies.append(window)
+        self._emit(window)
+
+    def _emit(self, window):
+        if self.on_event:
+            try:
+                self.on_event(dict(window))
+            except Exception as e:
+                print(f"Anomaly event handler failed for {self.test_id}: {e}")
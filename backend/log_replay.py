@@ -0,0 +1,116 @@
+"""
+Access-log replay support: streams a Common/Combined Log Format file and
+yields requests with their offset from the first logged request, so the
+native engine can reproduce production traffic timing.
+"""
+
+import re
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# host ident authuser [date] "METHOD path PROTOCOL" status bytes ["referer" "user-agent"]
+LOG_PATTERN = re.compile(
+    r'\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)(?: [^"]*)?" \d{3} \S+'
+)
+LOG_TIME_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+DEFAULT_METHODS = ('GET', 'HEAD')
+
+# Path segments that name a resource rather than a route: numbers, UUIDs, hex digests and long tokens with digits
+ID_SEGMENT = re.compile(
+    r'^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'
+    r'|[0-9a-fA-F]{16,}|(?=[^/]*\d)[A-Za-z0-9_.~-]{20,})$'
+)
+
+# Distinct labels a replay worker reports; later new routes are counted under OTHER_LABEL
+MAX_REPLAY_LABELS = 200
+OTHER_LABEL = 'other'
+
+
+def normalize_methods(methods):
+    """Upper-cased request methods to replay, from a list of strings"""
+    if methods is None:
+        return list(DEFAULT_METHODS)
+    if not isinstance(methods, list) or not methods or not all(isinstance(m, str) and m for m in methods):
+        raise ValueError("methods must be a non-empty list of HTTP methods")
+    return [m.upper() for m in methods]
+
+
+def replay_label(path):
+    """Sampler label for a replayed path: no query string, and id-like segments folded to {id}"""
+    path = path.split('?', 1)[0]
+    return '/'.join('{id}' if ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+
+class ReplayLabels:
+    """Labels for replayed paths, at most max_labels distinct ones"""
+
+    def __init__(self, max_labels=MAX_REPLAY_LABELS):
+        self.max_labels = max_labels
+        self.seen = set()
+
+    def label(self, path):
+        label = replay_label(path)
+        if label not in self.seen:
+            if len(self.seen) >= self.max_labels:
+                return OTHER_LABEL
+            self.seen.add(label)
+        return label
+
+
+def resolve_log_file(log_file, log_dir):
+    """Resolve a requested log path inside log_dir, refusing anything outside it"""
+    if not isinstance(log_file, str) or not log_file:
+        raise ValueError("accessLog must be a file name")
+    base = Path(log_dir).resolve()
+    path = (base / log_file).resolve()
+    if base != path and base not in path.parents:
+        raise ValueError(f"Access log must be inside {base}")
+    if not path.is_file():
+        raise ValueError(f"Access log not found: {log_file}")
+    return str(path)
+
+
+def iter_log_entries(log_file, shard=0, shards=1, methods=DEFAULT_METHODS):
+    """
+    Yield (offset_seconds, method, path) for every shard-th request line.
+
+    The file is read line by line, so memory use does not grow with the log.
+    Offsets are relative to the first parseable line of the whole file, so
+    every shard shares the same time origin. Only lines belonging to this
+    shard are fully parsed.
+    """
+    methods = set(methods or DEFAULT_METHODS)
+    origin = None
+    last_time_text = None
+    last_time = None
+
+    with open(log_file, 'r', encoding='utf-8', errors='replace') as f:
+        for line_no, line in enumerate(f):
+            mine = line_no % shards == shard
+            if origin is not None and not mine:
+                continue
+
+            match = LOG_PATTERN.match(line)
+            if not match:
+                continue
+
+            # Consecutive lines usually share a timestamp, so skip re-parsing it
+            time_text = match.group('time')
+            if time_text != last_time_text:
+                last_time_text = time_text
+                last_time = datetime.strptime(time_text, LOG_TIME_FORMAT).timestamp()
+            if origin is None:
+                origin = last_time
+
+            if not mine or match.group('method') not in methods:
+                continue
+
+            path = match.group('path')
+            if not path.startswith('/'):
+                # Proxy-style absolute URL in the request line
+                parts = urlsplit(path)
+                path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+            yield last_time - origin, match.group('method'), path
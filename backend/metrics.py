@@ -0,0 +1,252 @@
+"""
+Prometheus metrics, served at /metrics in the Prometheus text format or, when
+the scraper asks for it, OpenMetrics. Counters and histograms are updated on
+hot paths (every request, every live sample), so each thread accumulates into
+its own shard without taking a lock and a scrape sums the shards. Gauges hold
+the latest value set, or are computed by a function at scrape time.
+"""
+
+import math
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# Histogram buckets, in seconds: request latencies and LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+class _Shards:
+    """
+    Per-thread {label values: value} dicts. A thread only writes its own
+    shard, so updates need no lock; a thread that ends leaves its shard to
+    the next thread given the same ident, which keeps adding to it.
+    """
+
+    def __init__(self):
+        self.shards = {}  # thread ident -> {labels: value}
+        self.lock = threading.Lock()
+
+    def local(self):
+        ident = threading.get_ident()
+        shard = self.shards.get(ident)
+        if shard is None:
+            with self.lock:
+                shard = self.shards.setdefault(ident, {})
+        return shard
+
+    def copies(self):
+        with self.lock:
+            shards = list(self.shards.values())
+        return [shard.copy() for shard in shards]
+
+    def remove(self, labels):
+        """Only for series no thread updates anymore, such as a finished test's"""
+        with self.lock:
+            for shard in self.shards.values():
+                shard.pop(labels, None)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def _labels(self, values, extra=()):
+        pairs = list(zip(self.label_names, values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self, openmetrics=False):
+        family = self.name
+        if self.kind == 'counter' and not openmetrics:
+            family = self.name + '_total'
+        lines = [f"# HELP {family} {_escape(self.documentation, quote=False)}", f"# TYPE {family} {self.kind}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic total; inc() is lock-free"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self.shards = _Shards()
+
+    def inc(self, amount=1, labels=()):
+        shard = self.shards.local()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def remove(self, labels):
+        self.shards.remove(labels)
+
+    def values(self):
+        totals = {}
+        for shard in self.shards.copies():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def samples(self):
+        return [f"{self.name}_total{self._labels(labels)} {_number(value)}"
+                for labels, value in sorted(self.values().items())]
+
+
+class Histogram(_Metric):
+    """Cumulative buckets, sum and count; observe() is lock-free"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.shards = _Shards()
+
+    def _series(self, labels):
+        shard = self.shards.local()
+        series = shard.get(labels)
+        if series is None:
+            # Count per bucket (the last one is +Inf), then the sum
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        return series
+
+    def observe(self, value, labels=()):
+        series = self._series(labels)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def observe_many(self, values, labels=()):
+        series = self._series(labels)
+        buckets = self.buckets
+        for value in values:
+            series[bisect_left(buckets, value)] += 1
+            series[-1] += value
+
+    def remove(self, labels):
+        self.shards.remove(labels)
+
+    def values(self):
+        totals = {}
+        for shard in self.shards.copies():
+            for labels, series in shard.items():
+                series = list(series)
+                total = totals.get(labels)
+                totals[labels] = series if total is None else [a + b for a, b in zip(total, series)]
+        return totals
+
+    def samples(self):
+        lines = []
+        bounds = [_number(float(bound)) for bound in self.buckets] + ['+Inf']
+        for labels, series in sorted(self.values().items()):
+            # The count is the buckets' total, so it always agrees with +Inf
+            cumulative = 0
+            for bound, count in zip(bounds, series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    Latest value per label set. With function, the values are computed at
+    scrape time: function() returns a number, or {label values: number}.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), function=None):
+        super().__init__(name, documentation, labels)
+        self.function = function
+        self.current = {}
+
+    def set(self, value, labels=()):
+        self.current[labels] = value
+
+    def remove(self, labels):
+        self.current.pop(labels, None)
+
+    def values(self):
+        if self.function is None:
+            return dict(self.current)
+        values = self.function()
+        return values if isinstance(values, dict) else {(): values}
+
+    def samples(self):
+        return [f"{self.name}{self._labels(labels)} {_number(value)}"
+                for labels, value in sorted(self.values().items()) if value is not None]
+
+
+class Registry:
+    """The metrics /metrics exports, in registration order"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                # Modules re-imported (benchmarks, reloads) share the original
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name, documentation, labels=(), function=None):
+        return self._register(Gauge(name, documentation, labels, function))
+
+    def render(self, openmetrics=False):
+        """Exposition text of every metric; a gauge function that fails is skipped"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render(openmetrics))
+            except Exception as e:
+                print(f"Could not collect metric {metric.name}: {e}")
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+def wants_openmetrics(accept):
+    """Whether an Accept header asks for OpenMetrics rather than the Prometheus text format"""
+    return 'application/openmetrics-text' in (accept or '')
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _escape(value, quote=True):
+    value = str(value).replace('\\', '\\\\').replace('\n', '\\n')
+    return value.replace('"', '\\"') if quote else value
+
+
+# Shared by the backend modules; app.py serves it at /metrics
+REGISTRY = Registry()
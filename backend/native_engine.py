@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Native asyncio HTTP load engine - a JVM-free alternative to JMeter for simple
+HTTP tests. Virtual users are spread across worker processes, each running an
+asyncio event loop with a pooled keep-alive connector, and every sample is
+written in JMeter's CSV JTL layout so the existing parsers keep working.
+
+Besides the closed-model thread group it can replay an access log (open
+model), see log_replay.py.
+"""
+
+import asyncio
+import bisect
+import csv
+import heapq
+import itertools
+import json
+import mmap
+import os
+import random
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from scenarios import normalize_scenario, render_body
+
+# Default JMeter CSV columns, in JMeter's own order
+JTL_FIELDS = [
+    'timeStamp', 'elapsed', 'label', 'responseCode', 'responseMessage',
+    'threadName', 'dataType', 'success', 'failureMessage', 'bytes',
+    'sentBytes', 'grpThreads', 'allThreads', 'URL', 'Latency', 'IdleTime', 'Connect'
+]
+
+# Lean recording keeps only what parse_jtl_results and the live metrics read
+LEAN_JTL_FIELDS = ['timeStamp', 'elapsed', 'label', 'responseCode', 'success', 'grpThreads', 'allThreads']
+
+WRITE_BUFFER_SIZE = 64 * 1024
+LEAN_WRITE_BUFFER_SIZE = 1024 * 1024
+# Workers flush this often so the live metrics see samples while the test runs.
+# Below a buffer's worth of samples per interval this flush is what writes them,
+# in either mode; the lean buffer only saves writes at higher sample rates.
+FLUSH_INTERVAL = 1.0
+
+# One slot per worker in the shared active users file: its running virtual users
+ACTIVE_SLOT = struct.Struct('<q')
+
+
+def load_profile(test_config):
+    """Return the effective thread group settings for a test, mirroring the JMX templates"""
+    test_type = test_config.get('type', 'Load Test')
+    users = int(test_config.get('users', 1))
+    duration = int(test_config.get('duration', 60))
+    ramp_up = int(test_config.get('ramp_up', 0))
+    think_time = int(test_config.get('think_time', 0))
+
+    if test_type == "Stress Test":
+        users, ramp_up, think_time = users * 2, ramp_up * 2, think_time // 2
+    elif test_type == "Spike Test":
+        ramp_up, think_time = 5, 100
+    elif test_type == "Soak Test":
+        duration = duration * 2
+
+    if test_config.get('replay'):
+        # Arrivals come from the log: users caps requests in flight, no ramp or think time
+        ramp_up, think_time = 0, 0
+
+    return {
+        'users': users,
+        'duration': duration,
+        'ramp_up': ramp_up,
+        'think_time': think_time
+    }
+
+
+class NativeLoadProcess:
+    """Popen-like handle over the native engine's worker processes"""
+
+    def __init__(self, test_config, jtl_file, workers=None):
+        self.test_config = test_config
+        self.jtl_file = Path(jtl_file)
+        self.profile = load_profile(test_config)
+        if workers is None:
+            workers = int(os.getenv('NATIVE_ENGINE_WORKERS', os.cpu_count() or 1))
+        self.workers = max(1, min(workers, self.profile['users']))
+        self.part_files = [
+            self.jtl_file.with_name(f"{self.jtl_file.name}.part{i}") for i in range(self.workers)
+        ]
+        # Workers add up each other's slots for the test-wide allThreads column
+        self.active_file = self.jtl_file.with_name(f"{self.jtl_file.name}.active")
+        self.processes = []
+        self.drains = []
+        self.returncode = None
+
+    def start(self):
+        """Launch one worker process per slice of virtual users"""
+        start_at = time.time() + 0.5  # Common origin so all workers ramp up together
+        users = self.profile['users']
+        self.active_file.write_bytes(bytes(ACTIVE_SLOT.size * self.workers))
+
+        for index, part_file in enumerate(self.part_files):
+            spec = {
+                'worker': index,
+                'workers': self.workers,
+                'user_ids': list(range(index, users, self.workers)),
+                'config': self.test_config,
+                'profile': self.profile,
+                'part_file': str(part_file),
+                'active_file': str(self.active_file),
+                'start_at': start_at,
+                'replay': self.test_config.get('replay')
+            }
+            process = subprocess.Popen(
+                [sys.executable, str(Path(__file__).resolve()), '--worker'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                # Windows can only deliver CTRL_BREAK_EVENT to a process group of its own
+                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0
+            )
+            process.stdin.write(json.dumps(spec))
+            process.stdin.close()
+            self.processes.append(process)
+            # Read both pipes from the start: a worker blocked on a full pipe would stall the test
+            self.drains.append((_Drain(process.stdout), _Drain(process.stderr)))
+
+        return self
+
+    def poll(self):
+        """Return the return code once every worker has exited, else None"""
+        codes = [p.poll() for p in self.processes]
+        if any(code is None for code in codes):
+            return None
+        return max(codes, key=abs) if codes else 0
+
+    def communicate(self):
+        """Wait for all workers, merge their partial results into the JTL file"""
+        stdout_parts = []
+        stderr_parts = []
+        for process, (out, err) in zip(self.processes, self.drains):
+            process.wait()
+            stdout_parts.append(out.result())
+            stderr_parts.append(err.result())
+
+        samples, skipped = self._merge_part_files()
+        self.returncode = self.poll()
+        stdout_parts.append(f"Native engine finished: {samples} samples from {self.workers} workers written to {self.jtl_file}\n")
+        if skipped:
+            stdout_parts.append(f"Skipped {skipped} malformed rows left by interrupted workers\n")
+        return ''.join(stdout_parts), ''.join(stderr_parts)
+
+    def terminate(self):
+        """Ask all workers to stop; they flush what they have recorded before exiting"""
+        # SIGTERM is TerminateProcess on Windows, which kills without a flush
+        stop = signal.CTRL_BREAK_EVENT if os.name == 'nt' else signal.SIGTERM
+        for process in self.processes:
+            if process.poll() is None:
+                process.send_signal(stop)
+
+    def _merge_part_files(self):
+        """Merge per-worker JTL parts, ordered by sample completion time"""
+        readers = []
+        handles = []
+        header = LEAN_JTL_FIELDS if self.test_config.get('recording') == 'lean' else JTL_FIELDS
+        for part_file in self.part_files:
+            if not part_file.exists():
+                continue
+            handle = open(part_file, 'r', newline='')
+            handles.append(handle)
+            reader = csv.reader(handle)
+            next(reader, None)  # Skip header
+            readers.append(reader)
+
+        count = 0
+        skipped = [0]
+        try:
+            with open(self.jtl_file, 'w', newline='', buffering=WRITE_BUFFER_SIZE) as out:
+                writer = csv.writer(out)
+                writer.writerow(header)
+                rows = [_completed_rows(reader, len(header), skipped) for reader in readers]
+                for _, row in heapq.merge(*rows, key=lambda item: item[0]):
+                    writer.writerow(row)
+                    count += 1
+        finally:
+            for handle in handles:
+                handle.close()
+
+        for part_file in self.part_files + [self.active_file]:
+            if part_file.exists():
+                part_file.unlink()
+
+        return count, skipped[0]
+
+
+class _Drain:
+    """Reads a pipe to the end on a thread of its own"""
+
+    def __init__(self, pipe):
+        self.pipe = pipe
+        self.text = ''
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        try:
+            self.text = self.pipe.read()
+        finally:
+            self.pipe.close()
+
+    def result(self):
+        self.thread.join()
+        return self.text
+
+
+class _ActiveUsers:
+    """
+    Active virtual users across workers: each worker writes its own count to its
+    slot of a file every worker maps, and reads all slots for the total
+    """
+
+    def __init__(self, path, slot, slots):
+        self.own = 0
+        self.offset = slot * ACTIVE_SLOT.size
+        self.slots = struct.Struct(f'<{slots}q')
+        self.file = open(path, 'r+b') if path else None
+        # Without a shared file (a worker started on its own) only this worker's users count
+        self.map = mmap.mmap(self.file.fileno(), self.slots.size) if self.file else bytearray(self.slots.size)
+
+    def add(self, delta):
+        self.own += delta
+        ACTIVE_SLOT.pack_into(self.map, self.offset, self.own)
+
+    def total(self):
+        return sum(self.slots.unpack_from(self.map))
+
+    def close(self):
+        if self.file:
+            self.map.close()
+            self.file.close()
+
+
+def _completed_rows(reader, width, skipped):
+    """(completion time, row) of a part file's rows; a worker stopped mid-write can leave a truncated last row"""
+    for row in reader:
+        try:
+            if len(row) != width:
+                raise ValueError(f"{len(row)} fields")
+            completed = int(row[0]) + int(row[1])
+        except ValueError:
+            skipped[0] += 1
+            continue
+        yield completed, row
+
+
+class _Worker:
+    """One worker process: an event loop driving a slice of the virtual users"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.config = spec['config']
+        self.profile = spec['profile']
+        self.url = self.config['url']
+        self.scenario = self.config.get('scenario') or normalize_scenario(None, self.url)
+        self.cumulative_weights = list(itertools.accumulate(r['weight'] for r in self.scenario))
+        target = urlsplit(self.url)
+        self.base_url = f"{target.scheme}://{target.netloc}"
+        self.lean = self.config.get('recording') == 'lean'
+        self.stopping = False
+        self.active = _ActiveUsers(spec.get('active_file'), spec['worker'], spec['workers'])
+        self.samples = 0
+
+    async def run(self):
+        import aiohttp
+
+        profile = self.profile
+        self.deadline = self.spec['start_at'] + profile['ramp_up'] + profile['duration']
+
+        connector = aiohttp.TCPConnector(
+            limit=max(1, len(self.spec['user_ids'])),
+            keepalive_timeout=30,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(total=float(self.config.get('timeout', 30)))
+
+        buffer_size = LEAN_WRITE_BUFFER_SIZE if self.lean else WRITE_BUFFER_SIZE
+        with open(self.spec['part_file'], 'w', newline='', buffering=buffer_size) as out:
+            self.out = out
+            self.writer = csv.writer(out)
+            self.writer.writerow(LEAN_JTL_FIELDS if self.lean else JTL_FIELDS)
+            flusher = asyncio.ensure_future(self._flush_periodically())
+
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                await self._drive(session)
+
+            flusher.cancel()
+        self.active.close()
+
+        print(f"worker {self.spec['worker']}: {self.samples} samples")
+
+    async def _drive(self, session):
+        """Closed model: each virtual user loops request, think time, request..."""
+        await asyncio.gather(*[
+            self._virtual_user(session, user_id) for user_id in self.spec['user_ids']
+        ])
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            self.out.flush()
+
+    async def _virtual_user(self, session, user_id):
+        profile = self.profile
+        users = max(1, profile['users'])
+        ramp_delay = profile['ramp_up'] * user_id / users
+        await self._sleep_until(self.spec['start_at'] + ramp_delay)
+
+        thread_name = f"Native Thread Group 1-{user_id + 1}"
+        think_time = profile['think_time'] / 1000.0
+        self.active.add(1)
+        try:
+            while not self.stopping and time.time() < self.deadline:
+                request = self._pick_request()
+                await self._sample(
+                    session, thread_name, request['method'], self.base_url + request['path'], request['label'],
+                    headers=request['headers'], body=render_body(request['body'], user_id + 1)
+                )
+                if think_time:
+                    await self._sleep_until(min(time.time() + think_time, self.deadline))
+        finally:
+            self.active.add(-1)
+
+    def _pick_request(self):
+        """Weighted choice of the next scenario request"""
+        if len(self.scenario) == 1:
+            return self.scenario[0]
+        point = random.random() * self.cumulative_weights[-1]
+        index = bisect.bisect_right(self.cumulative_weights, point)
+        return self.scenario[min(index, len(self.scenario) - 1)]
+
+    async def _sleep_until(self, wake_at):
+        while not self.stopping:
+            remaining = wake_at - time.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, 0.5))
+
+    async def _sample(self, session, thread_name, method, url, label, headers=None, body=None):
+        sent_bytes = len(body.encode()) if body else 0
+        started = time.time()
+        t0 = time.perf_counter()
+        latency = 0
+        received = b''
+        try:
+            async with session.request(method, url, headers=headers, data=body, allow_redirects=True) as response:
+                latency = int((time.perf_counter() - t0) * 1000)
+                received = await response.read()
+                code = str(response.status)
+                message = response.reason or ''
+                success = response.status < 400
+        except Exception as e:
+            code = f"Non HTTP response code: {type(e).__name__}"
+            message = f"Non HTTP response message: {e}"
+            success = False
+        elapsed = int((time.perf_counter() - t0) * 1000)
+        # grpThreads is this worker's share of the users, allThreads the whole test's
+        group_threads, all_threads = self.active.own, self.active.total()
+
+        if self.lean:
+            self.writer.writerow([
+                int(started * 1000), elapsed, label, code, 'true' if success else 'false',
+                group_threads, all_threads
+            ])
+        else:
+            self.writer.writerow([
+                int(started * 1000), elapsed, label, code, message, thread_name, 'text',
+                'true' if success else 'false', '' if success else message, len(received), sent_bytes,
+                group_threads, all_threads, url, latency or elapsed, 0, 0
+            ])
+        self.samples += 1
+
+
+class _ReplayWorker(_Worker):
+    """Open model: fires this worker's share of an access log at its original relative timing"""
+
+    async def _drive(self, session):
+        from log_replay import ReplayLabels, iter_log_entries
+
+        replay = self.spec['replay']
+        speedup = float(replay.get('speedup') or 1.0)
+        in_flight = asyncio.Semaphore(max(1, len(self.spec['user_ids'])))
+        pending = set()
+        labels = ReplayLabels()
+
+        entries = iter_log_entries(
+            replay['log_file'],
+            shard=self.spec['worker'],
+            shards=self.spec['workers'],
+            methods=replay.get('methods')
+        )
+        for offset, method, path in entries:
+            if self.stopping or time.time() >= self.deadline:
+                break
+            await self._sleep_until(self.spec['start_at'] + offset / speedup)
+            await in_flight.acquire()
+
+            task = asyncio.ensure_future(self._replay_one(session, method, self.base_url + path, labels.label(path)))
+            task.add_done_callback(lambda t: in_flight.release())
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def _replay_one(self, session, method, url, label):
+        self.active.add(1)
+        try:
+            await self._sample(session, f"Replay {self.spec['worker'] + 1}", method, url, label)
+        finally:
+            self.active.add(-1)
+
+
+def _worker_main():
+    spec = json.loads(sys.stdin.read())
+    worker = _ReplayWorker(spec) if spec.get('replay') else _Worker(spec)
+
+    def request_stop(signum, frame):
+        worker.stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    if hasattr(signal, 'SIGBREAK'):
+        # What terminate() sends on Windows
+        signal.signal(signal.SIGBREAK, request_stop)
+    asyncio.run(worker.run())
+
+
+if __name__ == '__main__':
+    if '--worker' in sys.argv:
+        _worker_main()
+    else:
+        print("native_engine.py is started by JMeterRunner; use engine='native' in the test config")
+        sys.exit(1)
@@ -0,0 +1,202 @@
+"""
+Profiling hooks for the results pipeline. Stages of a test (JMX generation,
+process launch, the run, JTL parsing, analysis, event emission and status
+serialization) are timed as spans: kept per test, so a test's status can carry
+its timing breakdown in debug mode, and exported as a histogram at /metrics.
+SamplingProfiler records where every thread spends its time over a window,
+on demand, and writes the stacks in the folded format flame graph tools read.
+"""
+
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from metrics import REGISTRY
+from serving import green
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'ludo_stage_duration_seconds', 'Duration of results pipeline stages', ('stage',),
+    (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+)
+
+# Functions listed in a profile's summary
+PROFILE_TOP_FUNCTIONS = 25
+
+
+class StageTimings:
+    """Per-test stage durations (count, total, max, last), for the max_tests most recent tests"""
+
+    def __init__(self, max_tests=1000):
+        self.max_tests = max_tests
+        self.tests = OrderedDict()  # test_id -> {'version', 'stages': {stage: stats}}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, test_id, stage):
+        """Time the block as one run of stage, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(test_id, stage, time.perf_counter() - started)
+
+    def record(self, test_id, stage, seconds):
+        STAGE_SECONDS.observe(seconds, (stage,))
+        ms = seconds * 1000
+        with self.lock:
+            test = self.tests.get(test_id)
+            if test is None:
+                test = self.tests[test_id] = {'version': 0, 'stages': {}}
+                while len(self.tests) > self.max_tests:
+                    self.tests.popitem(last=False)
+            stats = test['stages'].get(stage)
+            if stats is None:
+                stats = test['stages'][stage] = {'count': 0, 'totalMs': 0.0, 'maxMs': 0.0, 'lastMs': 0.0}
+            stats['count'] += 1
+            stats['totalMs'] += ms
+            stats['maxMs'] = max(stats['maxMs'], ms)
+            stats['lastMs'] = ms
+            test['version'] += 1
+
+    def timings(self, test_id):
+        """{stage: {count, totalMs, maxMs, lastMs}} in the order the stages first ran, or None"""
+        with self.lock:
+            test = self.tests.get(test_id)
+            if test is None:
+                return None
+            return {stage: {name: round(value, 3) for name, value in stats.items()}
+                    for stage, stats in test['stages'].items()}
+
+    def version(self, test_id):
+        """Changes whenever a stage of the test is recorded"""
+        with self.lock:
+            test = self.tests.get(test_id)
+            return test['version'] if test else 0
+
+
+def _native(module, name):
+    """The unpatched function under gevent: the sampler must run on a real thread"""
+    if green():
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    return getattr(importlib.import_module(module), name)
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of every thread each interval for a window of time,
+    from a native thread (under gevent it sees whichever greenlet is running).
+    One profile runs at a time; each writes {id}.folded and an {id}.json
+    summary of the functions seen most to output_dir.
+    """
+
+    def __init__(self, output_dir, max_duration=300):
+        self.output_dir = Path(output_dir)
+        self.max_duration = max_duration
+        self.running = None
+        self.last = None
+        self.lock = threading.Lock()
+
+    def start(self, duration, interval=0.01):
+        """Start a profile; raises ValueError for a bad window and RuntimeError when one is running"""
+        if not 0 < duration <= self.max_duration:
+            raise ValueError(f"duration must be between 0 and {self.max_duration} seconds")
+        if not 0.001 <= interval <= 1:
+            raise ValueError("interval must be between 1 and 1000 ms")
+        with self.lock:
+            if self.running is not None:
+                raise RuntimeError(f"Profile {self.running['id']} is already running")
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            profile_id = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}"
+            profile = {
+                'id': profile_id,
+                'startedAt': datetime.now().isoformat(),
+                'durationSeconds': duration,
+                'intervalMs': round(interval * 1000, 3),
+                'folded': str(self.output_dir / f"{profile_id}.folded"),
+                'summary': str(self.output_dir / f"{profile_id}.json")
+            }
+            self.running = profile
+        _native('_thread', 'start_new_thread')(self._run, (profile, duration, interval))
+        return dict(profile)
+
+    def _run(self, profile, duration, interval):
+        sleep = _native('time', 'sleep')
+        own_ident = _native('_thread', 'get_ident')()
+        # Green threads' idents are not the native ones sys._current_frames uses
+        named = not green()
+        stacks = {}
+        samples = 0
+        try:
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()} if named else {}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_ident:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_name(frame.f_code))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, f"thread-{ident}"))
+                    key = ';'.join(reversed(stack))
+                    stacks[key] = stacks.get(key, 0) + 1
+                samples += 1
+                sleep(interval)
+            self._write(profile, stacks, samples)
+            self.last = dict(profile, samples=samples)
+        except Exception as e:
+            print(f"Profile {profile['id']} failed: {e}")
+            self.last = dict(profile, error=str(e))
+        finally:
+            self.running = None
+
+    def _write(self, profile, stacks, samples):
+        with open(profile['folded'], 'w') as f:
+            for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+        # Self time is the innermost frame; total time counts a function once per stack it is on
+        own, total = {}, {}
+        stack_samples = sum(stacks.values())
+        for stack, count in stacks.items():
+            frames = stack.split(';')[1:]
+            if not frames:
+                continue
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            for name in set(frames):
+                total[name] = total.get(name, 0) + count
+
+        def top(counts):
+            return [{'function': name, 'samples': count,
+                     'percent': round(count / stack_samples * 100, 2) if stack_samples else 0}
+                    for name, count in sorted(counts.items(), key=lambda item: -item[1])[:PROFILE_TOP_FUNCTIONS]]
+
+        summary = dict(profile, samples=samples, stackSamples=stack_samples,
+                       topSelf=top(own), topTotal=top(total))
+        with open(profile['summary'], 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    def status(self):
+        """The running profile, the last finished one and the profiles on disk (newest first)"""
+        profiles = sorted(self.output_dir.glob('profile_*.json'), reverse=True) if self.output_dir.exists() else []
+        return {
+            'running': dict(self.running) if self.running else None,
+            'last': self.last,
+            'profiles': [path.stem for path in profiles]
+        }
+
+
+# Shared by the backend modules: the runner records its stages, app.py reads them
+STAGES = StageTimings()
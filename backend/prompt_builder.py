@@ -0,0 +1,343 @@
+"""
+Shared prompt builder for AI analyses. Instead of pasting the raw results
+payload into the prompt, results are reduced to a compact feature summary
+(key metrics, percentiles, top error classes and labels, trend deltas and
+downsampled series) that is shrunk step by step until it fits a token budget.
+"""
+
+import json
+
+# Bump whenever the prompt text or the summary format changes; it is part of
+# the analysis cache key
+PROMPT_VERSION = 5
+
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Progressively smaller summaries tried until one fits the budget
+SUMMARY_LEVELS = [
+    {'series_points': 60, 'labels': 10, 'errors': 8},
+    {'series_points': 30, 'labels': 5, 'errors': 5},
+    {'series_points': 12, 'labels': 3, 'errors': 3},
+    {'series_points': 0, 'labels': 0, 'errors': 3}
+]
+
+# Evidence lists added by the analyzer (statistical engine, agent memory)
+EVIDENCE_KEYS = ('statisticalFindings', 'similarRuns')
+
+KEY_METRICS = (
+    'totalRequests', 'successfulRequests', 'failedRequests', 'successRate',
+    'avgResponseTime', 'peakRPS', 'duration'
+)
+
+ANALYSIS_INSTRUCTIONS = """You are an intelligent Performance Testing AI Agent. Analyze the following JMeter test results summary and act as a performance engineer would.
+
+JMETER TEST RESULTS SUMMARY (compact JSON; "trends" compare the first and last quarter of each series, "series" are downsampled):
+{summary}
+
+"statisticalFindings" were detected locally from every sample (latency changepoints, error bursts, throughput saturation, tail spread, and anomaly windows flagged live while the test ran); treat them as evidence and confirm, refine or refute them. "similarRuns" are the most similar previously analyzed runs with their verdicts; use them to spot recurring problems.
+
+As an AI Agent, you need to:
+1. Identify the MAIN PROBLEM (if any)
+2. Determine the ROOT CAUSE
+3. Provide SPECIFIC RECOMMENDATIONS
+4. Decide if a RETRY TEST is needed
+
+Consider these factors:
+- Response times and their distribution
+- Success/failure rates
+- Throughput and RPS patterns
+- Error patterns and types
+- Resource utilization indicators
+- Performance degradation patterns
+
+Respond ONLY with valid JSON in this exact format:
+{{
+    "problem": "Clear description of the main issue or 'No significant problems detected'",
+    "root_cause": "Technical root cause analysis",
+    "recommendations": ["Specific recommendation 1", "Specific recommendation 2"],
+    "retry_test": true/false,
+    "confidence": 0.85,
+    "severity": "high/medium/low"
+}}"""
+
+
+# Fields of the single-run reply format and their expected types
+VERDICT_FIELDS = {
+    'problem': str,
+    'root_cause': str,
+    'recommendations': list,
+    'retry_test': bool,
+    'confidence': (int, float),
+    'severity': str
+}
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English and JSON)"""
+    return (len(text) + 3) // 4
+
+
+def _round(value):
+    return round(value, 2) if isinstance(value, float) else value
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0
+
+
+def downsample(series, points):
+    """Average consecutive buckets so the series has at most `points` entries"""
+    if points <= 0:
+        return []
+    if len(series) <= points:
+        return [_round_entry(entry) for entry in series]
+
+    bucket_size = len(series) / points
+    sampled = []
+    for i in range(points):
+        bucket = series[int(i * bucket_size):int((i + 1) * bucket_size)] or [series[-1]]
+        if all(_is_number(v) for v in bucket):
+            sampled.append(_round(_mean(bucket)))
+        elif all(isinstance(v, dict) for v in bucket):
+            entry = dict(bucket[0])
+            for key, value in bucket[0].items():
+                if _is_number(value):
+                    entry[key] = _mean([b[key] for b in bucket if _is_number(b.get(key))])
+            sampled.append(_round_entry(entry))
+        else:
+            sampled.append(bucket[0])
+    return sampled
+
+
+def _round_entry(entry):
+    if isinstance(entry, dict):
+        return {k: _round(v) for k, v in entry.items()}
+    return _round(entry)
+
+
+def trend_deltas(series):
+    """First-quarter vs last-quarter means of every numeric field of a series"""
+    if len(series) < 4:
+        return {}
+    quarter = max(1, len(series) // 4)
+    head, tail = series[:quarter], series[-quarter:]
+
+    if all(_is_number(v) for v in series):
+        fields = {'value': ([v for v in head], [v for v in tail])}
+    elif all(isinstance(v, dict) for v in series):
+        fields = {}
+        for key, value in series[0].items():
+            if _is_number(value) and key != 't':  # 't' is the time axis
+                fields[key] = (
+                    [e[key] for e in head if _is_number(e.get(key))],
+                    [e[key] for e in tail if _is_number(e.get(key))]
+                )
+    else:
+        return {}
+
+    deltas = {}
+    for key, (start_values, end_values) in fields.items():
+        start, end = _mean(start_values), _mean(end_values)
+        deltas[key] = {
+            'start': _round(float(start)),
+            'end': _round(float(end)),
+            'change_pct': _round((end - start) / start * 100) if start else None
+        }
+    return deltas
+
+
+def summarize_results(results, series_points=60, labels=10, errors=8):
+    """Compact feature summary of a results payload"""
+    if not isinstance(results, dict):
+        return {'results': results}
+
+    summary = {k: _round(results[k]) for k in KEY_METRICS if k in results}
+
+    if isinstance(results.get('responseTimePercentiles'), dict):
+        summary['percentiles'] = {k: _round(v) for k, v in results['responseTimePercentiles'].items()}
+
+    co = results.get('coordinatedOmission')
+    if isinstance(co, dict) and isinstance(co.get('corrected'), dict):
+        summary['coCorrectedPercentiles'] = {k: _round(v) for k, v in co['corrected'].items() if k.startswith('p')}
+
+    error_breakdown = results.get('errorBreakdown')
+    if isinstance(error_breakdown, dict) and errors:
+        top = sorted(error_breakdown.items(), key=lambda item: item[1], reverse=True)[:errors]
+        summary['topErrors'] = dict(top)
+
+    # Findings of the local statistical engine and similar past runs are the most
+    # informative part; always kept
+    for key in EVIDENCE_KEYS:
+        if results.get(key):
+            summary[key] = results[key]
+
+    label_breakdown = results.get('labelBreakdown')
+    if isinstance(label_breakdown, dict) and labels:
+        top = sorted(label_breakdown.items(), key=lambda item: item[1].get('totalRequests', 0), reverse=True)[:labels]
+        summary['topLabels'] = {
+            label: {
+                'requests': stats.get('totalRequests'),
+                'successRate': _round(stats.get('successRate')),
+                'p95': stats.get('responseTimePercentiles', {}).get('p95')
+            }
+            for label, stats in top
+        }
+
+    # Everything else: keep scalars, reduce lists to trends plus a downsampled series
+    trends = {}
+    series = {}
+    handled = set(KEY_METRICS) | {
+        'responseTimePercentiles', 'coordinatedOmission', 'errorBreakdown', 'labelBreakdown',
+        'liveAnomalies'  # Reported through statisticalFindings
+    } | set(EVIDENCE_KEYS)
+    for key, value in results.items():
+        if key in handled:
+            continue
+        if isinstance(value, list):
+            if value:
+                trends[key] = trend_deltas(value)
+                if series_points:
+                    series[key] = downsample(value, series_points)
+        elif isinstance(value, dict):
+            scalars = {k: _round(v) for k, v in list(value.items())[:20] if _is_number(v) or isinstance(v, (str, bool))}
+            if scalars:
+                summary[key] = scalars
+        elif isinstance(value, str):
+            summary[key] = value[:200]
+        elif _is_number(value) or isinstance(value, bool) or value is None:
+            summary[key] = _round(value)
+
+    trends = {k: v for k, v in trends.items() if v}
+    if trends:
+        summary['trends'] = trends
+    if series:
+        summary['series'] = series
+    return summary
+
+
+def build_analysis_prompt(results, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Build the analysis prompt from the most detailed summary level that fits
+    token_budget (the smallest level is used if none does). Returns
+    (prompt, stats) where stats reports the estimated prompt size against the
+    budget.
+    """
+    for level in SUMMARY_LEVELS:
+        summary = summarize_results(results, level['series_points'], level['labels'], level['errors'])
+        prompt = ANALYSIS_INSTRUCTIONS.format(summary=json.dumps(summary, separators=(',', ':'), default=str))
+        tokens = estimate_tokens(prompt)
+        if tokens <= token_budget:
+            break
+
+    return prompt, {
+        'estimated_tokens': tokens,
+        'token_budget': token_budget,
+        'within_budget': tokens <= token_budget,
+        'series_points': level['series_points'],
+        'prompt_version': PROMPT_VERSION
+    }
+
+
+# Runs in a batch prompt are summarized without series to fit more of them
+BATCH_SUMMARY_LEVEL = {'series_points': 0, 'labels': 3, 'errors': 3}
+
+BATCH_INSTRUCTIONS = """You are an intelligent Performance Testing AI Agent. Analyze each of the following JMeter test runs independently and act as a performance engineer would.
+
+JMETER TEST RUNS (compact JSON summaries keyed by run number; "trends" compare the first and last quarter of each series; "statisticalFindings" were detected locally from every sample):
+{runs}
+
+For EACH run, identify the MAIN PROBLEM (if any), its ROOT CAUSE, SPECIFIC RECOMMENDATIONS and whether a RETRY TEST is needed.
+
+Respond ONLY with valid JSON in this exact format, with one entry for every run number:
+{{
+    "runs": {{
+        "0": {{
+            "problem": "Clear description of the main issue or 'No significant problems detected'",
+            "root_cause": "Technical root cause analysis",
+            "recommendations": ["Specific recommendation 1", "Specific recommendation 2"],
+            "retry_test": true/false,
+            "confidence": 0.85,
+            "severity": "high/medium/low"
+        }}
+    }}
+}}"""
+
+
+def build_batch_prompt(runs, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Pack as many runs as fit token_budget, in order, into one prompt (the first
+    run is always packed). Returns (prompt, packed) where packed is how many of
+    runs the prompt covers; they are numbered 0..packed-1.
+    """
+    parts = []
+    size = len(BATCH_INSTRUCTIONS.format(runs='{}'))
+    max_chars = token_budget * 4  # Inverse of estimate_tokens
+    for i, results in enumerate(runs):
+        part = f'"{i}":' + json.dumps(
+            summarize_results(results, **BATCH_SUMMARY_LEVEL), separators=(',', ':'), default=str
+        )
+        if parts and size + len(part) + 1 > max_chars:
+            break
+        parts.append(part)
+        size += len(part) + 1
+
+    return BATCH_INSTRUCTIONS.format(runs='{' + ','.join(parts) + '}'), len(parts)
+
+
+def strip_code_fence(text):
+    """Model replies often wrap JSON in a markdown code fence"""
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        text = text.rsplit('```', 1)[0]
+    return text.strip()
+
+
+def parse_batch_response(response_text, packed):
+    """
+    Per-run verdicts from a batch reply as {run_number: verdict}. Runs that are
+    missing, or whose verdict lacks a field or has one of the wrong type (see
+    parse_verdict), are left out; a reply that is not JSON raises ValueError.
+    """
+    data = json.loads(strip_code_fence(response_text))
+    runs = data.get('runs') if isinstance(data, dict) else data
+    if isinstance(runs, list):
+        runs = {str(i): verdict for i, verdict in enumerate(runs)}
+    if not isinstance(runs, dict):
+        raise ValueError("Batch reply has no 'runs' object")
+
+    verdicts = {}
+    for i in range(packed):
+        verdict = runs.get(str(i))
+        if isinstance(verdict, dict) and not verdict_problems(verdict):
+            verdicts[i] = verdict
+    return verdicts
+
+
+def parse_verdict(response_text):
+    """
+    Parse a single-run reply. Returns (verdict, problems) where problems lists
+    missing or mistyped fields; verdict is None if the reply is not a JSON object.
+    """
+    try:
+        verdict = json.loads(strip_code_fence(response_text))
+    except ValueError:
+        return None, ['Reply is not valid JSON']
+    if not isinstance(verdict, dict):
+        return None, ['Reply is not a JSON object']
+    return verdict, verdict_problems(verdict)
+
+
+def verdict_problems(verdict):
+    """Missing or mistyped VERDICT_FIELDS of a verdict object"""
+    problems = []
+    for field, expected in VERDICT_FIELDS.items():
+        if field not in verdict:
+            problems.append(f"Missing field '{field}'")
+        elif not isinstance(verdict[field], expected):
+            problems.append(f"Field '{field}' has the wrong type")
+    return problems
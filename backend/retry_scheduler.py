@@ -0,0 +1,171 @@
+"""
+In-process scheduling of agent-recommended retry tests. Retries reuse the
+original test config and are started after an exponential backoff. Each chain
+of retries (a root test and its descendants) has a retry budget, retry
+decisions for a test collapse into the retry of it that is pending or running,
+and parent/child lineage is kept for status and history. A retry that is
+cancelled or fails to start is dropped from the lineage and the budget.
+"""
+
+import threading
+from datetime import datetime
+
+
+class RetryScheduler:
+    """Budgeted, deduplicated, delayed retries with lineage tracking"""
+
+    def __init__(self, start_test, max_retries=2, backoff=30, backoff_factor=2, is_running=None):
+        """
+        start_test(test_config) launches a test and returns {'success': ..., 'error': ...};
+        is_running(test_id) tells whether a started retry is still running (without it,
+        a started retry is treated as running for good)
+        """
+        self.start_test = start_test
+        self.is_running = is_running
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.lock = threading.Lock()
+        self.lineage = {}  # test_id -> {'parent', 'root', 'attempt', 'children'}
+        self.pending = {}  # retry test_id -> threading.Timer
+        self.starting = set()  # retry test_ids whose start_test call has not returned
+        self.retries = {}  # root test_id -> retries scheduled or started
+        self.metrics = {
+            'scheduled': 0,
+            'started': 0,
+            'failed_to_start': 0,
+            'over_budget': 0,
+            'deduplicated': 0
+        }
+
+    def request_retry(self, test_config, reason=None):
+        """
+        Schedule a retry of the test described by test_config. Returns the
+        decision: {'triggered': bool, ...} with the retry's test id, attempt
+        and delay, or the reason nothing was scheduled.
+        """
+        parent_id = test_config['id']
+        with self.lock:
+            parent = self._node(parent_id)
+
+            # Another analysis of this run already asked for its retry, which has not finished
+            active = [child for child in parent['children']
+                      if child in self.pending or child in self.starting or self._running(child)]
+            if active:
+                self.metrics['deduplicated'] += 1
+                return {
+                    'triggered': False,
+                    'deduplicated': True,
+                    'new_test_id': active[-1],
+                    'reason': 'A retry of this test is already scheduled or running'
+                }
+
+            root = parent['root']
+            if self.retries.get(root, 0) >= self.max_retries:
+                self.metrics['over_budget'] += 1
+                return {
+                    'triggered': False,
+                    'reason': f"Retry budget exhausted ({self.max_retries} retries of {root})"
+                }
+
+            attempt = parent['attempt'] + 1
+            number = 1
+            while f"{root}_retry{number}" in self.lineage:
+                number += 1
+            retry_id = f"{root}_retry{number}"
+            delay = self.backoff * self.backoff_factor ** (attempt - 1)
+            self.lineage[retry_id] = {'parent': parent_id, 'root': root, 'attempt': attempt, 'children': []}
+            parent['children'].append(retry_id)
+            self.retries[root] = self.retries.get(root, 0) + 1
+
+            retry_config = dict(
+                test_config,
+                id=retry_id,
+                parent_test_id=parent_id,
+                root_test_id=parent['root'],
+                retry_attempt=attempt,
+                retry_reason=reason
+            )
+            timer = threading.Timer(delay, self._start, args=(retry_config,))
+            timer.daemon = True
+            self.pending[retry_id] = timer
+            self.metrics['scheduled'] += 1
+
+        timer.start()
+        return {
+            'triggered': True,
+            'new_test_id': retry_id,
+            'parent_test_id': parent_id,
+            'attempt': attempt,
+            'max_retries': self.max_retries,
+            'starts_in_seconds': delay,
+            'scheduled_at': datetime.now().isoformat(),
+            'message': 'Auto-retry test scheduled based on AI agent recommendation'
+        }
+
+    def cancel(self, test_id):
+        """Cancel a retry that has not started yet"""
+        with self.lock:
+            timer = self.pending.pop(test_id, None)
+            if timer:
+                self._forget(test_id)
+        if timer:
+            timer.cancel()
+        return timer is not None
+
+    def lineage_of(self, test_id):
+        """Parent, root, attempt and children of a test (a fresh root when unknown)"""
+        with self.lock:
+            node = self.lineage.get(test_id)
+            if node is None:
+                return {'parent': None, 'root': test_id, 'attempt': 0, 'children': [], 'pending': False}
+            return dict(node, children=list(node['children']), pending=test_id in self.pending)
+
+    def stats(self):
+        with self.lock:
+            return dict(
+                self.metrics,
+                pending=len(self.pending),
+                max_retries=self.max_retries,
+                backoff_seconds=self.backoff,
+                backoff_factor=self.backoff_factor
+            )
+
+    def _node(self, test_id):
+        """Lineage entry of test_id, created as a root; called with the lock held"""
+        node = self.lineage.get(test_id)
+        if node is None:
+            node = self.lineage[test_id] = {'parent': None, 'root': test_id, 'attempt': 0, 'children': []}
+        return node
+
+    def _running(self, test_id):
+        return self.is_running is None or self.is_running(test_id)
+
+    def _forget(self, test_id):
+        """Drop a retry that never ran from its parent, the lineage and the budget; called with the lock held"""
+        node = self.lineage.pop(test_id)
+        parent = self.lineage.get(node['parent'])
+        if parent and test_id in parent['children']:
+            parent['children'].remove(test_id)
+        self.retries[node['root']] -= 1
+
+    def _start(self, retry_config):
+        with self.lock:
+            if self.pending.pop(retry_config['id'], None) is None:
+                return  # Cancelled
+            self.starting.add(retry_config['id'])
+
+        try:
+            result = self.start_test(retry_config)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        with self.lock:
+            self.starting.discard(retry_config['id'])
+            if result.get('success'):
+                self.metrics['started'] += 1
+            else:
+                self.metrics['failed_to_start'] += 1
+                self._forget(retry_config['id'])
+        if not result.get('success'):
+            print(f"Retry test {retry_config['id']} failed to start: {result.get('error')}")
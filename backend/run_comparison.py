@@ -0,0 +1,221 @@
+"""
+Statistical comparison of a run against a baseline from their stored latency
+histograms (see JMeterRunner._save_histograms). It runs Mann-Whitney U and
+Kolmogorov-Smirnov tests on the full latency distributions, computes bootstrap
+confidence intervals for percentile and mean differences, and tests the
+difference in error rates. All of this runs on the bucket grid, so the cost
+depends on the number of buckets, not the number of samples.
+"""
+
+import math
+
+from latency_stats import LatencyHistogram
+from startup import lazy_import
+
+np = lazy_import('numpy')
+
+BOOTSTRAP_SAMPLES = 1000
+BOOTSTRAP_SEED = 7
+COMPARED_PERCENTILES = (50, 95, 99)
+
+
+def _grid(baseline, candidate):
+    """Shared bucket grid as (values, baseline counts, candidate counts)"""
+    buckets = sorted(set(baseline.counts) | set(candidate.counts))
+    values = np.array([baseline.bucket_upper(b) for b in buckets], dtype=float)
+    base_counts = np.array([baseline.counts.get(b, 0) for b in buckets], dtype=float)
+    cand_counts = np.array([candidate.counts.get(b, 0) for b in buckets], dtype=float)
+    return values, base_counts, cand_counts
+
+
+def _normal_p_value(z):
+    """Two-sided p-value of a standard normal statistic"""
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def mann_whitney(base_counts, cand_counts):
+    """
+    Mann-Whitney U on bucketed samples (values in one bucket are ties), with the
+    tie-corrected normal approximation. Returns U for the candidate, the
+    probability that a candidate sample is slower than a baseline one (ties
+    count half) and the rank-biserial correlation as effect sizes.
+    """
+    n1, n2 = base_counts.sum(), cand_counts.sum()
+    below = np.concatenate(([0.0], np.cumsum(base_counts)[:-1]))
+    u = float((cand_counts * (below + 0.5 * base_counts)).sum())
+
+    n = n1 + n2
+    ties = base_counts + cand_counts
+    tie_term = float((ties ** 3 - ties).sum()) / (n * (n - 1)) if n > 1 else 0
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term)
+    z = (u - n1 * n2 / 2) / math.sqrt(variance) if variance > 0 else 0.0
+
+    superiority = u / (n1 * n2)
+    return {
+        'u': u,
+        'z': round(z, 4),
+        'pValue': _normal_p_value(z),
+        'probabilitySlower': round(superiority, 4),
+        'rankBiserial': round(2 * superiority - 1, 4)
+    }
+
+
+def kolmogorov_smirnov(base_counts, cand_counts):
+    """Two-sample KS statistic D with its asymptotic p-value"""
+    n1, n2 = base_counts.sum(), cand_counts.sum()
+    d = float(np.abs(np.cumsum(base_counts) / n1 - np.cumsum(cand_counts) / n2).max())
+
+    en = math.sqrt(n1 * n2 / (n1 + n2))
+    lam = (en + 0.12 + 0.11 / en) * d
+    if lam < 0.2:
+        p_value = 1.0
+    else:
+        k = np.arange(1, 101)
+        p_value = float(2 * (((-1.0) ** (k - 1)) * np.exp(-2 * k * k * lam * lam)).sum())
+    return {'d': round(d, 4), 'pValue': min(max(p_value, 0.0), 1.0)}
+
+
+def _bootstrap_stats(values, counts, replicates):
+    """Percentiles and mean of every multinomial resample of one histogram"""
+    n = int(counts.sum())
+    cumulative = np.cumsum(replicates, axis=1)
+    stats = {}
+    for p in COMPARED_PERCENTILES:
+        rank = max(1, -(-p * n // 100))  # ceil(p% of n), as LatencyHistogram.summary
+        stats[f'p{p}'] = values[np.argmax(cumulative >= rank, axis=1)]
+    stats['mean'] = replicates @ values / n
+    return stats
+
+
+def bootstrap_differences(values, base_counts, cand_counts, samples=BOOTSTRAP_SAMPLES, seed=BOOTSTRAP_SEED):
+    """95% bootstrap intervals of candidate minus baseline for percentiles and the mean"""
+    rng = np.random.default_rng(seed)
+    base_n, cand_n = int(base_counts.sum()), int(cand_counts.sum())
+    base = _bootstrap_stats(values, base_counts, rng.multinomial(base_n, base_counts / base_n, size=samples))
+    cand = _bootstrap_stats(values, cand_counts, rng.multinomial(cand_n, cand_counts / cand_n, size=samples))
+
+    differences = {}
+    for key in base:
+        diff = cand[key] - base[key]
+        low, high = np.percentile(diff, [2.5, 97.5])
+        differences[key] = {'ciLow': round(float(low), 2), 'ciHigh': round(float(high), 2)}
+    return differences
+
+
+def error_rate_difference(base_requests, base_errors, cand_requests, cand_errors):
+    """Two-proportion z-test and 95% interval for the change in error rate"""
+    if not base_requests or not cand_requests:
+        return None
+    p1, p2 = base_errors / base_requests, cand_errors / cand_requests
+    pooled = (base_errors + cand_errors) / (base_requests + cand_requests)
+    se_pooled = math.sqrt(pooled * (1 - pooled) * (1 / base_requests + 1 / cand_requests))
+    z = (p2 - p1) / se_pooled if se_pooled > 0 else 0.0
+    se = math.sqrt(p1 * (1 - p1) / base_requests + p2 * (1 - p2) / cand_requests)
+    return {
+        'baseline': round(p1 * 100, 3),
+        'candidate': round(p2 * 100, 3),
+        'difference': round((p2 - p1) * 100, 3),
+        'ciLow': round((p2 - p1 - 1.96 * se) * 100, 3),
+        'ciHigh': round((p2 - p1 + 1.96 * se) * 100, 3),
+        'pValue': _normal_p_value(z)
+    }
+
+
+def compare_distributions(baseline, candidate, alpha=0.05, min_change=0.05):
+    """
+    Compare one pair of {requests, errors, histogram} entries. A latency
+    regression requires a significant Mann-Whitney test, a p95 interval
+    entirely above zero, and a p95 increase of at least min_change (relative).
+    An error regression requires a significant rise in error rate.
+    """
+    base_hist = LatencyHistogram.from_dict(baseline['histogram'])
+    cand_hist = LatencyHistogram.from_dict(candidate['histogram'])
+    errors = error_rate_difference(baseline['requests'], baseline['errors'], candidate['requests'], candidate['errors'])
+    if not base_hist.count or not cand_hist.count:
+        return {'verdict': 'insufficient_data', 'errorRate': errors}
+
+    values, base_counts, cand_counts = _grid(base_hist, cand_hist)
+    base_summary, cand_summary = base_hist.summary(COMPARED_PERCENTILES), cand_hist.summary(COMPARED_PERCENTILES)
+    intervals = bootstrap_differences(values, base_counts, cand_counts)
+
+    latency = {}
+    for key in [f'p{p}' for p in COMPARED_PERCENTILES] + ['mean']:
+        before, after = base_summary[key], cand_summary[key]
+        latency[key] = dict(
+            intervals[key],
+            baseline=round(before, 2),
+            candidate=round(after, 2),
+            difference=round(after - before, 2),
+            relativeChange=round((after - before) / before, 4) if before else None
+        )
+
+    mw = mann_whitney(base_counts, cand_counts)
+    ks = kolmogorov_smirnov(base_counts, cand_counts)
+    p95 = latency['p95']
+    relative = p95['relativeChange'] or 0
+
+    if mw['pValue'] < alpha and p95['ciLow'] > 0 and relative >= min_change:
+        latency_verdict = 'regression'
+    elif mw['pValue'] < alpha and p95['ciHigh'] < 0 and relative <= -min_change:
+        latency_verdict = 'improvement'
+    else:
+        latency_verdict = 'no_significant_change'
+
+    error_verdict = 'no_significant_change'
+    if errors and errors['pValue'] < alpha:
+        error_verdict = 'regression' if errors['difference'] > 0 else 'improvement'
+
+    if 'regression' in (latency_verdict, error_verdict):
+        verdict = 'regression'
+    elif 'improvement' in (latency_verdict, error_verdict):
+        verdict = 'improvement'
+    else:
+        verdict = 'no_significant_change'
+
+    return {
+        'verdict': verdict,
+        'latencyVerdict': latency_verdict,
+        'errorVerdict': error_verdict,
+        'samples': {'baseline': base_hist.count, 'candidate': cand_hist.count},
+        'latency': latency,
+        'mannWhitney': mw,
+        'kolmogorovSmirnov': ks,
+        'errorRate': errors
+    }
+
+
+def compare_runs(baseline, candidate, alpha=0.05, min_change=0.05):
+    """
+    Compare two stored runs overall and per label. Label tests use a
+    Bonferroni-corrected alpha, since one comparison is made per shared label.
+    """
+    overall = compare_distributions(baseline['overall'], candidate['overall'], alpha, min_change)
+
+    shared = sorted(set(baseline['labels']) & set(candidate['labels']))
+    label_alpha = alpha / len(shared) if shared else alpha
+    labels = {
+        label: compare_distributions(baseline['labels'][label], candidate['labels'][label], label_alpha, min_change)
+        for label in shared
+    }
+
+    regressed = [label for label, result in labels.items() if result['verdict'] == 'regression']
+    verdict = overall['verdict']
+    if verdict != 'regression' and regressed:
+        verdict = 'regression'
+
+    return {
+        'verdict': verdict,
+        'regressedLabels': regressed,
+        'overall': overall,
+        'labels': labels,
+        'unmatchedLabels': {
+            'baselineOnly': sorted(set(baseline['labels']) - set(candidate['labels'])),
+            'candidateOnly': sorted(set(candidate['labels']) - set(baseline['labels']))
+        },
+        'parameters': {
+            'alpha': alpha,
+            'labelAlpha': label_alpha,
+            'minRelativeChange': min_change,
+            'bootstrapSamples': BOOTSTRAP_SAMPLES
+        }
+    }
@@ -0,0 +1,293 @@
+"""
+Persistent agent memory of analyzed runs. Each run is stored in SQLite with a
+feature vector (log-scaled percentiles, error rate, throughput, tail ratio and
+test config). The vectors are also held in a numpy matrix, so the k most
+similar past runs are found with a few matrix-vector products.
+"""
+
+import json
+import math
+import sqlite3
+import threading
+from datetime import datetime
+
+from startup import lazy_import
+
+np = lazy_import('numpy')
+
+TEST_TYPES = ('Load Test', 'Stress Test', 'Spike Test', 'Soak Test')
+
+# Feature names and distance weights. Latency, throughput and config features
+# are log1p-scaled; the error rate is a fraction, so it gets a larger weight
+FEATURES = (
+    ('p50', 1.0),
+    ('p95', 1.0),
+    ('p99', 1.0),
+    ('avgResponseTime', 1.0),
+    ('errorRate', 4.0),
+    ('throughput', 1.0),
+    ('tailRatio', 1.0),
+    ('users', 0.5),
+    ('duration', 0.5)
+) + tuple((f'type:{t}', 0.5) for t in TEST_TYPES)
+
+WEIGHTS = tuple(w for _, w in FEATURES)
+
+
+def _log(value):
+    return math.log1p(value) if isinstance(value, (int, float)) and value >= 0 else None
+
+
+def run_config(test_results):
+    """Test config carried by the results, either nested under config or top-level"""
+    config = test_results.get('config') if isinstance(test_results.get('config'), dict) else {}
+    return {key: config.get(key, test_results.get(key)) for key in ('type', 'users', 'duration')}
+
+
+def feature_vector(test_results):
+    """Features of one run; None where the results do not say"""
+    percentiles = test_results.get('responseTimePercentiles') or {}
+    config = run_config(test_results)
+
+    success_rate = test_results.get('successRate')
+    p50, p99 = percentiles.get('p50'), percentiles.get('p99')
+    tail_ratio = math.log(p99 / p50) if p50 and p99 else None
+
+    vector = [
+        _log(p50),
+        _log(percentiles.get('p95')),
+        _log(p99),
+        _log(test_results.get('avgResponseTime')),
+        1 - success_rate / 100 if isinstance(success_rate, (int, float)) else None,
+        _log(test_results.get('peakRPS')),
+        tail_ratio,
+        _log(config['users']),
+        _log(config['duration'])
+    ]
+    test_type = config['type']
+    vector += [(1.0 if test_type == t else 0.0) if test_type else None for t in TEST_TYPES]
+    return vector
+
+
+def run_summary(test_results):
+    """Headline metrics kept with each remembered run"""
+    percentiles = test_results.get('responseTimePercentiles') or {}
+    return {
+        'totalRequests': test_results.get('totalRequests'),
+        'successRate': test_results.get('successRate'),
+        'avgResponseTime': test_results.get('avgResponseTime'),
+        'p95': percentiles.get('p95'),
+        'p99': percentiles.get('p99'),
+        'peakRPS': test_results.get('peakRPS')
+    }
+
+
+class RunMemory:
+    """
+    SQLite-backed store of analyzed runs with an in-memory nearest-neighbour
+    index, which is built from the database on first use rather than at startup
+    """
+
+    def __init__(self, path=':memory:', max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS runs ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, test_id TEXT, timestamp TEXT, '
+            'severity TEXT, features TEXT, record TEXT)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS runs_test_id ON runs (test_id)')
+        self.db.commit()
+
+        # Index: one row per run; missing features are 0 with a 0 mask. Squares
+        # are kept so distances expand into matrix-vector products
+        self.ids = None
+        self.vectors = None
+        self.squares = None
+        self.masks = None
+        self.size = 0
+
+    def add(self, test_results, analysis):
+        """Remember an analyzed run, replacing any earlier analysis of the same test; returns its memory id"""
+        agent_response = analysis.get('agent_response') or {}
+        record = {
+            'testId': test_results.get('testId'),
+            'timestamp': datetime.now().isoformat(),
+            'config': run_config(test_results),
+            'summary': run_summary(test_results),
+            'analysis': {
+                'severity': agent_response.get('severity'),
+                'problem': agent_response.get('problem'),
+                'root_cause': agent_response.get('root_cause'),
+                'recommendations': agent_response.get('recommendations'),
+                'retry_test': agent_response.get('retry_test'),
+                'ai_provider': analysis.get('ai_provider')
+            }
+        }
+        features = feature_vector(test_results)
+
+        with self.lock:
+            self._ensure_index()
+            if record['testId']:
+                replaced = self._test_run_ids(record['testId'])
+                if replaced:
+                    self.db.execute('DELETE FROM runs WHERE test_id = ?', (record['testId'],))
+                    self._unindex(replaced)
+            cursor = self.db.execute(
+                'INSERT INTO runs (test_id, timestamp, severity, features, record) VALUES (?, ?, ?, ?, ?)',
+                (record['testId'], record['timestamp'], record['analysis']['severity'],
+                 json.dumps(features), json.dumps(record, default=str))
+            )
+            self.db.commit()
+            self._index(cursor.lastrowid, features)
+            if self.size > self.max_entries * 1.1:
+                self._prune()
+            return cursor.lastrowid
+
+    def nearest(self, test_results, k=5, exclude_test_id=None):
+        """
+        The k most similar remembered runs. Distance is a weighted RMS over the
+        features both runs have; similarity is 1 / (1 + distance).
+        """
+        return self.nearest_to_features(feature_vector(test_results), k, exclude_test_id)
+
+    def nearest_to_features(self, query, k=5, exclude_test_id=None):
+        """nearest() for an already computed feature vector"""
+        query_weights = np.array(WEIGHTS) * np.array([v is not None for v in query])
+        query_vector = np.array([v or 0.0 for v in query])
+
+        with self.lock:
+            self._ensure_index()
+            if not self.size or k <= 0:
+                return []
+            n = self.size
+            # sum(w * m * (v - q)^2) over features present in both runs, as
+            # sum(w m v^2) - 2 sum(w m v q) + sum(w m q^2)
+            squared = (self.squares[:n] @ query_weights
+                       - 2 * (self.vectors[:n] @ (query_weights * query_vector))
+                       + self.masks[:n] @ (query_weights * query_vector ** 2))
+            total_weight = self.masks[:n] @ query_weights
+
+            distances = np.full(n, np.inf)
+            shared = total_weight > 0
+            distances[shared] = np.sqrt(np.maximum(squared[shared], 0) / total_weight[shared])
+            if exclude_test_id:
+                excluded = self._test_run_ids(exclude_test_id)
+                if excluded:
+                    distances[np.isin(self.ids[:n], excluded)] = np.inf
+
+            count = min(k, n)
+            closest = np.argpartition(distances, count - 1)[:count]
+            closest = closest[np.argsort(distances[closest])]
+            candidates = [(int(self.ids[i]), float(distances[i])) for i in closest if np.isfinite(distances[i])]
+            records = self._records([memory_id for memory_id, _ in candidates])
+
+        return [dict(records[memory_id], id=memory_id, distance=round(distance, 4),
+                     similarity=round(1 / (1 + distance), 4))
+                for memory_id, distance in candidates if memory_id in records]
+
+    def get_by_test_id(self, test_id):
+        """Most recent remembered run of a test, with its stored features"""
+        with self.lock:
+            row = self.db.execute(
+                'SELECT id, features, record FROM runs WHERE test_id = ? ORDER BY id DESC LIMIT 1', (test_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(json.loads(row[2]), id=row[0], features=json.loads(row[1]))
+
+    def page(self, offset=0, limit=20, severity=None, test_id=None):
+        """Newest-first page of remembered runs; returns (entries, total matching)"""
+        where, params = [], []
+        if severity:
+            where.append('severity = ?')
+            params.append(severity)
+        if test_id:
+            where.append('test_id = ?')
+            params.append(test_id)
+        clause = f" WHERE {' AND '.join(where)}" if where else ''
+
+        with self.lock:
+            total = self.db.execute(f'SELECT COUNT(*) FROM runs{clause}', params).fetchone()[0]
+            rows = self.db.execute(
+                f'SELECT id, record FROM runs{clause} ORDER BY id DESC LIMIT ? OFFSET ?', params + [limit, offset]
+            ).fetchall()
+        return [dict(json.loads(record), id=memory_id) for memory_id, record in rows], total
+
+    def count(self):
+        with self.lock:
+            return self._count()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': self._count(),
+                'max_entries': self.max_entries,
+                'features': len(FEATURES),
+                'persistent': self.path != ':memory:'
+            }
+
+    def _count(self):
+        """Number of remembered runs, without building the index; called with the lock held"""
+        if self.ids is None:
+            return self.db.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+        return self.size
+
+    def _ensure_index(self):
+        """Load every stored run into the index on first use; called with the lock held"""
+        if self.ids is not None:
+            return
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, len(FEATURES)))
+        self.squares = np.zeros((0, len(FEATURES)))
+        self.masks = np.zeros((0, len(FEATURES)))
+        rows = self.db.execute('SELECT id, features FROM runs ORDER BY id').fetchall()
+        for memory_id, features in rows:
+            self._index(memory_id, json.loads(features))
+
+    def _index(self, memory_id, features):
+        """Append a vector, doubling the arrays when full; called with the lock held"""
+        if self.size == len(self.ids):
+            capacity = max(64, self.size * 2)
+            self.ids = np.resize(self.ids, capacity)
+            self.vectors = np.resize(self.vectors, (capacity, len(FEATURES)))
+            self.squares = np.resize(self.squares, (capacity, len(FEATURES)))
+            self.masks = np.resize(self.masks, (capacity, len(FEATURES)))
+        self.ids[self.size] = memory_id
+        self.vectors[self.size] = [v or 0.0 for v in features]
+        self.squares[self.size] = self.vectors[self.size] ** 2
+        self.masks[self.size] = [v is not None for v in features]
+        self.size += 1
+
+    def _unindex(self, memory_ids):
+        """Remove runs from the index, keeping the others in id order; called with the lock held"""
+        keep = ~np.isin(self.ids[:self.size], memory_ids)
+        kept = int(keep.sum())
+        for array in (self.ids, self.vectors, self.squares, self.masks):
+            array[:kept] = array[:self.size][keep]
+        self.size = kept
+
+    def _test_run_ids(self, test_id):
+        """Memory ids of a test's remembered runs; called with the lock held"""
+        return [row[0] for row in self.db.execute('SELECT id FROM runs WHERE test_id = ?', (test_id,))]
+
+    def _records(self, memory_ids):
+        if not memory_ids:
+            return {}
+        placeholders = ','.join('?' * len(memory_ids))
+        rows = self.db.execute(f'SELECT id, record FROM runs WHERE id IN ({placeholders})', memory_ids).fetchall()
+        return {memory_id: json.loads(record) for memory_id, record in rows}
+
+    def _prune(self):
+        """Drop the oldest runs beyond max_entries; called with the lock held"""
+        excess = self.size - self.max_entries
+        cutoff = int(self.ids[excess - 1])
+        self.db.execute('DELETE FROM runs WHERE id <= ?', (cutoff,))
+        self.db.commit()
+        self.ids[:self.max_entries] = self.ids[excess:self.size]
+        self.vectors[:self.max_entries] = self.vectors[excess:self.size]
+        self.squares[:self.max_entries] = self.squares[excess:self.size]
+        self.masks[:self.max_entries] = self.masks[excess:self.size]
+        self.size = self.max_entries
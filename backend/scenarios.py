@@ -0,0 +1,107 @@
+"""
+Weighted multi-endpoint scenarios shared by the JMX generator and the native
+engine. A scenario is a list of requests (method, path, headers, body
+template, weight, label); each iteration of a virtual user picks one of them
+in proportion to its weight.
+"""
+
+import random
+import re
+import time
+import uuid
+from urllib.parse import urlsplit
+
+HTTP_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS')
+
+# JMeter functions understood by the native engine when rendering body templates
+TEMPLATE_PATTERN = re.compile(r'\$\{(__UUID\(\)|__Random\((-?\d+),\s*(-?\d+)\)|__time\(\)|__threadNum)\}')
+
+
+def default_request(target_url):
+    """The single GET the plans have always sent, on the target URL's own path"""
+    parts = urlsplit(target_url)
+    path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+    return {
+        'label': 'HTTP Request',
+        'method': 'GET',
+        'path': path,
+        'headers': {},
+        'body': None,
+        'weight': 100.0
+    }
+
+
+def normalize_scenario(scenario, target_url):
+    """
+    Validate a scenario from the API and fill in defaults.
+    Raises ValueError with a user-facing message on bad input.
+    """
+    if not scenario:
+        return [default_request(target_url)]
+    if not isinstance(scenario, list):
+        raise ValueError("scenario must be a list of requests")
+
+    requests = []
+    labels = set()
+    for index, item in enumerate(scenario):
+        if not isinstance(item, dict):
+            raise ValueError(f"scenario[{index}] must be an object")
+
+        method = str(item.get('method', 'GET')).upper()
+        if method not in HTTP_METHODS:
+            raise ValueError(f"scenario[{index}]: unsupported method {method}")
+
+        path = str(item.get('path', '/'))
+        if not path.startswith('/'):
+            raise ValueError(f"scenario[{index}]: path must start with '/'")
+
+        headers = item.get('headers') or {}
+        if not isinstance(headers, dict):
+            raise ValueError(f"scenario[{index}]: headers must be an object")
+
+        try:
+            weight = float(item.get('weight', 1))
+        except (TypeError, ValueError):
+            raise ValueError(f"scenario[{index}]: weight must be a number")
+        if weight <= 0:
+            raise ValueError(f"scenario[{index}]: weight must be positive")
+
+        label = str(item.get('label') or f"{method} {path.split('?', 1)[0]}")
+        if label in labels:
+            raise ValueError(f"scenario[{index}]: duplicate label {label}")
+        labels.add(label)
+
+        body = item.get('body')
+        requests.append({
+            'label': label,
+            'method': method,
+            'path': path,
+            'headers': {str(k): str(v) for k, v in headers.items()},
+            'body': None if body is None else str(body),
+            'weight': weight
+        })
+
+    # Express weights as percentages of all traffic
+    total_weight = sum(r['weight'] for r in requests)
+    for r in requests:
+        r['weight'] = r['weight'] * 100.0 / total_weight
+
+    return requests
+
+
+def render_body(template, thread_num):
+    """Evaluate the JMeter functions the native engine supports in a body template"""
+    if template is None:
+        return None
+
+    def substitute(match):
+        function = match.group(1)
+        if function == '__UUID()':
+            return str(uuid.uuid4())
+        if function == '__time()':
+            return str(int(time.time() * 1000))
+        if function == '__threadNum':
+            return str(thread_num)
+        return str(random.randint(int(match.group(2)), int(match.group(3))))
+
+    return TEMPLATE_PATTERN.sub(substitute, template)
@@ -0,0 +1,64 @@
+"""
+Serving modes for the backend. 'threading' is the Werkzeug development server
+with one OS thread per connection. 'gevent' serves HTTP and Socket.IO
+(websockets through simple-websocket) from green threads on gevent's WSGI
+server, so an idle subscriber, a polling client or a slow LLM call costs a
+greenlet rather than an OS thread. gevent has to patch the standard library
+before anything else imports it, which is why app.py calls patch() first.
+"""
+
+import os
+import sys
+
+SERVER_MODES = ('threading', 'gevent')
+
+
+def server_mode():
+    """Serving mode from SERVER_MODE (default 'threading')"""
+    mode = os.getenv('SERVER_MODE', 'threading')
+    if mode not in SERVER_MODES:
+        raise ValueError(f"Unknown SERVER_MODE: {mode}. Expected one of {', '.join(SERVER_MODES)}")
+    return mode
+
+
+def patch(mode):
+    """Monkey-patch the standard library for green threads when serving with gevent"""
+    if mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+
+def green():
+    """True when running on gevent's patched standard library"""
+    monkey = sys.modules.get('gevent.monkey')
+    return bool(monkey and monkey.is_module_patched('threading'))
+
+
+def run_blocking(fn, *args, **kwargs):
+    """
+    Run CPU-bound work such as JTL parsing or statistics. Under gevent it runs
+    on the hub's pool of native threads, so the event loop keeps serving other
+    clients meanwhile; otherwise it runs in the calling thread.
+    """
+    if green():
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+
+def run_gevent_server(app, host, port, log_output=False, backlog=2048):
+    """
+    Serve app on gevent's WSGI server; websocket upgrades are handled by
+    simple-websocket. Nagle's algorithm is turned off on the listening socket,
+    which accepted connections inherit: the server writes headers and body
+    separately, and with delayed ACKs every keep-alive response would
+    otherwise stall for about 40 ms.
+    """
+    from gevent import pywsgi, socket
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    listener.bind((host, port))
+    listener.listen(backlog)
+    pywsgi.WSGIServer(listener, app, log='default' if log_output else None).serve_forever()
@@ -0,0 +1,65 @@
+"""
+Single-flight call coalescing: concurrent calls with the same key share one
+execution. The first caller (the leader) runs the function; callers that
+arrive while it is in flight wait on the leader's future instead.
+"""
+
+import threading
+from concurrent.futures import Future, TimeoutError
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls per key"""
+
+    def __init__(self, timeout=120):
+        self.timeout = timeout
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run fn() once for all concurrent callers of key.
+        Returns (result, shared) where shared is True for callers that reused the
+        leader's result. Followers raise TimeoutError after timeout seconds; the
+        leader's exception, if any, is raised in every caller.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                result = fn()
+                future.set_result(result)
+                return result, False
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self.lock:
+                    self.calls.pop(key, None)
+
+        try:
+            return future.result(timeout=timeout or self.timeout), True
+        except TimeoutError:
+            with self.lock:
+                self.timeouts += 1
+            raise
+
+    def stats(self):
+        with self.lock:
+            return {
+                'in_flight': len(self.calls),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'timeout_seconds': self.timeout
+            }
@@ -0,0 +1,82 @@
+"""
+Backend startup cost. Heavy modules such as numpy are imported on first use
+through lazy_import, so a backend without analyses to run never pays for
+them; StartupTimer records how long each boot phase took and when the first
+request was served.
+"""
+
+import importlib
+import sys
+import threading
+import time
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        value = getattr(module, attr)
+        # Later lookups of the attribute no longer reach __getattr__
+        setattr(self, attr, value)
+        return value
+
+
+def lazy_import(name):
+    """The module itself when already imported, otherwise a LazyModule"""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+class StartupTimer:
+    """Durations of the boot phases, and the time to the first served request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = []
+        self.ready_ms = None
+        self.first_request_ms = None
+        self.first_request_path = None
+
+    def _since(self, then):
+        return round((time.perf_counter() - then) * 1000, 1)
+
+    def mark(self, phase):
+        """End a phase that started at the previous mark"""
+        now = time.perf_counter()
+        self.phases.append({'phase': phase, 'ms': round((now - self.last) * 1000, 1)})
+        self.last = now
+
+    def ready(self):
+        self.ready_ms = self._since(self.started)
+
+    def request_served(self, path):
+        """Called after every request; only the first one is recorded"""
+        if self.first_request_ms is None:
+            self.first_request_ms = self._since(self.started)
+            self.first_request_path = path
+            print(f"⏱️  First request ({path}) served {self.first_request_ms} ms after start")
+
+    def report(self, lazy_modules=()):
+        """Phases and first request, and which of lazy_modules have been imported so far"""
+        return {
+            'phases': self.phases,
+            'readyMs': self.ready_ms,
+            'firstRequestMs': self.first_request_ms,
+            'firstRequestPath': self.first_request_path,
+            'lazyModulesLoaded': {name: name in sys.modules for name in lazy_modules}
+        }
+
+    def summary(self):
+        phases = ', '.join(f"{p['phase']} {p['ms']} ms" for p in self.phases)
+        return f"Startup: {self.ready_ms} ms ({phases})"
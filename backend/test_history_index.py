@@ -0,0 +1,135 @@
+"""
+Tests for history_index: history entries and SLO verdicts, keyset pagination
+with cursors, filters, and aggregates that leave out tests without metrics.
+"""
+
+import pytest
+
+from history_index import HistoryIndex, decode_cursor, encode_cursor, evaluate_slo, history_entry, normalize_slo
+
+
+def _status(test_id, started_at, p95=None, url='http://example.com', status='completed', **results):
+    status = {
+        'testId': test_id,
+        'status': status,
+        'startTime': started_at,
+        'config': {'type': 'Load Test', 'url': url, 'users': 10, 'duration': 60, 'engine': 'jmeter'}
+    }
+    if p95 is not None:
+        status['results'] = dict({'responseTimePercentiles': {'p50': p95 / 2, 'p95': p95, 'p99': p95 * 2},
+                                  'successRate': 99.0, 'avgResponseTime': p95 / 2, 'peakRPS': 50,
+                                  'totalRequests': 1000}, **results)
+    return status
+
+
+def test_entry_without_results_has_no_metrics():
+    entry = history_entry(_status('t1', '2026-01-01T10:00:00', status='failed'))
+    assert entry['status'] == 'failed'
+    for field in ('success_rate', 'error_rate', 'avg_response_time', 'p95', 'peak_rps', 'total_requests'):
+        assert entry[field] is None
+    assert entry['slo_passed'] is None
+
+
+def test_slo_verdict():
+    slo = normalize_slo({'p95_ms': 300}, defaults={'error_rate': 2})
+    assert slo == {'p95_ms': 300, 'error_rate': 2}
+
+    passed, violations = evaluate_slo(slo, _status('t1', '2026-01-01', p95=250)['results'])
+    assert passed and violations == []
+
+    passed, violations = evaluate_slo(slo, _status('t1', '2026-01-01', p95=400, successRate=95.0)['results'])
+    assert not passed
+    assert {v['slo'] for v in violations} == {'p95_ms', 'error_rate'}
+
+    assert normalize_slo(None) is None
+    with pytest.raises(ValueError):
+        normalize_slo({'p90_ms': 100})
+    with pytest.raises(ValueError):
+        normalize_slo({'p95_ms': -1})
+
+
+def test_record_replaces_a_test():
+    index = HistoryIndex()
+    index.record(_status('t1', '2026-01-01T10:00:00', status='stopped'))
+    index.record(_status('t1', '2026-01-01T10:00:00', p95=200))
+    entries, _ = index.page()
+    assert index.count() == 1
+    assert entries[0]['status'] == 'completed'
+    assert entries[0]['p95'] == 200
+
+
+def test_cursor_pages_cover_every_test_once():
+    index = HistoryIndex()
+    # Repeated p95 values, so the pages have to break ties by insertion order
+    for i in range(23):
+        index.record(_status(f't{i}', f'2026-01-01T10:{i:02d}:00', p95=100 + (i % 4) * 50))
+    index.record(_status('failed', '2026-01-01T11:00:00', status='failed'))
+
+    for sort, order in (('started_at', 'desc'), ('p95', 'desc'), ('p95', 'asc')):
+        seen, cursor = [], None
+        while True:
+            entries, cursor = index.page(sort=sort, order=order, limit=5, cursor=cursor)
+            seen += entries
+            if cursor is None:
+                break
+        assert sorted(entry['id'] for entry in seen) == sorted([f't{i}' for i in range(23)] + ['failed'])
+        assert len(seen) == 24
+
+    entries, _ = index.page(sort='p95', order='desc', limit=24)
+    values = [entry['p95'] for entry in entries]
+    assert values[:-1] == sorted(values[:-1], reverse=True)
+    # A test without metrics sorts last
+    assert entries[-1]['id'] == 'failed'
+
+
+def test_cursor_is_tied_to_its_sort():
+    cursor = encode_cursor('p95', 'desc', 120.0, 7)
+    assert decode_cursor(cursor, 'p95', 'desc') == (120.0, 7)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'p99', 'desc')
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor', 'p95', 'desc')
+    with pytest.raises(ValueError):
+        HistoryIndex().page(sort='testId')
+
+
+def test_filters():
+    index = HistoryIndex()
+    index.record(_status('a1', '2026-01-01T10:00:00', p95=100, url='http://a.example.com/x'))
+    index.record(_status('a2', '2026-01-02T10:00:00', p95=100, url='http://a.example.com/y'))
+    index.record(_status('b1', '2026-01-02T12:00:00', p95=100, url='http://b.example.com/'))
+    index.record(_status('b2', '2026-01-03T10:00:00', url='http://b.example.com/', status='failed'))
+
+    def ids(**filters):
+        return sorted(entry['id'] for entry in index.page(filters)[0])
+
+    assert ids(url_prefix='http://a.') == ['a1', 'a2']
+    assert ids(status='failed') == ['b2']
+    assert ids(**{'from': '2026-01-02', 'to': '2026-01-02'}) == ['a2', 'b1']
+    assert ids(url='http://b.example.com/', status='completed') == ['b1']
+
+
+def test_aggregate_leaves_out_tests_without_metrics():
+    index = HistoryIndex()
+    index.record(_status('t1', '2026-01-01T10:00:00', p95=100))
+    index.record(_status('t2', '2026-01-01T11:00:00', p95=300))
+    index.record(_status('t3', '2026-01-02T10:00:00', p95=200))
+    index.record(_status('t4', '2026-01-02T11:00:00', status='failed'))
+    index.record(_status('t5', '2026-01-02T12:00:00', status='stopped'))
+
+    rows = index.aggregate('p95')
+    assert [(row['period'], row['runs'], row['avg'], row['min'], row['max']) for row in rows] == [
+        ('2026-01-01', 2, 200.0, 100.0, 300.0),
+        ('2026-01-02', 1, 200.0, 200.0, 200.0)
+    ]
+
+    rows = index.aggregate('success_rate', group_by=(), bucket=None)
+    assert rows == [{'runs': 3, 'avg': 99.0, 'min': 99.0, 'max': 99.0}]
+
+    rows = index.aggregate('total_requests', group_by=('status',), bucket=None)
+    assert [(row['status'], row['runs']) for row in rows] == [('completed', 3)]
+
+    with pytest.raises(ValueError):
+        index.aggregate('testId')
+    with pytest.raises(ValueError):
+        index.aggregate('p95', group_by=('id',))
@@ -0,0 +1,55 @@
+"""
+Tests for JMeterRunner's handling of a finished engine process: the final
+status, the parsed results and the finish callback.
+"""
+
+from datetime import datetime
+
+from jmeter_runner import JMeterRunner
+
+HEADER = 'timeStamp,elapsed,label,responseCode,success,grpThreads,allThreads\n'
+
+
+class _Process:
+    """Engine process stand-in that has already exited"""
+
+    def communicate(self):
+        return 'done', ''
+
+
+def _runner(tmp_path, monkeypatch, status='running'):
+    monkeypatch.chdir(tmp_path)
+    runner = JMeterRunner()
+    finished = []
+    runner.on_finished = lambda test_id: finished.append(runner.get_test_status(test_id))
+    runner.active_tests['t1'] = {'process': _Process(), 'start_time': datetime.now(), 'config': {},
+                                 'status': status}
+    jtl = runner.results_dir / 't1.jtl'
+    jtl.write_text(HEADER + ''.join(f"{1_700_000_000_000 + i * 100},{50 + i},GET /,200,true,1,1\n"
+                                    for i in range(20)))
+    return runner, jtl, finished
+
+
+def test_completed_once_results_are_stored(tmp_path, monkeypatch):
+    runner, jtl, finished = _runner(tmp_path, monkeypatch)
+    runner._monitor_test('t1', _Process(), jtl)
+
+    assert [status['status'] for status in finished] == ['completed']
+    assert finished[0]['results']['totalRequests'] == 20
+
+
+def test_stopped_test_keeps_its_status_with_results(tmp_path, monkeypatch):
+    runner, jtl, finished = _runner(tmp_path, monkeypatch, status='stopped')
+    runner._monitor_test('t1', _Process(), jtl)
+
+    assert [status['status'] for status in finished] == ['stopped']
+    assert finished[0]['results']['totalRequests'] == 20
+
+
+def test_failed_parse_is_reported_once(tmp_path, monkeypatch):
+    runner, jtl, finished = _runner(tmp_path, monkeypatch)
+    runner.parse_jtl_results = lambda *args: 1 / 0
+    runner._monitor_test('t1', _Process(), jtl)
+
+    assert [status['status'] for status in finished] == ['failed']
+    assert 'results' not in finished[0]
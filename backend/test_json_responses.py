@@ -0,0 +1,103 @@
+"""
+Tests for json_responses: Accept-Encoding negotiation, and the body cache's
+ETags, conditional requests, compressed variants and size-bounded eviction.
+"""
+
+import gzip
+import json
+
+from flask import Flask
+
+from json_responses import BodyCache, ResponseCompressor, json_provider, negotiate_encoding
+
+
+def _client(max_bytes=64 * 1024 * 1024, min_size=256):
+    """Test client of an app serving /runs/<id> from a body cache; returns (client, cache, builds)"""
+    app = Flask(__name__)
+    app.json = json_provider(app, 'stdlib')
+    cache = BodyCache(ResponseCompressor(min_size), max_bytes)
+    builds = []
+
+    @app.route('/runs/<run_id>')
+    def run(run_id):
+        def build():
+            builds.append(run_id)
+            return {'id': run_id, 'samples': list(range(200))}
+        return cache.response(('run', run_id), build)
+
+    return app.test_client(), cache, builds
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding('gzip, deflate') == 'gzip'
+    assert negotiate_encoding('gzip;q=0') is None
+    assert negotiate_encoding('identity') is None
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding('*') in ('br', 'gzip')
+
+
+def test_body_is_built_once_and_served_with_an_etag():
+    client, cache, builds = _client()
+    first = client.get('/runs/a')
+    second = client.get('/runs/a')
+
+    assert builds == ['a']
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    assert json.loads(first.data)['id'] == 'a'
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_matching_if_none_match_is_not_modified():
+    client, _, builds = _client()
+    etag = client.get('/runs/a').headers['ETag']
+
+    response = client.get('/runs/a', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    assert client.get('/runs/a', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert client.get('/runs/b', headers={'If-None-Match': etag}).status_code == 200
+    assert builds == ['a', 'b']
+
+
+def test_compressed_variant_is_cached_with_the_same_etag():
+    client, cache, _ = _client()
+    plain = client.get('/runs/a')
+    zipped = client.get('/runs/a', headers={'Accept-Encoding': 'gzip'})
+
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in zipped.headers['Vary']
+    assert gzip.decompress(zipped.data) == plain.data
+    assert zipped.headers['ETag'] == plain.headers['ETag']
+    assert cache.stats()['bytes'] == len(plain.data) + len(zipped.data)
+
+    assert client.get('/runs/a', headers={'Accept-Encoding': 'gzip'}).data == zipped.data
+    assert cache.stats()['bytes'] == len(plain.data) + len(zipped.data)
+
+
+def test_small_bodies_are_not_compressed():
+    client, _, _ = _client(min_size=1024 * 1024)
+    response = client.get('/runs/a', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert json.loads(response.data)['id'] == 'a'
+
+
+def test_least_recently_used_bodies_are_evicted_beyond_max_bytes():
+    client, cache, builds = _client()
+    size = len(client.get('/runs/a').data)
+    cache.max_bytes = 2 * size + size // 2
+
+    client.get('/runs/b')
+    client.get('/runs/a')  # Now more recently used than b
+    client.get('/runs/c')
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+    client.get('/runs/a')
+    client.get('/runs/b')
+    assert builds == ['a', 'b', 'c', 'b']
@@ -0,0 +1,218 @@
+"""
+Tests for live_metrics: tailing JTL and part files, per-second buckets, the
+streaming detectors, and anomaly windows of a monitored test.
+"""
+
+from live_metrics import (
+    TEST_REQUESTS, CUSUMDetector, EWMADetector, JTLTail, LiveAnomalyMonitor, SecondBuckets, ThroughputDropDetector
+)
+from native_engine import LEAN_JTL_FIELDS, NativeLoadProcess
+
+HEADER = 'timeStamp,elapsed,label,responseCode,success,allThreads\n'
+START = 1_700_000_000
+
+
+def _rows(second, count, elapsed=100, failures=0, threads=10):
+    """JTL rows for count samples spread over one second of the run"""
+    return ''.join(
+        f"{(START + second) * 1000 + i * 1000 // count},{elapsed},GET /,200,{'false' if i < failures else 'true'},"
+        f"{threads}\n"
+        for i in range(count)
+    )
+
+
+def _samples(second, count, elapsed=100):
+    return [((START + second) * 1000 + i, elapsed, True, 10) for i in range(count)]
+
+
+def test_tail_reads_only_complete_new_rows(tmp_path):
+    jtl = tmp_path / 'run.jtl'
+    jtl.write_text(HEADER + _rows(0, 3) + '1700000001000,12')
+    tail = JTLTail(jtl)
+    assert [sample[1:] for sample in tail.read()] == [(100, True, 10)] * 3
+
+    with open(jtl, 'a') as f:
+        f.write('0,GET /,200,false,7\n')
+    assert tail.read() == [(1_700_000_001_000, 120, False, 7)]
+    assert tail.read() == []
+
+
+def _lean_rows(second, count, worker):
+    """Rows of one native worker's lean part file over one second"""
+    return ''.join(f"{(START + second) * 1000 + i * 1000 // count + worker},{100 + worker},GET /,200,true,2,4\n"
+                   for i in range(count))
+
+
+def test_tail_hands_off_from_part_files_to_the_merged_file(tmp_path):
+    jtl = tmp_path / 'run.jtl'
+    process = NativeLoadProcess({'users': 4, 'recording': 'lean'}, jtl, workers=2)
+    header = ','.join(LEAN_JTL_FIELDS) + '\n'
+    for worker, part in enumerate(process.part_files):
+        part.write_text(header + ''.join(_lean_rows(second, 10, worker) for second in range(5)))
+    tail = JTLTail(jtl)
+    assert len(tail.read()) == 100
+
+    # Rows written after the last read, then the engine merges the parts and removes them
+    for worker, part in enumerate(process.part_files):
+        with open(part, 'a') as f:
+            f.write(''.join(_lean_rows(second, 10, worker) for second in range(5, 8)))
+    assert process._merge_part_files() == (160, 0)
+    assert not any(part.exists() for part in process.part_files)
+
+    late = tail.read()
+    assert len(late) == 60
+    assert min(sample[0] for sample in late) == (START + 5) * 1000
+    assert tail.read() == []
+
+
+def test_monitor_counts_rows_written_just_before_the_merge(tmp_path):
+    jtl = tmp_path / 'native.jtl'
+    process = NativeLoadProcess({'users': 4, 'recording': 'lean'}, jtl, workers=2)
+    header = ','.join(LEAN_JTL_FIELDS) + '\n'
+    for worker, part in enumerate(process.part_files):
+        part.write_text(header + ''.join(_lean_rows(second, 20, worker) for second in range(30)))
+    monitor = LiveAnomalyMonitor('test-native', jtl, lag=1)
+    monitor.poll(START + 40)
+    for worker, part in enumerate(process.part_files):
+        with open(part, 'a') as f:
+            f.write(''.join(_lean_rows(second, 20, worker) for second in range(30, 33)))
+    process._merge_part_files()
+
+    assert monitor.finish() == []
+    assert monitor.points == 33
+    assert TEST_REQUESTS.values()[('test-native',)] == 33 * 40
+    monitor.drop_metrics()
+
+
+def test_buckets_emit_gaps_but_nothing_past_the_last_sample():
+    buckets = SecondBuckets(lag=2)
+    buckets.add(_samples(0, 10, elapsed=50) + _samples(3, 5))
+    points = buckets.close(START + 100)
+    # Seconds 0 to 2; second 3 is the newest with samples, so it is held back
+    assert [(p['t'], p['requests']) for p in points] == [(0, 10), (1, 0), (2, 0)]
+    assert points[0]['p50'] == 50
+    assert points[1]['errorRate'] is None
+
+    assert buckets.close(START + 200) == []
+    drained = buckets.drain()
+    assert [(p['t'], p['requests']) for p in drained] == [(3, 5)]
+
+    buckets.add(_samples(2, 1))
+    assert buckets.late == 1
+
+
+def test_buckets_wait_for_the_lag():
+    buckets = SecondBuckets(lag=3)
+    buckets.add(_samples(0, 5) + _samples(1, 5) + _samples(2, 5))
+    assert buckets.close(START + 2) == []
+    assert [p['t'] for p in buckets.close(START + 4)] == [0, 1]
+
+
+def test_ewma_flags_a_spike_and_keeps_it_out_of_the_baseline():
+    detector = EWMADetector('p95')
+    for _ in range(20):
+        assert detector.update(100) == (False, 100)
+    anomalous, baseline = detector.update(300)
+    assert anomalous and baseline == 100
+    assert detector.update(100) == (False, 100)
+
+
+def test_cusum_flags_a_sustained_shift_but_not_one_spike():
+    spiked = CUSUMDetector('p50')
+    for _ in range(20):
+        spiked.update(100)
+    assert not any(spiked.update(x)[0] for x in [400] + [100] * 10)
+
+    shifted = CUSUMDetector('p50')
+    for _ in range(20):
+        shifted.update(100)
+    alarms = [shifted.update(130)[0] for _ in range(10)]
+    assert alarms[:2] == [False, False]
+    assert all(alarms[2:])
+    # The baseline is frozen from the first alarm on, so the shift keeps standing out
+    frozen = shifted.baseline.mean
+    assert frozen < 105
+    assert shifted.update(130) == (True, frozen)
+
+
+def test_throughput_drop():
+    detector = ThroughputDropDetector('throughput')
+    for _ in range(15):
+        detector.update(50)
+    assert not detector.update(30)[0]
+    assert detector.update(20)[0]
+
+
+def test_monitor_reports_a_latency_window(tmp_path):
+    jtl = tmp_path / 'latency.jtl'
+    events = []
+    monitor = LiveAnomalyMonitor('test-latency', jtl, events.append, lag=1)
+    with open(jtl, 'w') as f:
+        f.write(HEADER)
+        for second in range(60):
+            f.write(_rows(second, 20, elapsed=600 if 30 <= second < 35 else 100))
+    for now in range(START, START + 70, 2):
+        monitor.poll(now)
+    anomalies = monitor.finish()
+    monitor.drop_metrics()
+
+    p95 = [a for a in anomalies if (a['metric'], a['detector']) == ('p95', 'ewma')]
+    assert len(p95) == 1
+    assert (p95[0]['windowStart'], p95[0]['windowEnd']) == (30, 34)
+    assert p95[0]['peak'] == 600
+    assert p95[0]['magnitude'] == 5.0
+    assert not [a for a in anomalies if a['metric'] in ('throughput', 'errorRate')]
+    # One event when the window opened, one when it closed
+    assert [e['state'] for e in events if e['metric'] == 'p95' and e['detector'] == 'ewma'] == ['open', 'closed']
+
+
+def test_monitor_reports_an_error_window(tmp_path):
+    jtl = tmp_path / 'errors.jtl'
+    monitor = LiveAnomalyMonitor('test-errors', jtl, lag=1)
+    with open(jtl, 'w') as f:
+        f.write(HEADER)
+        for second in range(40):
+            f.write(_rows(second, 20, failures=10 if 25 <= second < 28 else 0))
+    monitor.poll(START + 50)
+    anomalies = monitor.finish()
+    monitor.drop_metrics()
+
+    errors = [a for a in anomalies if (a['metric'], a['detector']) == ('errorRate', 'ewma')]
+    assert [(a['windowStart'], a['windowEnd'], a['peak']) for a in errors] == [(25, 27, 0.5)]
+
+
+def test_silence_after_the_last_sample_is_not_a_drop(tmp_path):
+    jtl = tmp_path / 'shutdown.jtl'
+    monitor = LiveAnomalyMonitor('test-shutdown', jtl, lag=1)
+    with open(jtl, 'w') as f:
+        f.write(HEADER)
+        for second in range(30):
+            f.write(_rows(second, 50))
+        # The final second is cut short by the end of the test
+        f.write(_rows(30, 5))
+
+    # The engine shuts down and writes its report while the test still counts as running
+    for now in range(START, START + 120, 2):
+        monitor.poll(now)
+    assert monitor.open == {}
+    assert monitor.points == 30
+
+    assert monitor.finish() == []
+    assert monitor.points == 31
+    monitor.drop_metrics()
+
+
+def test_gap_between_samples_is_a_drop(tmp_path):
+    jtl = tmp_path / 'gap.jtl'
+    monitor = LiveAnomalyMonitor('test-gap', jtl, lag=1)
+    with open(jtl, 'w') as f:
+        f.write(HEADER)
+        for second in list(range(20)) + list(range(25, 40)):
+            f.write(_rows(second, 50))
+    monitor.poll(START + 60)
+    anomalies = monitor.finish()
+    monitor.drop_metrics()
+
+    assert [(a['metric'], a['windowStart'], a['windowEnd'], a['magnitude']) for a in anomalies] == [
+        ('throughput', 20, 24, -1.0)
+    ]
@@ -0,0 +1,59 @@
+"""
+Tests for native_engine: a short closed-model run split across several worker
+processes against a local HTTP server.
+"""
+
+import csv
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from native_engine import NativeLoadProcess
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('recording', ['full', 'lean'])
+def test_thread_counts_cover_every_worker(tmp_path, server_url, recording):
+    jtl = tmp_path / 'run.jtl'
+    config = {'url': server_url, 'users': 8, 'duration': 2, 'ramp_up': 0, 'think_time': 100,
+              'recording': recording}
+    process = NativeLoadProcess(config, jtl, workers=4).start()
+    stdout, stderr = process.communicate()
+    assert process.returncode == 0, stderr
+
+    with open(jtl, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) > 8
+    assert all(row['success'] == 'true' for row in rows)
+
+    # grpThreads is the worker's own share, allThreads the whole test's
+    assert max(int(row['grpThreads']) for row in rows) == 2
+    all_threads = sorted(int(row['allThreads']) for row in rows)
+    assert all_threads[-1] == 8
+    assert all_threads[len(all_threads) // 2] == 8
+
+    # Only the merged JTL file is left behind
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['run.jtl']
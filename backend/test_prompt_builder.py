@@ -0,0 +1,58 @@
+"""
+Tests for prompt_builder's reply parsing: single-run verdicts and the
+per-run verdicts of a batch reply.
+"""
+
+import json
+
+import pytest
+
+from prompt_builder import parse_batch_response, parse_verdict
+
+
+def _verdict(**overrides):
+    verdict = {
+        'problem': 'p95 latency regressed',
+        'root_cause': 'Connection pool exhaustion',
+        'recommendations': ['Raise the pool size'],
+        'retry_test': False,
+        'confidence': 0.8,
+        'severity': 'high'
+    }
+    verdict.update(overrides)
+    return {key: value for key, value in verdict.items() if value is not None}
+
+
+def test_parse_verdict_lists_missing_and_mistyped_fields():
+    verdict, problems = parse_verdict(json.dumps(_verdict()))
+    assert verdict['severity'] == 'high'
+    assert problems == []
+
+    _, problems = parse_verdict(json.dumps(_verdict(root_cause=None, recommendations='Raise the pool size')))
+    assert problems == ["Missing field 'root_cause'", "Field 'recommendations' has the wrong type"]
+
+    assert parse_verdict('not json') == (None, ['Reply is not valid JSON'])
+
+
+def test_batch_keeps_only_complete_verdicts():
+    reply = json.dumps({'runs': {
+        '0': _verdict(),
+        '1': {'problem': 'Only a problem'},
+        '2': _verdict(confidence='high'),
+        '3': 'not an object'
+    }})
+    verdicts = parse_batch_response(f"```json\n{reply}\n```", 5)
+    assert list(verdicts) == [0]
+    assert verdicts[0] == _verdict()
+
+
+def test_batch_reply_as_a_list():
+    verdicts = parse_batch_response(json.dumps([_verdict(), _verdict(severity='low')]), 2)
+    assert [verdicts[i]['severity'] for i in (0, 1)] == ['high', 'low']
+
+
+def test_batch_reply_that_is_not_json_raises():
+    with pytest.raises(ValueError):
+        parse_batch_response('The runs look fine', 2)
+    with pytest.raises(ValueError):
+        parse_batch_response(json.dumps({'verdicts': []}), 2)
@@ -0,0 +1,120 @@
+"""
+Tests for retry_scheduler: backoff, the per-chain retry budget, deduplication
+while a retry is pending or running, and cancelled or failed retries being
+dropped from the lineage and the budget.
+"""
+
+import threading
+import time
+
+from retry_scheduler import RetryScheduler
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+class _Launcher:
+    """start_test stand-in recording what it was asked to start"""
+
+    def __init__(self, success=True):
+        self.success = success
+        self.started = []
+        self.running = set()
+        self.lock = threading.Lock()
+
+    def __call__(self, test_config):
+        with self.lock:
+            self.started.append(test_config)
+            if self.success:
+                self.running.add(test_config['id'])
+        return {'success': self.success, 'error': None if self.success else 'JMeter not found'}
+
+    def is_running(self, test_id):
+        with self.lock:
+            return test_id in self.running
+
+
+def test_backoff_grows_per_attempt_and_budget_covers_the_chain():
+    scheduler = RetryScheduler(_Launcher(), max_retries=2, backoff=10, backoff_factor=3)
+    first = scheduler.request_retry({'id': 'a', 'users': 5})
+    assert first['triggered']
+    assert first['new_test_id'] == 'a_retry1'
+    assert (first['attempt'], first['starts_in_seconds']) == (1, 10)
+
+    second = scheduler.request_retry({'id': 'a_retry1', 'users': 5})
+    assert second['new_test_id'] == 'a_retry2'
+    assert (second['attempt'], second['starts_in_seconds']) == (2, 30)
+    assert scheduler.lineage_of('a_retry2')['root'] == 'a'
+    assert scheduler.lineage_of('a_retry2')['parent'] == 'a_retry1'
+
+    third = scheduler.request_retry({'id': 'a_retry2', 'users': 5})
+    assert not third['triggered']
+    assert 'budget' in third['reason']
+    assert scheduler.stats()['over_budget'] == 1
+
+    for test_id in ('a_retry1', 'a_retry2'):
+        assert scheduler.cancel(test_id)
+
+
+def test_pending_retry_deduplicates_and_cancel_frees_it():
+    scheduler = RetryScheduler(_Launcher(), max_retries=1, backoff=60)
+    assert scheduler.request_retry({'id': 'a'})['new_test_id'] == 'a_retry1'
+
+    duplicate = scheduler.request_retry({'id': 'a'})
+    assert duplicate['deduplicated']
+    assert duplicate['new_test_id'] == 'a_retry1'
+    assert scheduler.lineage_of('a_retry1')['pending']
+
+    assert scheduler.cancel('a_retry1')
+    assert not scheduler.cancel('a_retry1')
+    assert scheduler.lineage_of('a')['children'] == []
+    assert scheduler.lineage_of('a_retry1')['attempt'] == 0  # Unknown again
+
+    # The cancelled retry gave its budget and its id back
+    again = scheduler.request_retry({'id': 'a'})
+    assert again['triggered']
+    assert again['new_test_id'] == 'a_retry1'
+    scheduler.cancel('a_retry1')
+
+
+def test_started_retry_deduplicates_only_while_running():
+    launcher = _Launcher()
+    scheduler = RetryScheduler(launcher, max_retries=3, backoff=0, is_running=launcher.is_running)
+    retry = scheduler.request_retry({'id': 'a', 'url': 'http://example.com'}, reason='p95 regression')
+    _wait_for(lambda: scheduler.stats()['started'] == 1)
+
+    config = launcher.started[0]
+    assert config['id'] == 'a_retry1'
+    assert config['url'] == 'http://example.com'
+    assert (config['parent_test_id'], config['root_test_id'], config['retry_attempt']) == ('a', 'a', 1)
+    assert config['retry_reason'] == 'p95 regression'
+    assert retry['new_test_id'] == 'a_retry1'
+
+    assert scheduler.request_retry({'id': 'a'})['deduplicated']
+
+    launcher.running.discard('a_retry1')
+    second = scheduler.request_retry({'id': 'a'})
+    assert second['triggered']
+    assert second['new_test_id'] == 'a_retry2'
+    assert scheduler.lineage_of('a')['children'] == ['a_retry1', 'a_retry2']
+    _wait_for(lambda: scheduler.stats()['started'] == 2)
+
+
+def test_failed_start_is_dropped_from_lineage_and_budget():
+    launcher = _Launcher(success=False)
+    scheduler = RetryScheduler(launcher, max_retries=1, backoff=0, is_running=launcher.is_running)
+    assert scheduler.request_retry({'id': 'a'})['triggered']
+    _wait_for(lambda: scheduler.stats()['failed_to_start'] == 1)
+
+    assert scheduler.lineage_of('a')['children'] == []
+    assert scheduler.stats()['pending'] == 0
+
+    launcher.success = True
+    retry = scheduler.request_retry({'id': 'a'})
+    assert retry['triggered']
+    assert retry['new_test_id'] == 'a_retry1'
+    _wait_for(lambda: scheduler.stats()['started'] == 1)
@@ -0,0 +1,144 @@
+"""
+Tests for run_comparison: the statistics on known distributions, and the
+verdicts compare_runs reaches for identical, slower and faster runs.
+"""
+
+import math
+import random
+
+import numpy as np
+
+from latency_stats import LatencyHistogram
+from run_comparison import (
+    compare_distributions, compare_runs, error_rate_difference, kolmogorov_smirnov, mann_whitney
+)
+
+
+def _run(latencies, errors=0):
+    histogram = LatencyHistogram()
+    for value in latencies:
+        histogram.record(value)
+    return {'requests': len(latencies), 'errors': errors, 'histogram': histogram.to_dict()}
+
+
+def _lognormal(n, median, seed):
+    rng = random.Random(seed)
+    return [int(rng.lognormvariate(math.log(median), 0.4)) for _ in range(n)]
+
+
+def test_mann_whitney_matches_pairwise_count_with_ties():
+    base = [1, 2, 2, 3, 5, 5, 5, 8]
+    cand = [2, 3, 3, 5, 8, 9]
+    values = sorted(set(base) | set(cand))
+    base_counts = np.array([base.count(v) for v in values], dtype=float)
+    cand_counts = np.array([cand.count(v) for v in values], dtype=float)
+
+    # U for the candidate: pairs where it is slower, ties counting half
+    expected = sum((c > b) + 0.5 * (c == b) for c in cand for b in base)
+    result = mann_whitney(base_counts, cand_counts)
+    assert result['u'] == expected
+    assert result['probabilitySlower'] == round(expected / (len(base) * len(cand)), 4)
+
+
+def test_mann_whitney_identical_samples_show_no_difference():
+    counts = np.array([5.0, 10.0, 3.0])
+    result = mann_whitney(counts, counts)
+    assert result['z'] == 0
+    assert result['pValue'] == 1.0
+    assert result['probabilitySlower'] == 0.5
+    assert result['rankBiserial'] == 0
+
+
+def test_kolmogorov_smirnov_statistic():
+    # Empirical CDFs (0.5, 1, 1) and (0, 0.5, 1): largest gap 0.5
+    result = kolmogorov_smirnov(np.array([2.0, 2.0, 0.0]), np.array([0.0, 2.0, 2.0]))
+    assert result['d'] == 0.5
+    assert 0 < result['pValue'] <= 1
+
+    same = kolmogorov_smirnov(np.array([3.0, 1.0]), np.array([3.0, 1.0]))
+    assert same == {'d': 0.0, 'pValue': 1.0}
+
+
+def test_kolmogorov_smirnov_disjoint_samples():
+    result = kolmogorov_smirnov(np.array([500.0, 0.0]), np.array([0.0, 500.0]))
+    assert result['d'] == 1.0
+    assert result['pValue'] < 1e-10
+
+
+def test_error_rate_difference():
+    result = error_rate_difference(1000, 10, 1000, 50)
+    assert result['baseline'] == 1.0
+    assert result['candidate'] == 5.0
+    assert result['difference'] == 4.0
+    assert result['ciLow'] > 0
+    assert result['pValue'] < 0.001
+
+    assert error_rate_difference(0, 0, 100, 1) is None
+    assert error_rate_difference(100, 0, 100, 0)['pValue'] == 1.0
+
+
+def test_identical_runs_are_not_a_change():
+    latencies = _lognormal(2000, 120, seed=1)
+    result = compare_distributions(_run(latencies), _run(latencies))
+    assert result['verdict'] == 'no_significant_change'
+    assert result['mannWhitney']['pValue'] == 1.0
+    assert result['kolmogorovSmirnov']['d'] == 0
+    for key in ('p50', 'p95', 'p99', 'mean'):
+        assert result['latency'][key]['difference'] == 0
+        assert result['latency'][key]['ciLow'] <= 0 <= result['latency'][key]['ciHigh']
+
+
+def test_samples_of_one_distribution_are_not_a_change():
+    result = compare_distributions(_run(_lognormal(3000, 120, seed=2)), _run(_lognormal(3000, 120, seed=3)))
+    assert result['latencyVerdict'] == 'no_significant_change'
+
+
+def test_shifted_run_is_a_regression_and_back_an_improvement():
+    base = _run(_lognormal(3000, 100, seed=4))
+    slower = _run(_lognormal(3000, 150, seed=5))
+
+    result = compare_distributions(base, slower)
+    assert result['verdict'] == 'regression'
+    assert result['latencyVerdict'] == 'regression'
+    assert result['mannWhitney']['pValue'] < 1e-6
+    assert result['mannWhitney']['probabilitySlower'] > 0.7
+    assert result['kolmogorovSmirnov']['pValue'] < 1e-6
+    assert result['latency']['p95']['ciLow'] > 0
+    assert result['latency']['p95']['relativeChange'] > 0.3
+
+    assert compare_distributions(slower, base)['verdict'] == 'improvement'
+
+
+def test_small_shift_below_min_change_is_not_a_regression():
+    base = _lognormal(5000, 100, seed=6)
+    result = compare_distributions(_run(base), _run([value + 2 for value in base]), min_change=0.2)
+    assert result['latencyVerdict'] == 'no_significant_change'
+
+
+def test_error_regression_without_latency_change():
+    latencies = _lognormal(2000, 100, seed=7)
+    result = compare_distributions(_run(latencies, errors=2), _run(latencies, errors=80))
+    assert result['latencyVerdict'] == 'no_significant_change'
+    assert result['errorVerdict'] == 'regression'
+    assert result['verdict'] == 'regression'
+
+
+def test_empty_run_has_insufficient_data():
+    assert compare_distributions(_run([]), _run([100, 200]))['verdict'] == 'insufficient_data'
+
+
+def test_compare_runs_per_label():
+    fast, slow = _lognormal(2000, 80, seed=8), _lognormal(2000, 160, seed=9)
+    other = _lognormal(2000, 200, seed=10)
+    baseline = {'overall': _run(fast + other), 'labels': {'GET /a': _run(fast), 'GET /b': _run(other),
+                                                          'GET /old': _run(fast)}}
+    candidate = {'overall': _run(slow + other), 'labels': {'GET /a': _run(slow), 'GET /b': _run(other),
+                                                           'GET /new': _run(fast)}}
+
+    result = compare_runs(baseline, candidate, alpha=0.05)
+    assert result['verdict'] == 'regression'
+    assert result['regressedLabels'] == ['GET /a']
+    assert result['labels']['GET /b']['verdict'] == 'no_significant_change'
+    assert result['unmatchedLabels'] == {'baselineOnly': ['GET /old'], 'candidateOnly': ['GET /new']}
+    # Bonferroni over the two shared labels
+    assert result['parameters']['labelAlpha'] == 0.025